@@ -13,7 +13,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 from pathlib import Path
 import django_heroku
 import os
-import cloudinary
+import tempfile
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -143,23 +143,124 @@ EMAIL_USE_TLS = False
 EMAIL_USE_SSL = True
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
+# Contact emails are queued in the outbox and sent by a background thread
+# of the web worker, or by `python manage.py send_outbox [--loop]`
 
-# Cloudinary
+OUTBOX = {
+    'WORKER_THREAD': True,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 60,
+    'MAX_RETRY_DELAY': 3600,
+    'LEASE': 300,
+}
+
+
+# Cloudinary, configured once the Cloudinary storage is used
+
+CLOUDINARY = {
+    'cloud_name': os.environ.get('CLOUD_NAME'),
+    'api_key': os.environ.get('API_KEY'),
+    'api_secret': os.environ.get('API_SECRET'),
+    'secure': True,
+}
+
+# Calls to Cloudinary: timeouts in seconds, retries of the transient
+# failures after a jittered exponential backoff, keep-alive connections per
+# host, and circuit breaker failing the calls fast for RESET_TIMEOUT seconds
+# after FAILURE_THRESHOLD consecutive failures
+
+CLOUDINARY_CLIENT = {
+    'CONNECT_TIMEOUT': 3,
+    'READ_TIMEOUT': 30,
+    'RETRIES': 2,
+    'BACKOFF': 0.5,
+    'MAX_BACKOFF': 8,
+    'POOL_SIZE': 10,
+    'FAILURE_THRESHOLD': 5,
+    'RESET_TIMEOUT': 30,
+}
+
+# Storage of the images, which builds their URLs, receives the uploads sent
+# by background workers from the staging directory, and deletes them. Set
+# the IMAGE_STORAGE environment variable to 'local' to keep them in
+# IMAGE_STORAGE_LOCATION instead, served under /media/images/ without the
+# network
 
-cloudinary.config(
-    cloud_name=os.environ['CLOUD_NAME'],
-    api_key=os.environ['API_KEY'],
-    api_secret=os.environ['API_SECRET'],
-    secure=True
-)
+if os.environ.get('IMAGE_STORAGE') == 'local':
+    IMAGE_STORAGE = {
+        'BACKEND': 'core.storage.LocalStorage',
+        'OPTIONS': {
+            'location': os.environ.get(
+                'IMAGE_STORAGE_LOCATION', BASE_DIR / 'media' / 'images'),
+        },
+    }
+else:
+    IMAGE_STORAGE = {
+        'BACKEND': 'core.storage.CloudinaryStorage',
+        'OPTIONS': {},
+    }
+
+IMAGE_STAGING_DIR = os.path.join(tempfile.gettempdir(), 'staged-images')
+
+# Seconds a worker has to process an upload it claimed, before another
+# worker or `python manage.py process_uploads` may take it over
+
+IMAGE_UPLOAD_LEASE = 600
+
+# Normalization of the staged images before their upload, in a process pool:
+# scaled down to fit in MAX_SIZE pixels (None keeps them as uploaded), and
+# re-encoded without metadata as WEBP, or as JPEG or PNG when the Pillow
+# build has no WebP support. FORMAT 'auto' picks JPEG or PNG
+
+IMAGE_NORMALIZATION = {
+    'MAX_SIZE': 2048,
+    'FORMAT': 'WEBP',
+    'QUALITY': 82,
+}
+
+# Derivatives of the uploaded images built eagerly, at most WIDTHS pixels
+# wide in each of the FORMATS, returned as srcset attributes
+
+IMAGE_DERIVATIVES = {
+    'WIDTHS': [320, 640, 1280],
+    'FORMATS': ['webp', 'jpg'],
+}
+
+# Largest side in pixels of the thumbnails returned as image placeholders
+
+IMAGE_PLACEHOLDER_SIZE = 16
 
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer'
-    ]
+        'rest.renderers.JSONRenderer'
+    ],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest.authentication.AdminTokenAuthentication'
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'rest.pagination.KeysetPagination'
 }
 
+# Token authenticating the administrator on the write methods of the API
+
+ADMIN_TOKEN = os.environ['ADMIN_TOKEN']
+
+# Rendered response cache of the read-only API
+# Use 'rest.cache.DjangoResponseCache' with {'alias': ...} to share it
+# between the workers through one of the CACHES
+
+REST_RESPONSE_CACHE = {
+    'BACKEND': 'rest.cache.LRUResponseCache',
+    'OPTIONS': {
+        'max_bytes': 16 * 1024 * 1024,
+    },
+}
+
+# Whether the database builds the JSON array of the plain list responses
+# itself, with the JSON functions of SQLite or PostgreSQL
+
+REST_SQL_JSON = False
+
 CORS_ALLOWED_ORIGINS = [os.environ['FRONTEND_URL']]
 
 django_heroku.settings(locals())
@@ -15,9 +15,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from core.views import serve_image
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('rest.urls'))
+    path('api/', include('rest.urls')),
+    path('media/images/<path:name>', serve_image, name='image'),
 ]
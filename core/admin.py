@@ -1,5 +1,5 @@
 from django.contrib import admin
-from core.models import Review, Technology, Project
+from core.models import OutboxMessage, Review, Technology, Project
 
 
 class ReviewAdmin(admin.ModelAdmin):
@@ -14,6 +14,11 @@ class ProjectAdmin(admin.ModelAdmin):
     pass
 
 
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'from_email', 'created', 'sent', 'attempts')
+
+
 admin.site.register(Review, ReviewAdmin)
 admin.site.register(Technology, TechnologyAdmin)
 admin.site.register(Project, ProjectAdmin)
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
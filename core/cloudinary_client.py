@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from bisect import bisect_left
+from threading import Lock
+import certifi
+import cloudinary
+import urllib3
+from cloudinary import utils
+from cloudinary.exceptions import Error
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+                   float('inf'))
+
+# Statuses of the transient failures: rate limiting and server errors
+RETRIED_STATUSES = {420, 429, 500, 502, 503, 504}
+
+
+class CloudinaryError(Error):
+    """Call to Cloudinary which failed, with the HTTP status if any"""
+
+    def __init__(self, message, status=None):
+        super(CloudinaryError, self).__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(CloudinaryError):
+    """Call failed without being sent, as Cloudinary is considered down"""
+
+
+def get_client_settings():
+    config = getattr(settings, 'CLOUDINARY_CLIENT', {})
+    return {
+        'connect_timeout': config.get('CONNECT_TIMEOUT', 3),
+        'read_timeout': config.get('READ_TIMEOUT', 30),
+        'retries': config.get('RETRIES', 2),
+        'backoff': config.get('BACKOFF', 0.5),
+        'max_backoff': config.get('MAX_BACKOFF', 8),
+        'pool_size': config.get('POOL_SIZE', 10),
+        'failure_threshold': config.get('FAILURE_THRESHOLD', 5),
+        'reset_timeout': config.get('RESET_TIMEOUT', 30),
+    }
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures, failing the
+    calls fast. Once `reset_timeout` seconds passed, lets one trial call
+    through, which closes it again if it succeeds"""
+
+    def __init__(self, failure_threshold, reset_timeout,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if self.trial else 'open'
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or \
+                    self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            self.trial = True
+            return True
+
+    def succeeded(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failed(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.trial:
+                    logger.warning('Cloudinary circuit opened after %s '
+                                   'failure(s)', self.failures)
+                self.opened_at = self.clock()
+                self.trial = False
+
+
+class LatencyHistogram:
+    """Counts the durations of the calls of an operation by bucket"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.lock = Lock()
+
+    def observe(self, seconds):
+        with self.lock:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+
+    def snapshot(self):
+        """Returns the count and sum of the durations, and the cumulative
+        count of each bucket by upper bound, as Prometheus exposes them"""
+        with self.lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, self.counts):
+                cumulative += count
+                buckets[bound] = cumulative
+            return {'count': self.count, 'sum': self.total,
+                    'buckets': buckets}
+
+
+class CloudinaryClient:
+    """Calls Cloudinary through a pool of keep-alive connections, with a
+    timeout on each call. Retries the transient failures after a jittered
+    exponential backoff, fails fast while the circuit breaker is open, and
+    records the latency of each operation.
+
+    Uploads get a generated public ID and overwrite it, so that a retried
+    upload cannot store a duplicate"""
+
+    def __init__(self, connect_timeout=3, read_timeout=30, retries=2,
+                 backoff=0.5, max_backoff=8, pool_size=10,
+                 failure_threshold=5, reset_timeout=30,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.http = urllib3.PoolManager(
+            maxsize=pool_size, cert_reqs='CERT_REQUIRED',
+            ca_certs=certifi.where())
+        self.timeout = urllib3.Timeout(connect=connect_timeout,
+                                       read=read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout,
+                                      clock)
+        self.clock = clock
+        self.sleep = sleep
+        self.latency = {}
+        self.latency_lock = Lock()
+
+    def record(self, operation, seconds):
+        with self.latency_lock:
+            histogram = self.latency.setdefault(operation,
+                                                LatencyHistogram())
+        histogram.observe(seconds)
+
+    def latency_snapshot(self):
+        """Returns the latency histogram of each operation"""
+        with self.latency_lock:
+            histograms = dict(self.latency)
+        return {operation: histogram.snapshot()
+                for operation, histogram in histograms.items()}
+
+    def backoff_delay(self, attempt):
+        """Returns a random delay up to the doubled backoff of the attempt,
+        so that the workers do not retry in step"""
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def call(self, operation, method, url, **kwargs):
+        """Sends a request, retrying the transient failures, and returns the
+        response"""
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(
+                    f'Cloudinary is unavailable, {operation} not sent')
+            start = self.clock()
+            try:
+                response = self.http.request(
+                    method, url, timeout=self.timeout, retries=False,
+                    **kwargs)
+            except urllib3.exceptions.HTTPError as error:
+                failure = CloudinaryError(f'{operation} failed: {error}')
+            else:
+                if response.status not in RETRIED_STATUSES:
+                    self.record(operation, self.clock() - start)
+                    self.breaker.succeeded()
+                    return response
+                failure = CloudinaryError(
+                    f'{operation} failed with the status {response.status}',
+                    response.status)
+            self.record(operation, self.clock() - start)
+            self.breaker.failed()
+            if attempt >= self.retries:
+                raise failure
+            attempt += 1
+            logger.info('Retrying %s: %s', operation, failure)
+            self.sleep(self.backoff_delay(attempt))
+
+    def call_json(self, operation, method, url, **kwargs):
+        response = self.call(operation, method, url, **kwargs)
+        try:
+            result = json.loads(response.data.decode())
+        except ValueError:
+            raise CloudinaryError(
+                f'{operation} returned no JSON, with the status '
+                f'{response.status}', response.status)
+        if 'error' in result:
+            raise CloudinaryError(result['error'].get('message', ''),
+                                  response.status)
+        return result
+
+    def upload(self, path, **options):
+        """Uploads an image file with the given upload options, and returns
+        the result of the Upload API"""
+        options = {'public_id': uuid.uuid4().hex, 'overwrite': True,
+                   **options}
+        params = utils.sign_request(
+            utils.build_upload_params(**options), options)
+        fields = []
+        for name, value in params.items():
+            if isinstance(value, list):
+                fields.extend((f'{name}[]', item) for item in value)
+            elif value:
+                fields.append((name, value))
+        with open(path, 'rb') as file:
+            fields.append(('file', (os.path.basename(path), file.read())))
+        return self.call_json(
+            'upload', 'POST', utils.cloudinary_api_url('upload', **options),
+            fields=fields)
+
+    def delete_resources(self, public_ids, resource_type='image',
+                         upload_type='upload'):
+        """Deletes images with one call to the Admin API"""
+        config = cloudinary.config()
+        return self.call_json(
+            'delete', 'DELETE',
+            utils.base_api_url(['resources', resource_type, upload_type]),
+            fields=[('public_ids[]', public_id) for public_id in public_ids],
+            headers=urllib3.make_headers(
+                basic_auth=f'{config.api_key}:{config.api_secret}'))
+
+    def download(self, url, destination):
+        """Writes the file of a delivery URL"""
+        response = self.call('download', 'GET', url)
+        if response.status != 200:
+            raise CloudinaryError(
+                f'download failed with the status {response.status}',
+                response.status)
+        with open(destination, 'wb') as file:
+            file.write(response.data)
@@ -0,0 +1,31 @@
+from cloudinary import CloudinaryResource
+from cloudinary.models import CloudinaryField
+from django.core.files.uploadedfile import UploadedFile
+from core.storage import get_image_storage, upload_file
+
+
+class StoredImageResource(CloudinaryResource):
+    """Stored image whose URLs are built by the image storage"""
+
+    def build_url(self, **options):
+        return get_image_storage().build_url(self, **options)
+
+
+class StoredImageField(CloudinaryField):
+    """CloudinaryField storing its images in the storage of the
+    IMAGE_STORAGE setting rather than in Cloudinary only"""
+
+    def parse_cloudinary_resource(self, value):
+        resource = super(StoredImageField, self).parse_cloudinary_resource(
+            value)
+        return StoredImageResource(
+            type=resource.type, resource_type=resource.resource_type,
+            version=resource.version, public_id=resource.public_id,
+            format=resource.format)
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if isinstance(value, UploadedFile):
+            setattr(model_instance, self.attname, self.to_python(
+                upload_file(get_image_storage(), value)))
+        return super(StoredImageField, self).pre_save(model_instance, add)
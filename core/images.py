@@ -0,0 +1,86 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from django.conf import settings
+from django.db import transaction
+from core.storage import get_image_storage
+
+logger = logging.getLogger(__name__)
+
+# Largest number of public IDs accepted by one Admin API delete call
+DELETE_BATCH_SIZE = 100
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_image_executor():
+    """Returns the thread pool running the image network calls"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_WORKERS', 2),
+                thread_name_prefix='images'
+            )
+        return _executor
+
+
+def destroy_images(public_ids):
+    """Deletes the given images from the image storage, by batches"""
+    for start in range(0, len(public_ids), DELETE_BATCH_SIZE):
+        batch = public_ids[start:start + DELETE_BATCH_SIZE]
+        try:
+            get_image_storage().delete(batch)
+        except Exception:
+            logger.exception('Could not delete the images %s', batch)
+
+
+class DeletionBatch:
+    """Images deleted at one savepoint level of a transaction, kept in the
+    batches of the connection until flushed or discarded"""
+
+    def __init__(self, batches, level, hooks):
+        self.batches = batches
+        self.level = level
+        self.hooks = hooks
+        self.public_ids = []
+        self.flushed = False
+
+    def is_pending(self, connection):
+        return not self.flushed and self.hooks is connection.run_on_commit
+
+    def flush(self):
+        self.flushed = True
+        if self.batches.get(self.level) is self:
+            del self.batches[self.level]
+        if self.public_ids:
+            get_image_executor().submit(destroy_images, self.public_ids)
+
+
+def delete_image_on_commit(public_id, using=None):
+    """Deletes an image in the background once the current transaction is
+    committed, in one batch with the other images it deleted.
+
+    Nothing is deleted if the transaction, or the savepoint the deletion
+    was made in, is rolled back."""
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        # Committed already, on_commit() would run the hook right away
+        get_image_executor().submit(destroy_images, [public_id])
+        return
+    batches = connection.__dict__.setdefault('image_deletions', {})
+    # The batches of rolled back savepoints or transactions are discarded,
+    # their flush will never run
+    for level, batch in list(batches.items()):
+        if not batch.is_pending(connection):
+            del batches[level]
+    level = tuple(connection.savepoint_ids)
+    batch = batches.get(level)
+    if batch is not None:
+        batch.public_ids.append(public_id)
+        return
+    batch = batches[level] = DeletionBatch(
+        batches, level, connection.run_on_commit)
+    batch.public_ids.append(public_id)
+    transaction.on_commit(batch.flush, using=using)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from core.models import Project, Technology
+from core.uploads import backfill_image_details
+
+
+class Command(BaseCommand):
+    """Django command to fill in the size, weight and placeholder of the
+    images stored before they were computed at upload time"""
+
+    def handle(self, *args, **options):
+        filled = sum(backfill_image_details(model)
+                     for model in (Technology, Project))
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {filled} image(s)'))
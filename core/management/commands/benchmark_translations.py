@@ -0,0 +1,109 @@
+import time
+from django.core.management.base import BaseCommand
+from core.models import Project
+
+
+def legacy_check_translated_field(field, error_message='', blank=False):
+    """Validation of the translated strings before the compiled schemas,
+    kept as the baseline of the benchmark"""
+    try:
+        if blank or (field['en'] and field['fr']):
+            if len(field) != 2:
+                raise ValueError(error_message + " Found an extra field.")
+            else:
+                if (not isinstance(field['en'], str)
+                        or not isinstance(field['fr'], str)):
+                    raise ValueError(
+                        error_message + "'en' and 'fr' keys must"
+                        + " be of type str."
+                    )
+        else:
+            raise ValueError(error_message)
+    except KeyError:
+        raise ValueError(error_message)
+    except TypeError:
+        raise ValueError(error_message)
+
+
+def legacy_check_translated_MDX_field(field, error_message=''):
+    """Validation of the translated MDX lines before the compiled schemas,
+    kept as the baseline of the benchmark"""
+    try:
+        if field['en'] and field['fr']:
+            if len(field) != 2:
+                raise ValueError(error_message + " Found an extra field.")
+            else:
+                if (not isinstance(field['en'], list)
+                        or not isinstance(field['fr'], list)):
+                    raise ValueError(
+                        error_message + "'en' and 'fr' keys must"
+                        + " be of type list."
+                    )
+                else:
+                    for line in field['en']:
+                        if not isinstance(line, str):
+                            raise ValueError(
+                                error_message + "'en' key entries "
+                                + "must be strings"
+                            )
+                    for line in field['fr']:
+                        if not isinstance(line, str):
+                            raise ValueError(
+                                error_message + "'fr' key entries"
+                                + " must be strings"
+                            )
+        else:
+            raise ValueError(error_message)
+    except KeyError:
+        raise ValueError(error_message)
+    except TypeError:
+        raise ValueError(error_message)
+
+
+def measure(validate, values, repeat):
+    """Returns the number of values validated per second"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for value in values:
+            validate(value)
+    return repeat * len(values) / (time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    """Django command comparing the validation throughput of the legacy
+    and compiled checks of translated fields"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines', type=int, default=2000,
+            help='Number of lines of each MDX description')
+        parser.add_argument(
+            '--values', type=int, default=100,
+            help='Number of descriptions validated per round')
+        parser.add_argument(
+            '--repeat', type=int, default=10,
+            help='Number of rounds')
+
+    def handle(self, *args, **options):
+        descriptions = [
+            {language: [f'Line {index} of description {value}'
+                        for index in range(options['lines'])]
+             for language in ('en', 'fr')}
+            for value in range(options['values'])
+        ]
+        names = [{'en': f'Project {value}', 'fr': f'Projet {value}'}
+                 for value in range(options['values'])]
+        schemas = Project.translated_schemas
+        cases = (
+            ('name', names, legacy_check_translated_field,
+             schemas['name'].validate),
+            ('description', descriptions, legacy_check_translated_MDX_field,
+             schemas['description'].validate),
+        )
+        for label, values, legacy, compiled in cases:
+            before = measure(legacy, values, options['repeat'])
+            after = measure(compiled, values, options['repeat'])
+            self.stdout.write(
+                f'{label}: legacy {before:,.0f}/s, compiled {after:,.0f}/s'
+                f' ({after / before:.2f}x)'
+            )
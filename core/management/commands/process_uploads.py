@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.uploads import process_pending_uploads
+
+
+class Command(BaseCommand):
+    """Django command to send the staged images left pending, as after a
+    restart of the upload workers"""
+
+    def handle(self, *args, **options):
+        processed = process_pending_uploads()
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} upload(s)'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import Project, rebuild_project_cards
+
+
+class Command(BaseCommand):
+    """Django command to rebuild every project card, after writes which
+    send no signals such as QuerySet.update()"""
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            project_ids = list(Project.objects.values_list('pk', flat=True))
+            rebuild_project_cards(project_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(project_ids)} card(s)'))
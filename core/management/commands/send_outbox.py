@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from core.outbox import deliver_outbox
+
+
+class Command(BaseCommand):
+    """Django command to send the emails waiting in the outbox"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling the outbox instead of exiting once drained')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to wait between two polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent = deliver_outbox()
+            if sent:
+                self.stdout.write(self.style.SUCCESS(f'Sent {sent} email(s)'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_contentversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Snapshot',
+            fields=[
+                ('key', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('versions', models.CharField(max_length=255)),
+                ('payload', models.BinaryField()),
+            ],
+        ),
+    ]
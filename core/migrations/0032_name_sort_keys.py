@@ -0,0 +1,78 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:30
+
+import unicodedata
+from django.db import migrations, models
+
+# Letters the Unicode decomposition keeps whole but French sorts expanded
+EXPANDED_LETTERS = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ø': 'o'})
+
+
+def sort_key(text):
+    """The sort key of core.models as of this migration, kept here so that
+    its later changes do not change the keys it fills"""
+    decomposed = unicodedata.normalize(
+        'NFKD', text.casefold().translate(EXPANDED_LETTERS))
+    return ''.join(char for char in decomposed
+                   if not unicodedata.combining(char))[:255]
+
+
+def fill_sort_keys(apps, schema_editor):
+    for model_name in ('Skill', 'Project'):
+        model = apps.get_model('core', model_name)
+        rows = list(model.objects.all())
+        for row in rows:
+            row.name_en = sort_key(row.name['en'])
+            row.name_fr = sort_key(row.name['fr'])
+        model.objects.bulk_update(rows, ['name_en', 'name_fr'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='name_en',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='name_fr',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='skill',
+            name='name_en',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='skill',
+            name='name_fr',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_sort_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='technology',
+            name='name',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['name_en', 'id'], name='core_projec_name_en_b752ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['name_fr', 'id'], name='core_projec_name_fr_9add22_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['name_en', 'id'], name='core_skill_name_en_7a5780_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['name_fr', 'id'], name='core_skill_name_fr_464d63_idx'),
+        ),
+    ]
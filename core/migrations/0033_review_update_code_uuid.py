@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:31
+
+from django.db import migrations, models
+import uuid
+
+
+def normalize_update_codes(apps, schema_editor):
+    """Stores the codes in the compact form of the UUID column, giving a
+    new one to the reviews with an invalid or duplicated code"""
+    Review = apps.get_model('core', 'Review')
+    seen = set()
+    reviews = list(Review.objects.all())
+    for review in reviews:
+        try:
+            code = uuid.UUID(review.update_code).hex
+        except ValueError:
+            code = uuid.uuid4().hex
+        if code in seen:
+            code = uuid.uuid4().hex
+        seen.add(code)
+        review.update_code = code
+    Review.objects.bulk_update(reviews, ['update_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_name_sort_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_update_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='review',
+            name='update_code',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def image_url(image):
+    return image.url if image else None
+
+
+def card_payload(project, technologies):
+    """Builds the cards as the models define them at this migration, kept
+    here so that later changes of core.models do not change it"""
+    return {
+        'id': project.pk,
+        'name': project.name,
+        'description': {
+            language: lines[0]
+            for language, lines in project.description.items()
+        },
+        'image': image_url(project.image),
+        'technologies': [
+            {'id': technology.pk, 'name': technology.name,
+             'image': image_url(technology.image)}
+            for technology in technologies
+        ],
+    }
+
+
+def build_cards(apps, schema_editor):
+    Project = apps.get_model('core', 'Project')
+    Technology = apps.get_model('core', 'Technology')
+    ProjectCard = apps.get_model('core', 'ProjectCard')
+    projects = Project.objects.prefetch_related(models.Prefetch(
+        'technologies', queryset=Technology.objects.order_by('name', 'id')))
+    ProjectCard.objects.bulk_create(
+        ProjectCard(project=project, name_en=project.name_en,
+                    name_fr=project.name_fr,
+                    payload=card_payload(
+                        project, project.technologies.all()))
+        for project in projects
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_review_update_code_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectCard',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='core.project')),
+                ('name_en', models.CharField(default='', max_length=255)),
+                ('name_fr', models.CharField(default='', max_length=255)),
+                ('payload', models.JSONField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='projectcard',
+            index=models.Index(fields=['name_en', 'project'], name='core_projec_name_en_b04bc4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectcard',
+            index=models.Index(fields=['name_fr', 'project'], name='core_projec_name_fr_77f135_idx'),
+        ),
+        migrations.RunPython(build_cards, migrations.RunPython.noop),
+    ]
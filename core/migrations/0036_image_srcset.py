@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_imageupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='image_srcset',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='technology',
+            name='image_srcset',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:03
+
+from django.db import migrations, models
+
+IMAGE_DETAILS = {'image_width': None, 'image_height': None,
+                 'image_placeholder': ''}
+
+
+def add_card_image_details(apps, schema_editor):
+    """Adds the empty details of the images to the cards, until their
+    images are uploaded again or backfilled"""
+    ProjectCard = apps.get_model('core', 'ProjectCard')
+    cards = list(ProjectCard.objects.all())
+    for card in cards:
+        card.payload.update(IMAGE_DETAILS)
+        for technology in card.payload['technologies']:
+            technology.update(IMAGE_DETAILS)
+    ProjectCard.objects.bulk_update(cards, ['payload'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_image_srcset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='image_bytes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='technology',
+            name='image_bytes',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='technology',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='technology',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='technology',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(add_card_image_details,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:07
+
+import core.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_storedimage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='project',
+            name='image',
+            field=core.fields.StoredImageField(blank=True, max_length=255, null=True, verbose_name='image'),
+        ),
+        migrations.AlterField(
+            model_name='technology',
+            name='image',
+            field=core.fields.StoredImageField(max_length=255, verbose_name='image'),
+        ),
+    ]
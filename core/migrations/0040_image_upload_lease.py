@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_stored_image_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='lease',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='imageupload',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10),
+        ),
+    ]
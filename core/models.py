@@ -1,11 +1,34 @@
+import hmac
+import threading
 import uuid
 import os
-from django.db import models
-from cloudinary.models import CloudinaryField
+import unicodedata
+from contextlib import contextmanager
+from django.db import models, transaction
+from django.utils import timezone
 
-from django.dispatch import receiver
-from django.db.models.signals import pre_delete
-import cloudinary
+from django.dispatch import Signal, receiver
+from django.db.models.signals import m2m_changed, post_delete, post_save,\
+    pre_delete
+from core.fields import StoredImageField
+from core.images import delete_image_on_commit
+from core.translations import TranslatedSchema
+
+
+# Letters the Unicode decomposition keeps whole but French sorts expanded
+EXPANDED_LETTERS = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ø': 'o'})
+
+# Length of the sort key columns, the names being unlimited
+SORT_KEY_LENGTH = 255
+
+
+def sort_key(text):
+    """Returns the key sorting a text like the primary level of the French
+    collation, ignoring case and accents, cut to the length of its column"""
+    decomposed = unicodedata.normalize(
+        'NFKD', text.casefold().translate(EXPANDED_LETTERS))
+    return ''.join(char for char in decomposed
+                   if not unicodedata.combining(char))[:SORT_KEY_LENGTH]
 
 
 def technology_file_path(instance, file_name):
@@ -15,72 +38,36 @@ def technology_file_path(instance, file_name):
     return os.path.join('uploads/technology/', file_name)
 
 
-def check_translated_field(field, error_message='', blank=False):
-
-    try:
-        if blank or (field['en'] and field['fr']):
-            if len(field) != 2:
-                raise ValueError(error_message + " Found an extra field.")
-            else:
-                if (not isinstance(field['en'], str)
-                        or not isinstance(field['fr'], str)):
-                    raise ValueError(
-                        error_message + "'en' and 'fr' keys must"
-                        + " be of type str."
-                    )
-        else:
-            raise ValueError(error_message)
-    except KeyError:
-        raise ValueError(error_message)
-    except TypeError:
-        raise ValueError(error_message)
-
-
-def check_translated_MDX_field(field, error_message=''):
-    try:
-        if field['en'] and field['fr']:
-            if len(field) != 2:
-                raise ValueError(error_message + " Found an extra field.")
-            else:
-                if (not isinstance(field['en'], list)
-                        or not isinstance(field['fr'], list)):
-                    raise ValueError(
-                        error_message + "'en' and 'fr' keys must"
-                        + " be of type list."
-                    )
-                else:
-                    for line in field['en']:
-                        if not isinstance(line, str):
-                            raise ValueError(
-                                error_message + "'en' key entries "
-                                + "must be strings"
-                            )
-                    for line in field['fr']:
-                        if not isinstance(line, str):
-                            raise ValueError(
-                                error_message + "'fr' key entries"
-                                + " must be strings"
-                            )
-        else:
-            raise ValueError(error_message)
-    except KeyError:
-        raise ValueError(error_message)
-    except TypeError:
-        raise ValueError(error_message)
+def validate_translations(instance):
+    """Checks the translated fields of a model instance against its
+    `translated_schemas`"""
+    for name, schema in instance.translated_schemas.items():
+        schema.validate(getattr(instance, name))
 
 
 class Technology(models.Model):
-    name = models.CharField(max_length=50)
-    image = CloudinaryField('image')
+    name = models.CharField(max_length=50, db_index=True)
+    image = StoredImageField('image')
+    # srcset attributes of the derivatives of the image, by media type
+    image_srcset = models.JSONField(default=dict, blank=True, editable=False)
+    # Intrinsic size and weight of the image, and a base64 micro-thumbnail
+    # to show while it loads
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_bytes = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
 
     def __str__(self):
         return self.name
 
 
 @receiver(pre_delete, sender=Technology)
-def technology_photo_delete(sender, instance, **kwargs):
+def technology_photo_delete(sender, instance, using, **kwargs):
     if instance.image:
-        cloudinary.uploader.destroy(instance.image.public_id)
+        release_image(instance.image.public_id, using)
 
 
 class Skill(models.Model):
@@ -92,20 +79,35 @@ class Skill(models.Model):
         on_delete=models.CASCADE,
         null=True
     )
+    name_en = models.CharField(max_length=SORT_KEY_LENGTH, editable=False,
+                               default='')
+    name_fr = models.CharField(max_length=SORT_KEY_LENGTH, editable=False,
+                               default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name_en', 'id']),
+            models.Index(fields=['name_fr', 'id']),
+        ]
+
+    translated_schemas = {
+        'name': TranslatedSchema('Skill name'),
+        'description': TranslatedSchema('Skill description', list),
+    }
+    # Fields prepare() fills from the others
+    prepared_fields = ('name_en', 'name_fr')
 
     def __str__(self):
         return self.name['en']
 
     def save(self, *args, **kwargs):
-        # Name field
-        error_name = ('Skill object name must be an'
-                      + ' object with only the "en" and "fr" keys.')
-        check_translated_field(self.name, error_name)
+        self.prepare()
+        super(Skill, self).save(*args, **kwargs)
 
-        # Description field
-        error_description = ('Skill object description must be an'
-                             + ' object with only the "en" and "fr" keys.')
-        check_translated_MDX_field(self.description, error_description)
+    def prepare(self):
+        """Validates the fields and fills the sort keys, as save() does for
+        the bulk writes which bypass it"""
+        validate_translations(self)
 
         # Date field
         if not isinstance(self.date, list):
@@ -121,40 +123,71 @@ class Skill(models.Model):
             if self.date[1] < 2000 or self.date[1] > 2100:
                 raise ValueError('Year must be in [2000, 2100]')
 
-        super(Skill, self).save(*args, **kwargs)
+        self.name_en = sort_key(self.name['en'])
+        self.name_fr = sort_key(self.name['fr'])
 
 
 class Project(models.Model):
     name = models.JSONField()
     description = models.JSONField()
-    image = CloudinaryField('image', blank=True, null=True)
+    image = StoredImageField('image', blank=True, null=True)
+    image_srcset = models.JSONField(default=dict, blank=True, editable=False)
+    image_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_bytes = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
     github = models.URLField(null=True, blank=True)
     link = models.URLField(null=True, blank=True)
     client = models.CharField(max_length=100, blank=True)
     duration = models.IntegerField(null=True, blank=True)
     technologies = models.ManyToManyField(Technology, blank=True)
+    name_en = models.CharField(max_length=SORT_KEY_LENGTH, editable=False,
+                               default='')
+    name_fr = models.CharField(max_length=SORT_KEY_LENGTH, editable=False,
+                               default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name_en', 'id']),
+            models.Index(fields=['name_fr', 'id']),
+        ]
+
+    translated_schemas = {
+        'name': TranslatedSchema('Project name'),
+        'description': TranslatedSchema('Project description', list),
+    }
+    # Fields prepare() fills from the others
+    prepared_fields = ('name_en', 'name_fr')
 
     def __str__(self):
         return self.name['en']
 
     def save(self, *args, **kwargs):
-        check_translated_field(self.name, "Project name error: wrong typing.")
-        check_translated_MDX_field(
-            self.description, "Project description error: wrong typing.")
+        self.prepare()
         is_creating = self.pk is None
         super(Project, self).save(*args, **kwargs)
         if is_creating:
-            Review.objects.create(
-                author=self.client,
-                message=dict([("en", ""), ("fr", "")]),
-                project=self
-            )
+            self.new_review().save()
+
+    def prepare(self):
+        """Validates the fields and fills the sort keys, as save() does for
+        the bulk writes which bypass it"""
+        validate_translations(self)
+        self.name_en = sort_key(self.name['en'])
+        self.name_fr = sort_key(self.name['fr'])
+
+    def new_review(self):
+        """Returns the unsaved review awaiting the client of the project"""
+        return Review(author=self.client, message=default_dict(), project=self)
 
 
 @receiver(pre_delete, sender=Project)
-def project_photo_delete(sender, instance, **kwargs):
+def project_photo_delete(sender, instance, using, **kwargs):
     if instance.image:
-        cloudinary.uploader.destroy(instance.image.public_id)
+        release_image(instance.image.public_id, using)
 
 
 def default_dict():
@@ -164,19 +197,316 @@ def default_dict():
 class Review(models.Model):
     author = models.CharField(max_length=50, blank=True, default="")
     message = models.JSONField(default=default_dict)
-    update_code = models.CharField(max_length=50, blank=True)
+    update_code = models.UUIDField(
+        default=uuid.uuid4, unique=True, editable=False)
     modified = models.BooleanField(default=False)
     project = models.OneToOneField(
         Project, null=True, on_delete=models.CASCADE)
 
+    translated_schemas = {
+        'message': TranslatedSchema('Review message', blank=True),
+    }
+
     def __str__(self):
         return self.message["en"]
 
     def save(self, *args, **kwargs):
-        check_translated_field(
-            self.message, "Review message error: wrong typing.", True)
+        self.prepare()
         if self.pk is None:
-            self.update_code = str(uuid.uuid4())
+            self.update_code = uuid.uuid4()
         else:
             self.modified = True
         super(Review, self).save(*args, **kwargs)
+
+    def prepare(self):
+        """Validates the fields, as save() does for the bulk writes which
+        bypass it"""
+        validate_translations(self)
+
+
+class OutboxMessage(models.Model):
+    """Email waiting to be delivered by the outbox worker"""
+    subject = models.CharField(max_length=1500)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+    sent = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.subject
+
+
+class ImageUpload(models.Model):
+    """Image file staged on the local disk, until a worker sends it to the
+    image storage and sets it on the field of its instance"""
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Pending'), (PROCESSING, 'Processing'),
+                (DONE, 'Done'), (FAILED, 'Failed')]
+
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    field = models.CharField(max_length=50)
+    path = models.CharField(max_length=500)
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=PENDING, db_index=True)
+    image = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    # End of the lease of the worker processing the upload, after which
+    # another worker may take it over
+    lease = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.model}.{self.field}@{self.object_id}: {self.status}'
+
+
+class StoredImage(models.Model):
+    """Image sent to the image storage, indexed by the SHA-256 digest of its
+    content so that the identical uploads share it, and counting the fields
+    referencing it"""
+    digest = models.CharField(max_length=64, unique=True)
+    public_id = models.CharField(max_length=255, unique=True)
+    image = models.CharField(max_length=255)
+    details = models.JSONField(default=dict)
+    references = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.public_id} ({self.references})'
+
+
+def release_image(public_id, using=None):
+    """Drops a reference to a stored image, deleting the image once
+    committed when it was the last one. The images stored before the index
+    have a single reference"""
+    with transaction.atomic(using=using):
+        stored = StoredImage.objects.using(using).select_for_update().filter(
+            public_id=public_id).first()
+        if stored is not None and stored.references > 1:
+            StoredImage.objects.using(using).filter(pk=stored.pk).update(
+                references=models.F('references') - 1)
+            return
+        if stored is not None:
+            stored.delete(using=using)
+    delete_image_on_commit(public_id, using)
+
+
+content_changed = Signal()
+
+
+def find_review_by_code(update_code):
+    """Returns the review with the given update code, or None.
+
+    The code is looked up through the unique index, and then compared in
+    constant time"""
+    try:
+        code = uuid.UUID(str(update_code))
+    except ValueError:
+        return None
+    review = Review.objects.filter(update_code=code).first()
+    if review is None or not hmac.compare_digest(
+            review.update_code.bytes, code.bytes):
+        return None
+    return review
+
+
+class ContentVersion(models.Model):
+    """Change counter of a content model, bumped on every write"""
+    label = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.label}@{self.version}'
+
+
+coalescing = threading.local()
+
+
+@contextmanager
+def coalesce_content_versions():
+    """Bumps the content version of each model written in the block once,
+    when it exits, instead of once per saved or deleted row"""
+    if getattr(coalescing, 'models', None) is not None:
+        yield
+        return
+    coalescing.models = models_written = {}
+    try:
+        yield
+    finally:
+        coalescing.models = None
+    for model in models_written:
+        bump_content_version(model)
+
+
+def bump_content_version(model):
+    """Increments the content version of the given model"""
+    models_written = getattr(coalescing, 'models', None)
+    if models_written is not None:
+        models_written[model] = None
+        return
+    label = model._meta.label_lower
+    updated = ContentVersion.objects.filter(label=label).update(
+        version=models.F('version') + 1)
+    if not updated:
+        ContentVersion.objects.get_or_create(
+            label=label, defaults={'version': 1})
+    content_changed.send(sender=model)
+
+
+def get_content_versions(*content_models):
+    """Returns the content versions of the given models in one query"""
+    labels = [model._meta.label_lower for model in content_models]
+    versions = dict(ContentVersion.objects.filter(
+        label__in=labels).values_list('label', 'version'))
+    return tuple(versions.get(label, 0) for label in labels)
+
+
+class Snapshot(models.Model):
+    """Pre-encoded document aggregating public content, along with the
+    content versions it was built from"""
+    key = models.CharField(max_length=50, primary_key=True)
+    versions = models.CharField(max_length=255)
+    payload = models.BinaryField()
+
+    def __str__(self):
+        return f'{self.key}@{self.versions}'
+
+
+def image_url(image):
+    """Returns the URL of a stored image, as the serializers render it"""
+    return image.url if image else None
+
+
+def card_image(instance):
+    """Returns the URL of the image of a card, with what reserves its space
+    and previews it while it loads"""
+    return {
+        'image': image_url(instance.image),
+        'image_width': instance.image_width,
+        'image_height': instance.image_height,
+        'image_placeholder': instance.image_placeholder,
+    }
+
+
+def card_payload(project, technologies):
+    """Returns what the landing page shows of a project: its name, the
+    first line of its description, its image, and the names and icons of
+    its technologies"""
+    return {
+        'id': project.pk,
+        'name': project.name,
+        'description': {
+            language: lines[0]
+            for language, lines in project.description.items()
+        },
+        **card_image(project),
+        'technologies': [
+            {'id': technology.pk, 'name': technology.name,
+             **card_image(technology)}
+            for technology in technologies
+        ],
+    }
+
+
+class ProjectCard(models.Model):
+    """Denormalized card of a project, rebuilt whenever the project or one
+    of its technologies is written, so that the landing page reads a single
+    table"""
+    project = models.OneToOneField(
+        Project, on_delete=models.CASCADE, primary_key=True,
+        related_name='card')
+    name_en = models.CharField(max_length=255, default='')
+    name_fr = models.CharField(max_length=255, default='')
+    payload = models.JSONField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name_en', 'project']),
+            models.Index(fields=['name_fr', 'project']),
+        ]
+
+    def __str__(self):
+        return f'Card of {self.project_id}'
+
+
+def rebuild_project_cards(project_ids):
+    """Rebuilds the cards of the given projects from their current rows"""
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+    projects = Project.objects.filter(pk__in=project_ids).prefetch_related(
+        models.Prefetch('technologies', queryset=Technology.objects.order_by(
+            'name', 'id')))
+    cards = [
+        ProjectCard(project=project, name_en=project.name_en,
+                    name_fr=project.name_fr,
+                    payload=card_payload(project, project.technologies.all()))
+        for project in projects
+    ]
+    ProjectCard.objects.filter(project__in=project_ids).delete()
+    ProjectCard.objects.bulk_create(cards)
+
+
+def technology_project_ids(technologies):
+    """Returns the IDs of the projects using any of the technologies"""
+    return list(Project.objects.filter(
+        technologies__in=technologies).values_list('pk', flat=True).distinct())
+
+
+@receiver([post_save, post_delete], sender=Technology)
+@receiver([post_save, post_delete], sender=Skill)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Review)
+def content_saved_or_deleted(sender, **kwargs):
+    bump_content_version(sender)
+
+
+@receiver(m2m_changed, sender=Project.technologies.through)
+def project_technologies_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_content_version(Project)
+
+
+@receiver(post_save, sender=Project)
+def project_card_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rebuild_project_cards([instance.pk])
+
+
+@receiver(post_save, sender=Technology)
+def technology_cards_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        rebuild_project_cards(technology_project_ids([instance]))
+
+
+@receiver(pre_delete, sender=Technology)
+def technology_cards_deleting(sender, instance, **kwargs):
+    # The links are gone once the technology is deleted
+    instance.card_project_ids = technology_project_ids([instance])
+
+
+@receiver(post_delete, sender=Technology)
+def technology_cards_deleted(sender, instance, **kwargs):
+    rebuild_project_cards(getattr(instance, 'card_project_ids', ()))
+
+
+@receiver(m2m_changed, sender=Project.technologies.through)
+def project_cards_technologies_changed(sender, instance, action, reverse,
+                                       pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            rebuild_project_cards([instance.pk])
+    elif action == 'pre_clear':
+        instance.card_project_ids = technology_project_ids([instance])
+    elif action == 'post_clear':
+        rebuild_project_cards(getattr(instance, 'card_project_ids', ()))
+    elif action in ('post_add', 'post_remove'):
+        rebuild_project_cards(pk_set)
@@ -0,0 +1,126 @@
+import base64
+import os
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from io import BytesIO
+from PIL import Image, ImageOps, features
+from django.conf import settings
+
+# Formats the images can be re-encoded to, with their extension
+EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg', 'PNG': '.png'}
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_normalization_settings():
+    config = getattr(settings, 'IMAGE_NORMALIZATION', {})
+    return {
+        'max_size': config.get('MAX_SIZE', 2048),
+        'image_format': config.get('FORMAT', 'WEBP'),
+        'quality': config.get('QUALITY', 82),
+    }
+
+
+def get_placeholder_size():
+    return getattr(settings, 'IMAGE_PLACEHOLDER_SIZE', 16)
+
+
+def get_normalization_pool():
+    """Returns the process pool decoding and encoding the images, so that
+    the workers of the web process are not held by the CPU"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_NORMALIZATION_WORKERS',
+                                    2))
+        return _pool
+
+
+def choose_format(image, image_format):
+    """Returns the format to encode an image with: WebP when asked for and
+    available, otherwise PNG for images with transparency and JPEG for the
+    other ones"""
+    if image_format == 'WEBP' and features.check('webp'):
+        return 'WEBP'
+    if image_format in ('JPEG', 'PNG'):
+        return image_format
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+    return 'PNG' if has_alpha else 'JPEG'
+
+
+def normalize_image(path, max_size, image_format, quality):
+    """Rotates an image file as its EXIF orientation says, scales it down to
+    fit in `max_size` pixels, and re-encodes it without metadata next to
+    the original. Returns the path of the new file, or the original path
+    for images kept as they are, such as animations.
+
+    Runs in the processes of the normalization pool"""
+    with Image.open(path) as image:
+        if getattr(image, 'is_animated', False):
+            return path
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+        chosen = choose_format(image, image_format)
+        if chosen == 'JPEG':
+            image = image.convert('RGB')
+            options = {'quality': quality, 'optimize': True,
+                       'progressive': True}
+        elif chosen == 'PNG':
+            if image.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            options = {'optimize': True}
+        else:
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            options = {'quality': quality, 'method': 4}
+        # Only what is given is written: no EXIF, ICC profile nor comment
+        destination = os.path.splitext(path)[0] + '.normalized'\
+            + EXTENSIONS[chosen]
+        image.save(destination, chosen, **options)
+    return destination
+
+
+def normalize_staged_image(path):
+    """Normalizes a staged image in the process pool, and returns the path
+    of the file to upload"""
+    config = get_normalization_settings()
+    if not config['max_size']:
+        return path
+    return get_normalization_pool().submit(
+        normalize_image, path, **config).result()
+
+
+def describe_image(path, placeholder_size):
+    """Returns the width, height and size in bytes of an image file, and a
+    data URI of a thumbnail of it, `placeholder_size` pixels at most, for
+    the clients to blur while the image loads.
+
+    Runs in the processes of the normalization pool"""
+    with Image.open(path) as image:
+        width, height = image.size
+        image.thumbnail((placeholder_size, placeholder_size), Image.BILINEAR)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (
+            image.mode == 'P' and 'transparency' in image.info)
+        thumbnail = BytesIO()
+        if has_alpha:
+            image.convert('RGBA').save(thumbnail, 'PNG', optimize=True)
+            media_type = 'image/png'
+        else:
+            image.convert('RGB').save(thumbnail, 'JPEG', quality=60)
+            media_type = 'image/jpeg'
+    encoded = base64.b64encode(thumbnail.getvalue()).decode('ascii')
+    return {
+        'width': width,
+        'height': height,
+        'bytes': os.path.getsize(path),
+        'placeholder': f'data:{media_type};base64,{encoded}',
+    }
+
+
+def describe_staged_image(path):
+    """Describes an image file in the process pool"""
+    return get_normalization_pool().submit(
+        describe_image, path, get_placeholder_size()).result()
@@ -0,0 +1,147 @@
+import logging
+from datetime import timedelta
+from threading import Event, Lock, Thread
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, transaction
+from django.utils import timezone
+from core.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def get_outbox_setting(name, default):
+    return getattr(settings, 'OUTBOX', {}).get(name, default)
+
+
+def queue_mail(subject, body, from_email, to):
+    """Stores an email in the outbox and wakes the worker up once the
+    current transaction is committed"""
+    message = OutboxMessage.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email,
+        to=list(to)
+    )
+    if get_outbox_setting('WORKER_THREAD', True):
+        transaction.on_commit(outbox_worker.wake)
+    return message
+
+
+def retry_delay(attempts):
+    """Returns the delay before the next attempt, doubling with each
+    failed one"""
+    base = get_outbox_setting('RETRY_DELAY', 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1),
+                                 get_outbox_setting('MAX_RETRY_DELAY', 3600)))
+
+
+def pending_messages():
+    return OutboxMessage.objects.filter(
+        sent__isnull=True,
+        attempts__lt=get_outbox_setting('MAX_ATTEMPTS', 5)
+    )
+
+
+def claim_messages(limit):
+    """Leases the due messages so that concurrent workers skip them"""
+    now = timezone.now()
+    lease = now + timedelta(seconds=get_outbox_setting('LEASE', 300))
+    claimed = []
+    for message in pending_messages().filter(
+            next_attempt__lte=now).order_by('next_attempt')[:limit]:
+        if OutboxMessage.objects.filter(
+                pk=message.pk, next_attempt=message.next_attempt
+        ).update(next_attempt=lease):
+            claimed.append(message)
+    return claimed
+
+
+def record_failure(message, error):
+    message.attempts += 1
+    message.next_attempt = timezone.now() + retry_delay(message.attempts)
+    message.last_error = str(error)
+    message.save(update_fields=['attempts', 'next_attempt', 'last_error'])
+
+
+def deliver_outbox(limit=100, connection=None):
+    """Sends the due messages of the outbox over a single SMTP connection
+    and returns how many were sent"""
+    messages = claim_messages(limit)
+    if not messages:
+        return 0
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as error:
+        logger.warning('Could not connect to the mail server: %s', error)
+        for message in messages:
+            record_failure(message, error)
+        return 0
+    sent = 0
+    try:
+        for message in messages:
+            email = EmailMessage(
+                message.subject,
+                message.body,
+                message.from_email,
+                message.to,
+                connection=connection
+            )
+            try:
+                connection.send_messages([email])
+            except Exception as error:
+                logger.warning('Could not send outbox message %s: %s',
+                               message.pk, error)
+                record_failure(message, error)
+            else:
+                message.sent = timezone.now()
+                message.save(update_fields=['sent'])
+                sent += 1
+    finally:
+        connection.close()
+    return sent
+
+
+class OutboxWorker:
+    """Background thread draining the outbox, started on demand and
+    stopping once no message is left to send"""
+
+    def __init__(self):
+        self._wakeup = Event()
+        self._lock = Lock()
+        self._thread = None
+
+    def wake(self):
+        self._wakeup.set()
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self.run, name='outbox-worker', daemon=True)
+                self._thread.start()
+
+    def run(self):
+        try:
+            while True:
+                self._wakeup.clear()
+                deliver_outbox()
+                next_attempt = pending_messages().order_by(
+                    'next_attempt').values_list(
+                        'next_attempt', flat=True).first()
+                if next_attempt is None:
+                    with self._lock:
+                        if not self._wakeup.is_set():
+                            self._thread = None
+                            return
+                    continue
+                delay = (next_attempt - timezone.now()).total_seconds()
+                self._wakeup.wait(max(delay, 0))
+        except Exception:
+            logger.exception('The outbox worker stopped')
+            with self._lock:
+                self._thread = None
+        finally:
+            connections.close_all()
+
+
+outbox_worker = OutboxWorker()
@@ -0,0 +1,213 @@
+import glob
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from threading import Lock
+import cloudinary
+from PIL import Image, features
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils._os import safe_join
+from django.utils.module_loading import import_string
+from core.cloudinary_client import CloudinaryClient, get_client_settings
+
+# Media types of the formats of the derivatives, as srcset sources declare
+MEDIA_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+}
+
+# Pillow formats the local storage encodes the derivatives with
+PILLOW_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG', 'png': 'PNG'}
+
+# What the stored values put before the public ID and format of an image
+STORED_VALUE_PREFIX_RE = re.compile(
+    r'(image|raw|video)/(upload|private|authenticated)/v\d+/')
+
+_storage = None
+_storage_lock = Lock()
+
+
+def get_derivative_specs():
+    """Returns the (width, format) of each derivative the IMAGE_DERIVATIVES
+    setting asks to build at upload time"""
+    config = getattr(settings, 'IMAGE_DERIVATIVES', {})
+    return [(width, image_format)
+            for image_format in config.get('FORMATS', ())
+            for width in config.get('WIDTHS', ())]
+
+
+def build_srcset(derivatives):
+    """Groups the derivatives by media type into srcset attributes, the
+    narrowest first"""
+    widths = {}
+    for derivative in derivatives:
+        media_type = MEDIA_TYPES[derivative['format']]
+        widths.setdefault(media_type, {})[derivative['width']] = \
+            derivative['url']
+    return {
+        media_type: ', '.join(f'{urls[width]} {width}w'
+                              for width in sorted(urls))
+        for media_type, urls in widths.items()
+    }
+
+
+def upload_file(storage, image_file):
+    """Uploads an image file received in a request through a temporary
+    file, and returns its stored value"""
+    extension = os.path.splitext(image_file.name or '')[1].lower()
+    with tempfile.NamedTemporaryFile(suffix=extension) as temporary:
+        for chunk in image_file.chunks():
+            temporary.write(chunk)
+        temporary.flush()
+        value, _ = storage.upload(temporary.name)
+    return value
+
+
+class CloudinaryStorage:
+    """Sends the images to Cloudinary, with the given upload options.
+
+    The credentials of the CLOUDINARY setting are only configured once the
+    storage is used, so that the other storages need none"""
+
+    def __init__(self, **options):
+        self.options = options
+        cloudinary.config(**getattr(settings, 'CLOUDINARY', {}))
+        self.client = CloudinaryClient(**get_client_settings())
+
+    def build_url(self, resource, **options):
+        return cloudinary.CloudinaryResource.build_url(resource, **options)
+
+    def upload(self, path, derivatives=()):
+        """Uploads an image file along with the derivatives of the given
+        (width, format), transformed eagerly. Returns the value
+        CloudinaryField stores for the image, and the URL, actual width and
+        format of each derivative"""
+        options = dict(self.options)
+        if derivatives:
+            options['eager'] = [
+                {'width': width, 'crop': 'limit', 'format': image_format}
+                for width, image_format in derivatives
+            ]
+        result = self.client.upload(path, **options)
+        resource = cloudinary.CloudinaryResource(
+            public_id=result['public_id'], format=result.get('format'),
+            version=result.get('version'), type=result.get('type'),
+            resource_type=result.get('resource_type'))
+        return resource.get_prep_value(), [
+            {'url': eager['secure_url'], 'width': eager['width'],
+             'format': image_format}
+            for (_, image_format), eager in zip(
+                derivatives, result.get('eager', []))
+        ]
+
+    def download(self, image, destination):
+        """Writes the stored original of an image to a file"""
+        self.client.download(image.build_url(secure=True), destination)
+
+    def delete(self, public_ids):
+        self.client.delete_resources(public_ids)
+
+    def stats(self):
+        """Returns the state of the circuit breaker of the calls to
+        Cloudinary, and the latency histogram of each operation, bounded by
+        strings as the JSON keys are"""
+        latency = self.client.latency_snapshot()
+        for histogram in latency.values():
+            histogram['buckets'] = {
+                '+Inf' if bound == float('inf') else str(bound): count
+                for bound, count in histogram['buckets'].items()}
+        return {'circuit': self.client.breaker.state, 'latency': latency}
+
+
+class LocalStorage:
+    """Copies the images to a local directory, under the values Cloudinary
+    would store them with, and builds their derivatives with Pillow, so that
+    uploads work without the network. The images are served by
+    `core.views.serve_image` under `base_url`"""
+
+    def __init__(self, location, folder='local', base_url='/media/images/'):
+        self.location = str(location)
+        self.folder = folder
+        self.base_url = base_url
+
+    def build_url(self, resource, **options):
+        return self.base_url + resource.get_prep_value()
+
+    def path(self, name):
+        """Returns the path of the file of an image URL, after `base_url`.
+        Raises SuspiciousFileOperation for the names outside the storage"""
+        return safe_join(
+            self.location, STORED_VALUE_PREFIX_RE.sub('', name, count=1))
+
+    def upload(self, path, derivatives=()):
+        public_id = f'{self.folder}/{uuid.uuid4().hex}'
+        extension = os.path.splitext(path)[1].lower()
+        destination = os.path.join(self.location, public_id + extension)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(path, destination)
+        built = []
+        with Image.open(path) as image:
+            for width, image_format in derivatives:
+                built.append(self.build_derivative(
+                    image, public_id, width, image_format))
+        value = f'image/upload/v{int(time.time())}/{public_id}{extension}'
+        return value, [derivative for derivative in built if derivative]
+
+    def download(self, image, destination):
+        shutil.copyfile(os.path.join(
+            self.location, f'{image.public_id}.{image.format}'), destination)
+
+    def delete(self, public_ids):
+        for public_id in public_ids:
+            stem = os.path.join(self.location, glob.escape(public_id))
+            for path in glob.glob(stem + '.*') + glob.glob(stem + '_*.*'):
+                os.remove(path)
+
+    def stats(self):
+        """Returns nothing, the local storage makes no network call"""
+        return {}
+
+    def build_derivative(self, image, public_id, width, image_format):
+        """Scales a copy of the image down to `width` at most, as the
+        'limit' crop of Cloudinary does, or returns None for the formats
+        Pillow cannot encode"""
+        pillow_format = PILLOW_FORMATS.get(image_format)
+        if pillow_format is None or (
+                pillow_format == 'WEBP' and not features.check('webp')):
+            return None
+        derivative = image.copy()
+        derivative.thumbnail((width, derivative.height), Image.LANCZOS)
+        if pillow_format == 'JPEG':
+            derivative = derivative.convert('RGB')
+        name = f'{public_id}_{width}.{image_format}'
+        derivative.save(os.path.join(self.location, name), pillow_format)
+        return {'url': self.base_url + name, 'width': derivative.width,
+                'format': image_format}
+
+
+def get_image_storage():
+    """Returns the image storage described by the IMAGE_STORAGE setting,
+    built once"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            config = getattr(settings, 'IMAGE_STORAGE', {})
+            backend = import_string(
+                config.get('BACKEND', 'core.storage.CloudinaryStorage'))
+            _storage = backend(**config.get('OPTIONS', {}))
+        return _storage
+
+
+@receiver(setting_changed)
+def reset_image_storage(setting, **kwargs):
+    global _storage
+    if setting in ('IMAGE_STORAGE', 'CLOUDINARY', 'CLOUDINARY_CLIENT'):
+        with _storage_lock:
+            _storage = None
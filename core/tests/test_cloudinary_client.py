@@ -0,0 +1,215 @@
+import json
+import os
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from unittest.mock import patch
+import cloudinary
+from PIL import Image
+from django.test import SimpleTestCase, override_settings
+from core.cloudinary_client import CircuitOpenError, CloudinaryClient,\
+    CloudinaryError
+from core.storage import CloudinaryStorage
+
+
+class FakeCloudinaryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def respond(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.server.requests.append({
+            'method': self.command,
+            'path': self.path,
+            'headers': self.headers,
+            'body': self.rfile.read(length),
+            'client': self.client_address,
+        })
+        status, payload, delay = self.server.responses.pop(0) \
+            if self.server.responses else (200, {}, 0)
+        time.sleep(delay)
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except ConnectionError:
+            pass
+
+    do_GET = do_POST = do_DELETE = respond
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CloudinaryClientTests(SimpleTestCase):
+    """Tests for the Cloudinary client, against a local fake server
+    answering the scripted (status, JSON, delay) responses"""
+
+    def setUp(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeCloudinaryHandler)
+        server.daemon_threads = True
+        server.requests = []
+        server.responses = []
+        Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.server = server
+        config = patch.multiple(
+            cloudinary.config(), create=True, cloud_name='demo',
+            api_key='key', api_secret='secret',
+            upload_prefix=f'http://127.0.0.1:{server.server_port}')
+        config.start()
+        self.addCleanup(config.stop)
+        self.sleeps = []
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'image.png')
+        Image.new('RGB', (10, 10)).save(self.path)
+
+    def build_client(self, **options):
+        return CloudinaryClient(sleep=self.sleeps.append, **{
+            'retries': 2, 'backoff': 0.5, 'read_timeout': 2, **options})
+
+    def server_url(self, path):
+        return f'http://127.0.0.1:{self.server.server_port}{path}'
+
+    def test_upload(self):
+        """Test that the storage sends signed uploads, and reads their
+        value and eager derivatives"""
+        self.server.responses.append((200, {
+            'public_id': 'f/abc', 'version': 3, 'format': 'png',
+            'type': 'upload', 'resource_type': 'image',
+            'eager': [{'secure_url': 'https://cdn/320.webp', 'width': 320}],
+        }, 0))
+        with override_settings(CLOUDINARY={}):
+            storage = CloudinaryStorage(folder='f')
+        value, derivatives = storage.upload(self.path, [(320, 'webp')])
+
+        self.assertEqual(value, 'image/upload/v3/f/abc.png')
+        self.assertEqual(derivatives, [
+            {'url': 'https://cdn/320.webp', 'width': 320, 'format': 'webp'},
+        ])
+        request = self.server.requests[0]
+        self.assertEqual(request['path'], '/v1_1/demo/image/upload')
+        for field in (b'signature', b'api_key', b'public_id', b'overwrite'):
+            self.assertIn(b'name="' + field + b'"', request['body'])
+        self.assertIn(b'c_limit,w_320/webp', request['body'])
+        self.assertIn(b'filename="image.png"', request['body'])
+
+    def test_delete(self):
+        """Test that the images are deleted in one Admin API call"""
+        self.build_client().delete_resources(['a', 'b'])
+
+        request = self.server.requests[0]
+        self.assertEqual(request['method'], 'DELETE')
+        self.assertEqual(
+            request['path'], '/v1_1/demo/resources/image/upload'
+            '?public_ids%5B%5D=a&public_ids%5B%5D=b')
+        self.assertTrue(request['headers']['Authorization'].startswith(
+            'Basic '))
+
+    def test_keep_alive(self):
+        """Test that the calls reuse the connections of the pool"""
+        client = self.build_client()
+        client.delete_resources(['a'])
+        client.delete_resources(['b'])
+
+        clients = {request['client'] for request in self.server.requests}
+        self.assertEqual(len(clients), 1)
+
+    def test_retry(self):
+        """Test that the transient failures are retried after a jittered
+        backoff"""
+        self.server.responses.extend([(503, {}, 0), (500, {}, 0)])
+        self.build_client().delete_resources(['a'])
+
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0 <= self.sleeps[0] <= 0.5)
+        self.assertTrue(0 <= self.sleeps[1] <= 1)
+
+    def test_client_error(self):
+        """Test that the errors of the request are raised at once, without
+        counting as failures of Cloudinary"""
+        self.server.responses.append(
+            (400, {'error': {'message': 'Invalid public ID'}}, 0))
+        client = self.build_client(failure_threshold=1)
+        with self.assertRaisesMessage(CloudinaryError, 'Invalid public ID'):
+            client.delete_resources(['a'])
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(client.breaker.state, 'closed')
+
+    def test_timeout(self):
+        """Test that a slow Cloudinary fails the call once its timeout
+        passed"""
+        self.server.responses.append((200, {}, 1))
+        client = self.build_client(read_timeout=0.1, retries=0)
+        with self.assertRaises(CloudinaryError):
+            client.delete_resources(['a'])
+
+        histogram = client.latency_snapshot()['delete']
+        self.assertEqual(histogram['count'], 1)
+        self.assertLess(histogram['sum'], 1)
+
+    def test_circuit_breaker(self):
+        """Test that the calls fail fast once the circuit is open, until a
+        trial call succeeds"""
+        clock = FakeClock()
+        client = self.build_client(retries=0, failure_threshold=2,
+                                   reset_timeout=30, clock=clock)
+        self.server.responses.extend([(500, {}, 0), (500, {}, 0)])
+        for _ in range(2):
+            with self.assertRaises(CloudinaryError):
+                client.delete_resources(['a'])
+
+        self.assertEqual(client.breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            client.delete_resources(['a'])
+        self.assertEqual(len(self.server.requests), 2)
+
+        clock.now = 31
+        client.delete_resources(['a'])
+        self.assertEqual(client.breaker.state, 'closed')
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_failed_trial(self):
+        """Test that a failed trial call opens the circuit again"""
+        clock = FakeClock()
+        client = self.build_client(retries=0, failure_threshold=1,
+                                   reset_timeout=30, clock=clock)
+        self.server.responses.extend([(500, {}, 0), (503, {}, 0)])
+        with self.assertRaises(CloudinaryError):
+            client.delete_resources(['a'])
+        clock.now = 31
+        with self.assertRaises(CloudinaryError):
+            client.delete_resources(['a'])
+
+        clock.now = 40
+        with self.assertRaises(CircuitOpenError):
+            client.delete_resources(['a'])
+
+    def test_latency(self):
+        """Test that the latency of each operation is recorded in its
+        histogram"""
+        client = self.build_client()
+        client.delete_resources(['a'])
+        client.delete_resources(['b'])
+        client.download(self.server_url('/demo/image.png'),
+                        self.path + '.download')
+
+        snapshot = client.latency_snapshot()
+        self.assertEqual(snapshot['delete']['count'], 2)
+        self.assertEqual(snapshot['download']['count'], 1)
+        self.assertEqual(snapshot['delete']['buckets'][float('inf')], 2)
@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import call, patch
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from core.images import delete_image_on_commit
+from core.models import Project, Technology
+
+
+class DeferredDeletionTests(TestCase):
+    """Tests for the deletion of the images after commit"""
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        patcher = patch('core.images.get_image_executor',
+                        return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for index in range(3):
+            Technology.objects.create(
+                name=f'Tech {index}',
+                image=f'image/upload/v1/tech{index}.png'
+            )
+
+    @patch('core.storage.CloudinaryStorage.delete')
+    def test_batched_after_commit(self, delete_resources):
+        """Test that the images of a transaction are deleted in one call
+        after the commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Technology.objects.all().delete()
+            delete_resources.assert_not_called()
+        self.executor.shutdown(wait=True)
+
+        delete_resources.assert_called_once_with(
+            ['tech0', 'tech1', 'tech2'])
+
+    @patch('core.storage.CloudinaryStorage.delete')
+    def test_rolled_back(self, delete_resources):
+        """Test that no image is deleted when the transaction is rolled
+        back"""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Technology.objects.all().delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            Project.objects.create(
+                name={"en": "Test project", "fr": "Projet test"},
+                description={"en": ["Test desc"], "fr": ["Test desc"]},
+                image='image/upload/v1/project.png'
+            )
+            Project.objects.get().delete()
+        self.executor.shutdown(wait=True)
+
+        self.assertEqual(Technology.objects.count(), 3)
+        delete_resources.assert_called_once_with(['project'])
+
+    @patch('core.storage.CloudinaryStorage.delete')
+    def test_batches_released(self, delete_resources):
+        """Test that the connection forgets the batches once flushed or
+        rolled back"""
+        batches = transaction.get_connection().__dict__.setdefault(
+            'image_deletions', {})
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        Technology.objects.first().delete()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                with transaction.atomic():
+                    Technology.objects.first().delete()
+                self.assertEqual(len(batches), 1)
+            self.assertEqual(batches, {})
+        self.executor.shutdown(wait=True)
+
+        self.assertEqual(delete_resources.call_count, 3)
+
+    @patch('core.storage.CloudinaryStorage.delete')
+    def test_without_image(self, delete_resources):
+        """Test that deleting a project without image calls nothing"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.create(
+                name={"en": "Test project", "fr": "Projet test"},
+                description={"en": ["Test desc"], "fr": ["Test desc"]}
+            ).delete()
+        self.executor.shutdown(wait=True)
+        delete_resources.assert_not_called()
+
+
+class AutocommitDeletionTests(TransactionTestCase):
+    """Tests for the deletion of the images outside of any transaction"""
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        patcher = patch('core.images.get_image_executor',
+                        return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('core.storage.CloudinaryStorage.delete')
+    def test_autocommit(self, delete_resources):
+        """Test that the images deleted in autocommit are deleted at once"""
+        delete_image_on_commit('lone')
+        Technology.objects.create(name='Tech',
+                                  image='image/upload/v1/tech.png')
+        Technology.objects.get().delete()
+        self.executor.shutdown(wait=True)
+
+        self.assertEqual(delete_resources.call_args_list,
+                         [call(['lone']), call(['tech'])])
+        self.assertEqual(
+            transaction.get_connection().__dict__.get('image_deletions'), {})
@@ -1,3 +1,5 @@
+import uuid
+from django.db import IntegrityError
 from django.test import TestCase
 from core import models
 from unittest.mock import patch
@@ -291,6 +293,24 @@ class ReviewModelTests(TestCase):
         self.review.refresh_from_db()
         self.assertEqual(code, self.review.update_code)
 
+    def test_find_review_by_code(self):
+        """Test looking a review up by its update code"""
+        code = str(self.review.update_code)
+        self.assertEqual(models.find_review_by_code(code), self.review)
+        self.assertEqual(
+            models.find_review_by_code(code.replace('-', '').upper()),
+            self.review)
+        self.assertIsNone(models.find_review_by_code(str(uuid.uuid4())))
+        self.assertIsNone(models.find_review_by_code('30a'))
+        self.assertIsNone(models.find_review_by_code(None))
+
+    def test_update_code_unique(self):
+        """Test that two reviews cannot share an update code"""
+        with self.assertRaises(IntegrityError):
+            models.Review.objects.filter(pk=models.Review.objects.create(
+                message={"en": "", "fr": ""}
+            ).pk).update(update_code=self.review.update_code)
+
     def test_modified(self):
         """Test that the modified field doesn't change on creation"""
         self.assertFalse(self.review.modified)
@@ -466,3 +486,35 @@ class ProjectModelTests(TestCase):
             name={"en": "Test en", "fr": "Test fr"},
             description={"en": ["Test desc"], "fr": ["Desc test"]}
         )
+
+
+class SortKeyTest(TestCase):
+
+    def test_sort_key(self):
+        """Test that the sort key ignores case, accents and ligatures"""
+        self.assertEqual(models.sort_key('Élève'), 'eleve')
+        self.assertEqual(models.sort_key('Cœur'), 'coeur')
+
+    def test_long_name(self):
+        """Test that the sort key of a long name fits in its column"""
+        project = models.Project.objects.create(
+            name={"en": "É" * 300, "fr": "Cœur " * 60},
+            description={"en": ["test"], "fr": ["test"]}
+        )
+        project.refresh_from_db()
+        self.assertEqual(project.name_en, 'e' * models.SORT_KEY_LENGTH)
+        self.assertEqual(len(project.name_fr), models.SORT_KEY_LENGTH)
+
+    def test_sort_keys_saved(self):
+        """Test that saving keeps the sort key columns in sync"""
+        project = models.Project.objects.create(
+            name={"en": "Heart", "fr": "Cœur"},
+            description={"en": ["test"], "fr": ["test"]}
+        )
+        self.assertEqual(project.name_en, 'heart')
+        self.assertEqual(project.name_fr, 'coeur')
+
+        project.name = {"en": "Éclair", "fr": "Éclair"}
+        project.save()
+        project.refresh_from_db()
+        self.assertEqual(project.name_en, 'eclair')
@@ -0,0 +1,113 @@
+import base64
+import os
+import tempfile
+from io import BytesIO
+from unittest import skipUnless
+from PIL import Image, features
+from django.test import SimpleTestCase, override_settings
+from core.normalization import describe_image, describe_staged_image,\
+    normalize_image, normalize_staged_image
+
+# EXIF orientation asking for a rotation of 90 degrees clockwise
+ROTATED = 6
+
+
+class NormalizationTests(SimpleTestCase):
+    """Tests for the normalization of the uploaded images"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def save(self, image, name, **options):
+        path = os.path.join(self.directory, name)
+        image.save(path, **options)
+        return path
+
+    def test_downscale(self):
+        """Test that large images are scaled down to fit, keeping their
+        ratio, and small ones are kept"""
+        path = self.save(Image.new('RGB', (4000, 1000)), 'large.png')
+        with Image.open(normalize_image(path, 2048, 'auto', 80)) as image:
+            self.assertEqual(image.size, (2048, 512))
+
+        path = self.save(Image.new('RGB', (40, 10)), 'small.png')
+        with Image.open(normalize_image(path, 2048, 'auto', 80)) as image:
+            self.assertEqual(image.size, (40, 10))
+
+    def test_strip_metadata(self):
+        """Test that the EXIF orientation is applied and the metadata
+        dropped"""
+        exif = Image.Exif()
+        exif[0x0112] = ROTATED
+        exif[0x010f] = 'Camera maker'
+        path = self.save(Image.new('RGB', (20, 10)), 'photo.jpg',
+                         exif=exif.tobytes(), comment=b'Comment')
+        with Image.open(normalize_image(path, 2048, 'JPEG', 80)) as image:
+            self.assertEqual(image.size, (10, 20))
+            self.assertEqual(dict(image.getexif()), {})
+            self.assertNotIn('comment', image.info)
+
+    def test_formats(self):
+        """Test that opaque images become JPEG and transparent ones PNG"""
+        opaque = self.save(Image.new('RGB', (10, 10)), 'opaque.png')
+        transparent = self.save(Image.new('RGBA', (10, 10)), 'alpha.png')
+
+        self.assertTrue(normalize_image(opaque, 64, 'auto', 80)
+                        .endswith('.jpg'))
+        self.assertTrue(normalize_image(transparent, 64, 'auto', 80)
+                        .endswith('.png'))
+
+    @skipUnless(features.check('webp'), 'Pillow has no WebP support')
+    def test_webp(self):
+        """Test that images are re-encoded as WebP when asked for"""
+        path = self.save(Image.new('RGBA', (10, 10)), 'alpha.png')
+        with Image.open(normalize_image(path, 64, 'WEBP', 80)) as image:
+            self.assertEqual(image.format, 'WEBP')
+
+    def test_animation_kept(self):
+        """Test that animations are uploaded as they are"""
+        frames = [Image.new('P', (10, 10), color) for color in (0, 1)]
+        path = self.save(frames[0], 'animation.gif', save_all=True,
+                         append_images=frames[1:])
+
+        self.assertEqual(normalize_image(path, 5, 'auto', 80), path)
+
+    def test_process_pool(self):
+        """Test that staged images are normalized by the process pool, as
+        configured"""
+        path = self.save(Image.new('RGB', (300, 100)), 'staged.png')
+        with override_settings(IMAGE_NORMALIZATION={
+                'MAX_SIZE': 30, 'FORMAT': 'PNG'}):
+            normalized = normalize_staged_image(path)
+        with Image.open(normalized) as image:
+            self.assertEqual((image.format, image.size), ('PNG', (30, 10)))
+
+        with override_settings(IMAGE_NORMALIZATION={'MAX_SIZE': None}):
+            self.assertEqual(normalize_staged_image(path), path)
+
+    def test_describe(self):
+        """Test that the size, weight and placeholder of an image are
+        computed"""
+        path = self.save(Image.new('RGBA', (300, 100)), 'alpha.png')
+        details = describe_image(path, 16)
+
+        self.assertEqual((details['width'], details['height']), (300, 100))
+        self.assertEqual(details['bytes'], os.path.getsize(path))
+        prefix = 'data:image/png;base64,'
+        self.assertTrue(details['placeholder'].startswith(prefix))
+        placeholder = base64.b64decode(details['placeholder'][len(prefix):])
+        with Image.open(BytesIO(placeholder)) as image:
+            self.assertEqual(image.size, (16, 5))
+
+    def test_describe_process_pool(self):
+        """Test that opaque images get JPEG placeholders, described by the
+        process pool"""
+        path = self.save(Image.new('RGB', (10, 20)), 'opaque.png')
+        with override_settings(IMAGE_PLACEHOLDER_SIZE=8):
+            details = describe_staged_image(path)
+
+        self.assertTrue(details['placeholder'].startswith(
+            'data:image/jpeg;base64,'))
+        self.assertEqual((details['width'], details['height']), (10, 20))
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from core.models import OutboxMessage
+from core.outbox import deliver_outbox, queue_mail
+
+
+class CountingBackend(EmailBackend):
+    """Locmem backend counting the connections it opens"""
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def queue(self, subject='Hello'):
+        return queue_mail(subject, 'Name: Test\nMessage',
+                          'sender@example.com', ['receiver@example.com'])
+
+    def test_queue_mail(self):
+        """Test that queuing an email does not send it"""
+        message = self.queue()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertIsNone(message.sent)
+        self.assertEqual(message.to, ['receiver@example.com'])
+
+    def test_deliver(self):
+        """Test that the due messages are sent over a single connection"""
+        self.queue('First')
+        self.queue('Second')
+        sent = deliver_outbox(connection=CountingBackend())
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual([m.subject for m in mail.outbox],
+                         ['First', 'Second'])
+        self.assertEqual(mail.outbox[0].from_email, 'sender@example.com')
+        self.assertEqual(mail.outbox[0].to, ['receiver@example.com'])
+        self.assertFalse(OutboxMessage.objects.filter(
+            sent__isnull=True).exists())
+
+    def test_sent_only_once(self):
+        """Test that a sent message is not delivered again"""
+        self.queue()
+        deliver_outbox()
+        self.assertEqual(deliver_outbox(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_retry_with_backoff(self):
+        """Test that a failed message is retried later"""
+        message = self.queue()
+        with patch.object(EmailBackend, 'send_messages',
+                          side_effect=OSError('Connection reset')):
+            self.assertEqual(deliver_outbox(), 0)
+
+        message.refresh_from_db()
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(message.last_error, 'Connection reset')
+        self.assertGreater(message.next_attempt, timezone.now())
+        self.assertEqual(deliver_outbox(), 0)
+
+        OutboxMessage.objects.update(
+            next_attempt=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(deliver_outbox(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_connection_failure(self):
+        """Test that the messages are kept when the server is unreachable"""
+        self.queue()
+        with patch.object(EmailBackend, 'open',
+                          side_effect=OSError('Unreachable')):
+            self.assertEqual(deliver_outbox(), 0)
+        self.assertEqual(OutboxMessage.objects.get().attempts, 1)
+
+    def test_max_attempts(self):
+        """Test that a message is given up after too many attempts"""
+        self.queue()
+        OutboxMessage.objects.update(attempts=5)
+        self.assertEqual(deliver_outbox(), 0)
+
+    def test_send_outbox_command(self):
+        """Test the command draining the outbox"""
+        self.queue()
+        call_command('send_outbox')
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,164 @@
+import os
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+from PIL import Image
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from core.fields import StoredImageField
+from core.models import Technology
+from core.storage import LocalStorage, build_srcset, get_image_storage
+from rest.rows import get_image_url_prefix
+
+
+class SrcsetTests(SimpleTestCase):
+    """Tests for the srcset built from the derivatives"""
+
+    def test_build_srcset(self):
+        """Test that the derivatives are grouped by media type, the
+        narrowest first"""
+        srcset = build_srcset([
+            {'url': '/big.jpg', 'width': 640, 'format': 'jpg'},
+            {'url': '/small.webp', 'width': 320, 'format': 'webp'},
+            {'url': '/small.jpg', 'width': 320, 'format': 'jpg'},
+        ])
+
+        self.assertEqual(srcset, {
+            'image/jpeg': '/small.jpg 320w, /big.jpg 640w',
+            'image/webp': '/small.webp 320w',
+        })
+
+
+class LocalStorageTests(SimpleTestCase):
+    """Tests for the local image storage"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = directory.name
+        self.path = os.path.join(self.location, 'staged.png')
+        Image.new('RGB', (1000, 500), 'red').save(self.path)
+
+    def test_derivatives(self):
+        """Test that the derivatives are scaled down but never up, and that
+        the formats Pillow cannot encode are skipped"""
+        storage = LocalStorage(self.location, base_url='/images/')
+        value, derivatives = storage.upload(
+            self.path, [(320, 'jpg'), (1280, 'jpg'), (320, 'avif')])
+
+        self.assertTrue(value.startswith('image/upload/v'))
+        self.assertEqual([d['width'] for d in derivatives], [320, 1000])
+        for derivative in derivatives:
+            self.assertTrue(derivative['url'].startswith('/images/local/'))
+            name = derivative['url'][len('/images/'):]
+            with Image.open(os.path.join(self.location, name)) as image:
+                self.assertEqual(image.format, 'JPEG')
+                self.assertEqual(image.width, derivative['width'])
+
+    def test_delete(self):
+        """Test that deleting an image removes its derivatives too"""
+        storage = LocalStorage(self.location)
+        value, _ = storage.upload(self.path, [(320, 'jpg')])
+        kept, _ = storage.upload(self.path, [(320, 'jpg')])
+        storage.delete([StoredImageField().to_python(value).public_id])
+
+        name = os.path.basename(StoredImageField().to_python(kept).public_id)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.location, 'local'))),
+            [name + '.png', name + '_320.jpg'])
+
+    def test_path(self):
+        """Test that the URLs map to the files of the storage only"""
+        storage = LocalStorage(self.location)
+
+        self.assertEqual(storage.path('image/upload/v1/local/a.png'),
+                         os.path.join(self.location, 'local', 'a.png'))
+        self.assertEqual(storage.path('local/a_320.jpg'),
+                         os.path.join(self.location, 'local', 'a_320.jpg'))
+        with self.assertRaises(SuspiciousFileOperation):
+            storage.path('../secret')
+
+
+class CloudinaryStorageTests(SimpleTestCase):
+    """Tests for the Cloudinary image storage"""
+
+    @patch('core.storage.cloudinary.config')
+    def test_lazy_config(self, config):
+        """Test that Cloudinary is configured once its storage is used"""
+        with override_settings(CLOUDINARY={'cloud_name': 'cloud'}):
+            config.assert_not_called()
+            get_image_storage()
+            get_image_storage()
+
+        config.assert_called_once_with(cloud_name='cloud')
+
+
+class StoredImageFieldTests(TestCase):
+    """Tests for the image fields backed by the configured storage"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = directory.name
+        settings = override_settings(IMAGE_STORAGE={
+            'BACKEND': 'core.storage.LocalStorage',
+            'OPTIONS': {'location': self.location},
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_url(self):
+        """Test that the URLs of the images are built by the storage, and
+        that the rows keep their fast path"""
+        technology = Technology.objects.create(
+            name='Tech', image='image/upload/v1/local/logo.png')
+        technology.refresh_from_db()
+
+        self.assertEqual(technology.image.url,
+                         '/media/images/image/upload/v1/local/logo.png')
+        self.assertEqual(get_image_url_prefix(), '/media/images/')
+
+    def test_uploaded_file(self):
+        """Test that the files assigned to the field, as by the admin site,
+        are uploaded to the storage"""
+        content = BytesIO()
+        Image.new('RGB', (10, 10)).save(content, 'PNG')
+        technology = Technology.objects.create(
+            name='Tech', image=SimpleUploadedFile(
+                'logo.png', content.getvalue(), 'image/png'))
+
+        path = get_image_storage().path(technology.image.get_prep_value())
+        with open(path, 'rb') as stored:
+            self.assertEqual(stored.read(), content.getvalue())
+
+    def test_serve(self):
+        """Test that the images of the local storage are served as files,
+        and nothing outside of it"""
+        path = os.path.join(self.location, 'local', 'logo.png')
+        os.makedirs(os.path.dirname(path))
+        Image.new('RGB', (10, 10)).save(path)
+        url = reverse('image', kwargs={
+            'name': 'image/upload/v1/local/logo.png'})
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'image/png')
+        with open(path, 'rb') as image:
+            self.assertEqual(b''.join(res.streaming_content), image.read())
+        self.assertEqual(self.client.get(
+            reverse('image', kwargs={'name': 'local/other.png'})
+        ).status_code, 404)
+        self.assertEqual(self.client.get(
+            reverse('image', kwargs={'name': '../../etc/passwd'})
+        ).status_code, 404)
+
+    def test_serve_cloudinary(self):
+        """Test that nothing is served with the Cloudinary storage"""
+        with override_settings(IMAGE_STORAGE={
+                'BACKEND': 'core.storage.CloudinaryStorage'}):
+            res = self.client.get(reverse('image', kwargs={
+                'name': 'image/upload/v1/local/logo.png'}))
+
+        self.assertEqual(res.status_code, 404)
@@ -0,0 +1,122 @@
+import os
+from io import StringIO
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from core.management.commands.benchmark_translations import\
+    legacy_check_translated_MDX_field, legacy_check_translated_field
+from core.translations import TranslatedSchema
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TEXT_VALUES = (
+    {'en': 'Name', 'fr': 'Nom'},
+    {'en': '', 'fr': ''},
+    {'en': 'Name', 'fr': ''},
+    {'en': 'Name'},
+    {'en': 'Name', 'fr': 'Nom', 'de': 'Name'},
+    {'en': 'Name', 'de': 'Name'},
+    {'en': 1, 'fr': 'Nom'},
+    {'en': ['Name'], 'fr': ['Nom']},
+    {'en': None, 'fr': 'Nom'},
+    ['Name', 'Nom'],
+    'Name',
+    None,
+)
+
+LINES_VALUES = (
+    {'en': ['Line', ''], 'fr': ['Ligne', '']},
+    {'en': [], 'fr': ['Ligne']},
+    {'en': ['Line'], 'fr': ['Ligne', 2]},
+    {'en': ['Line', None], 'fr': ['Ligne']},
+    {'en': 'Line', 'fr': ['Ligne']},
+    {'en': ['Line'], 'fr': ['Ligne'], 'de': ['Zeile']},
+    {'en': ['Line']},
+    [['Line'], ['Ligne']],
+    None,
+)
+
+
+def is_valid(check, value, *args):
+    try:
+        check(value, *args)
+    except ValueError:
+        return False
+    return True
+
+
+class TranslatedSchemaTests(TestCase):
+    """Tests for the compiled schemas of the translated fields"""
+
+    def test_text_parity(self):
+        """Test that text schemas accept the values the legacy check did"""
+        for blank in (False, True):
+            schema = TranslatedSchema('Name', blank=blank)
+            for value in TEXT_VALUES:
+                with self.subTest(value=value, blank=blank):
+                    self.assertEqual(
+                        is_valid(schema.validate, value),
+                        is_valid(legacy_check_translated_field,
+                                 value, '', blank)
+                    )
+                    self.assertEqual(schema.check(value) is None,
+                                     is_valid(schema.validate, value))
+
+    def test_lines_parity(self):
+        """Test that line schemas accept the values the legacy check did"""
+        schema = TranslatedSchema('Description', list)
+        for value in LINES_VALUES:
+            with self.subTest(value=value):
+                self.assertEqual(
+                    is_valid(schema.validate, value),
+                    is_valid(legacy_check_translated_MDX_field, value)
+                )
+
+    def test_errors(self):
+        """Test that the errors tell what is wrong with the value"""
+        schema = TranslatedSchema('Description', list)
+
+        self.assertIn('"en" and "fr" keys',
+                      schema.check({'en': ['Line'], 'de': ['Zeile']}))
+        self.assertIn('lists of strings',
+                      schema.check({'en': ['Line'], 'fr': [1]}))
+        self.assertIn('must not be empty',
+                      schema.check({'en': ['Line'], 'fr': []}))
+
+    def test_languages(self):
+        """Test that the schema follows its own language set"""
+        schema = TranslatedSchema('Name', languages=('en', 'fr', 'de'))
+
+        self.assertIsNone(schema.check({'en': 'a', 'fr': 'b', 'de': 'c'}))
+        self.assertIsNotNone(schema.check({'en': 'a', 'fr': 'b'}))
+
+    def test_django_validator(self):
+        """Test that calling the schema raises a ValidationError"""
+        schema = TranslatedSchema('Name')
+
+        schema({'en': 'Name', 'fr': 'Nom'})
+        with self.assertRaises(ValidationError):
+            schema({'en': 'Name'})
+
+    def test_serializer_errors(self):
+        """Test that the API reports the error of a translated field"""
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        res = client.post(reverse('rest:skill-list'), {
+            'name': {'en': 'MDX'},
+            'description': {'en': ['Line'], 'fr': ['Ligne']},
+            'date': [6, 2021],
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Skill name', res.data['name'][0])
+
+    def test_benchmark_command(self):
+        """Test that the benchmark reports both implementations"""
+        out = StringIO()
+        call_command('benchmark_translations', lines=10, values=2,
+                     repeat=1, stdout=out)
+
+        self.assertIn('description: legacy', out.getvalue())
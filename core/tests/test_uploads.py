@@ -0,0 +1,357 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from core.models import ImageUpload, Project, StoredImage, Technology
+from core.storage import LocalStorage
+from core import uploads
+from core.uploads import claim_upload, index_image, process_upload,\
+    stage_image
+
+
+def image_bytes(size=(10, 10), image_format='PNG', **options):
+    content = BytesIO()
+    Image.new('RGB', size, 'red').save(content, image_format, **options)
+    return content.getvalue()
+
+
+class InlineExecutor:
+    """Runs the submitted tasks right away"""
+
+    def submit(self, task, *args):
+        task(*args)
+
+
+class UploadPipelineTests(TestCase):
+    """Tests for the staged image uploads"""
+
+    def setUp(self):
+        staging = tempfile.TemporaryDirectory()
+        storage = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        self.addCleanup(storage.cleanup)
+        self.storage_dir = storage.name
+        settings = override_settings(
+            IMAGE_STAGING_DIR=staging.name,
+            IMAGE_STORAGE={
+                'BACKEND': 'core.storage.LocalStorage',
+                'OPTIONS': {'location': storage.name},
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.technology = Technology.objects.create(
+            name='Tech', image='image/upload/v1/old.png')
+
+    def stage(self, instance=None, content=None):
+        return stage_image(
+            instance or self.technology, 'image',
+            SimpleUploadedFile('logo.PNG', content or image_bytes()))
+
+    def test_stage(self):
+        """Test that staging writes the file and records a pending upload,
+        sent once committed"""
+        with patch('core.uploads.submit_upload') as submit_upload:
+            with self.captureOnCommitCallbacks(execute=True):
+                upload = self.stage()
+                submit_upload.assert_not_called()
+
+        submit_upload.assert_called_once_with(upload.pk)
+        self.assertEqual(upload.status, ImageUpload.PENDING)
+        self.assertTrue(upload.path.endswith('.png'))
+        with open(upload.path, 'rb') as staged:
+            self.assertEqual(staged.read(), image_bytes())
+        self.technology.refresh_from_db()
+        self.assertEqual(self.technology.image.public_id, 'old')
+
+    @patch('core.models.delete_image_on_commit')
+    def test_process(self, delete_image_on_commit):
+        """Test that a processed upload sets the image, deletes the replaced
+        one, and removes the staged file"""
+        upload = self.stage()
+        upload = process_upload(upload.pk)
+
+        self.assertEqual(upload.status, ImageUpload.DONE)
+        self.assertFalse(os.path.exists(upload.path))
+        self.technology.refresh_from_db()
+        self.assertEqual(self.technology.image.get_prep_value(), upload.image)
+        image = self.technology.image
+        stored_path = os.path.join(
+            self.storage_dir, f'{image.public_id}.{image.format}')
+        with Image.open(stored_path) as stored:
+            self.assertEqual(stored.size, (10, 10))
+        self.assertEqual(list(self.technology.image_srcset), ['image/jpeg'])
+        self.assertIn(' 10w', self.technology.image_srcset['image/jpeg'])
+        self.assertEqual((self.technology.image_width,
+                          self.technology.image_height), (10, 10))
+        self.assertEqual(self.technology.image_bytes,
+                         os.path.getsize(stored_path))
+        self.assertTrue(self.technology.image_placeholder.startswith(
+            'data:image/jpeg;base64,'))
+        delete_image_on_commit.assert_called_once_with('old', None)
+        self.assertIsNone(process_upload(upload.pk))
+
+    @patch('core.uploads.connections')
+    def test_worker(self, connections):
+        """Test that the workers process the upload once committed, and
+        close their database connections"""
+        with patch('core.uploads.get_image_executor',
+                   return_value=InlineExecutor()):
+            with self.captureOnCommitCallbacks(execute=True):
+                upload = self.stage()
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, ImageUpload.DONE)
+        connections.close_all.assert_called_once()
+
+    def test_superseded(self):
+        """Test that an upload is dropped when a newer one of the same field
+        is staged"""
+        first = self.stage()
+        second = self.stage()
+        first = process_upload(first.pk)
+        second = process_upload(second.pk)
+
+        self.assertEqual(first.status, ImageUpload.FAILED)
+        self.assertEqual(second.status, ImageUpload.DONE)
+        self.technology.refresh_from_db()
+        self.assertEqual(self.technology.image.get_prep_value(), second.image)
+
+    def test_storage_error(self):
+        """Test that a failed upload keeps the current image"""
+        upload = self.stage()
+        with patch('core.storage.LocalStorage.upload',
+                   side_effect=OSError('Unreachable')),\
+                self.assertLogs('core.uploads', 'ERROR'):
+            upload = process_upload(upload.pk)
+
+        self.assertEqual(upload.status, ImageUpload.FAILED)
+        self.assertEqual(upload.error, 'Unreachable')
+        self.assertFalse(os.path.exists(upload.path))
+        self.technology.refresh_from_db()
+        self.assertEqual(self.technology.image.public_id, 'old')
+
+    @patch('core.models.delete_image_on_commit')
+    def test_deleted_instance(self, delete_image_on_commit):
+        """Test that the image of a deleted instance is deleted again"""
+        project = Project.objects.create(
+            name={'en': 'Project', 'fr': 'Projet'},
+            description={'en': ['Line'], 'fr': ['Ligne']})
+        upload = self.stage(project)
+        Project.objects.filter(pk=project.pk).delete()
+        upload = process_upload(upload.pk)
+
+        self.assertEqual(upload.status, ImageUpload.FAILED)
+        delete_image_on_commit.assert_called_once()
+
+    def test_process_uploads_command(self):
+        """Test that the command sends the pending uploads"""
+        self.stage()
+        out = StringIO()
+        call_command('process_uploads', stdout=out)
+
+        self.assertIn('Processed 1 upload(s)', out.getvalue())
+        self.assertEqual(ImageUpload.objects.get().status, ImageUpload.DONE)
+
+    def test_claimed_upload(self):
+        """Test that an upload claimed by another worker is skipped until
+        its lease ends"""
+        upload = self.stage()
+        self.assertEqual(claim_upload(upload.pk).status,
+                         ImageUpload.PROCESSING)
+        with patch.object(uploads, 'send_image') as send_image:
+            self.assertIsNone(process_upload(upload.pk))
+            self.assertEqual(uploads.process_pending_uploads(), 0)
+        send_image.assert_not_called()
+
+        ImageUpload.objects.filter(pk=upload.pk).update(
+            lease=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(uploads.process_pending_uploads(), 1)
+        self.assertEqual(ImageUpload.objects.get().status, ImageUpload.DONE)
+
+    def test_backfill_image_details_command(self):
+        """Test that the command fills in the details of the stored images
+        missing them"""
+        path = os.path.join(self.storage_dir, 'stored.png')
+        with open(path, 'wb') as stored:
+            stored.write(image_bytes((40, 20)))
+        image, _ = LocalStorage(self.storage_dir).upload(path)
+        Technology.objects.filter(pk=self.technology.pk).update(image=image)
+        out = StringIO()
+        call_command('backfill_image_details', stdout=out)
+
+        self.assertIn('Backfilled 1 image(s)', out.getvalue())
+        self.technology.refresh_from_db()
+        self.assertEqual((self.technology.image_width,
+                          self.technology.image_height), (40, 20))
+        self.assertTrue(self.technology.image_placeholder)
+
+
+class DeduplicationTests(TestCase):
+    """Tests for the content-addressed index of the stored images"""
+
+    def setUp(self):
+        staging = tempfile.TemporaryDirectory()
+        storage = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        self.addCleanup(storage.cleanup)
+        settings = override_settings(
+            IMAGE_STAGING_DIR=staging.name,
+            IMAGE_STORAGE={
+                'BACKEND': 'core.storage.LocalStorage',
+                'OPTIONS': {'location': storage.name},
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = patch('core.models.delete_image_on_commit')
+        self.delete_image_on_commit = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.technologies = [Technology.objects.create(name=f'Tech {i}')
+                             for i in range(2)]
+
+    def upload(self, technology, content=None):
+        upload = stage_image(technology, 'image', SimpleUploadedFile(
+            'logo.png', content or image_bytes()))
+        return process_upload(upload.pk)
+
+    def test_identical_uploads(self):
+        """Test that an identical image is sent once and shared, with its
+        details"""
+        with patch.object(uploads, 'send_image',
+                          wraps=uploads.send_image) as send_image:
+            first = self.upload(self.technologies[0])
+            second = self.upload(self.technologies[1])
+
+        send_image.assert_called_once()
+        self.assertEqual(first.image, second.image)
+        stored = StoredImage.objects.get()
+        self.assertEqual(stored.references, 2)
+        self.assertEqual(stored.image, first.image)
+        technology = Technology.objects.get(pk=self.technologies[1].pk)
+        self.assertEqual(technology.image_width, 10)
+        self.assertEqual(technology.image_srcset, stored.details['srcset'])
+
+    def test_different_uploads(self):
+        """Test that different images are stored apart"""
+        self.upload(self.technologies[0])
+        self.upload(self.technologies[1], image_bytes((20, 20)))
+
+        self.assertEqual(StoredImage.objects.count(), 2)
+
+    def test_delete_last_reference(self):
+        """Test that a shared image is deleted with its last reference
+        only"""
+        self.upload(self.technologies[0])
+        self.upload(self.technologies[1])
+        public_id = StoredImage.objects.get().public_id
+
+        Technology.objects.get(pk=self.technologies[0].pk).delete()
+        self.delete_image_on_commit.assert_not_called()
+        self.assertEqual(StoredImage.objects.get().references, 1)
+
+        Technology.objects.get(pk=self.technologies[1].pk).delete()
+        self.delete_image_on_commit.assert_called_once_with(
+            public_id, 'default')
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_replace_shared_image(self):
+        """Test that replacing a shared image keeps it for the other field
+        referencing it"""
+        self.upload(self.technologies[0])
+        self.upload(self.technologies[1])
+        self.upload(self.technologies[1], image_bytes((20, 20)))
+
+        self.delete_image_on_commit.assert_not_called()
+        references = StoredImage.objects.order_by('pk').values_list(
+            'references', flat=True)
+        self.assertEqual(list(references), [1, 1])
+
+    def test_reupload_same_image(self):
+        """Test that uploading the current image again keeps it"""
+        self.upload(self.technologies[0])
+        self.upload(self.technologies[0])
+
+        self.delete_image_on_commit.assert_not_called()
+        self.assertEqual(StoredImage.objects.get().references, 1)
+
+    def test_index_race(self):
+        """Test that the copy of an image indexed meanwhile by another
+        worker is deleted, and the indexed one referenced"""
+        stored = index_image('0' * 64, 'image/upload/v1/first.png', {})
+        with patch('core.uploads.delete_image_on_commit') as delete:
+            duplicate = index_image('0' * 64, 'image/upload/v1/second.png',
+                                    {})
+
+        self.assertEqual(duplicate.pk, stored.pk)
+        delete.assert_called_once_with('second')
+        self.assertEqual(StoredImage.objects.get().references, 2)
+
+
+class UploadFailureTests(TransactionTestCase):
+    """Tests for the uploads failing to set their image, processed in
+    autocommit as by the workers"""
+
+    def setUp(self):
+        staging = tempfile.TemporaryDirectory()
+        storage = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        self.addCleanup(storage.cleanup)
+        self.storage_dir = storage.name
+        settings = override_settings(
+            IMAGE_STAGING_DIR=staging.name,
+            IMAGE_STORAGE={
+                'BACKEND': 'core.storage.LocalStorage',
+                'OPTIONS': {'location': storage.name},
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = patch('core.images.get_image_executor',
+                        return_value=InlineExecutor())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Staged in autocommit, the uploads would be sent to the workers
+        patcher = patch('core.uploads.submit_upload')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.technologies = [Technology.objects.create(name=f'Tech {i}')
+                             for i in range(2)]
+
+    def upload(self, technology, content=None):
+        upload = stage_image(technology, 'image', SimpleUploadedFile(
+            'logo.png', content or image_bytes()))
+        return process_upload(upload.pk)
+
+    def stored_files(self):
+        return sorted(
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(self.storage_dir)
+            for name in names)
+
+    def test_set_image_error(self):
+        """Test that an upload failing to set its image gives back the
+        reference it took, or deletes the image it sent"""
+        self.upload(self.technologies[0])
+        stored_files = self.stored_files()
+        for content in (image_bytes(), image_bytes((20, 20))):
+            with self.subTest(content=content),\
+                    patch.object(uploads, 'set_uploaded_image',
+                                 side_effect=DatabaseError('Locked')),\
+                    self.assertLogs('core.uploads', 'ERROR'):
+                upload = self.upload(self.technologies[1], content)
+
+                self.assertEqual(upload.status, ImageUpload.FAILED)
+                self.assertEqual(upload.error, 'Locked')
+                self.assertEqual(StoredImage.objects.get().references, 1)
+                self.assertEqual(self.stored_files(), stored_files)
+
+        Technology.objects.get(pk=self.technologies[0].pk).delete()
+        self.assertEqual(self.stored_files(), [])
@@ -0,0 +1,74 @@
+from django.core.exceptions import ValidationError
+
+TRANSLATION_LANGUAGES = ('en', 'fr')
+
+
+class TranslatedSchema:
+    """Rules of a JSON field holding one value per language, either a
+    string or a list of lines.
+
+    The rules are compiled once into `check`, which returns the error of a
+    value or None without raising, and `validate` raises it as a ValueError
+    for the models. Calling the schema makes it a Django
+    validator, usable by model fields and serializers alike"""
+
+    def __init__(self, label, kind=str, blank=False,
+                 languages=TRANSLATION_LANGUAGES):
+        if kind not in (str, list):
+            raise TypeError('Translated values are either str or list.')
+        self.label = label
+        self.kind = kind
+        self.blank = blank
+        self.languages = tuple(languages)
+        self.check = self.compile()
+
+    def compile(self):
+        """Builds the function returning the error of a value against the
+        schema, or None, with the rules bound once in its closure"""
+        keys = ' and '.join(f'"{language}"' for language in self.languages)
+        shape_error = (f'{self.label} must be an object with only the '
+                       f'{keys} keys.')
+        type_error = f'{self.label} translations must be ' + (
+            'strings.' if self.kind is str else 'lists of strings.')
+        blank_error = f'{self.label} translations must not be empty.'
+        languages, kind, blank = self.languages, self.kind, self.blank
+        count = len(languages)
+        join = ''.join
+
+        def check(value):
+            if not isinstance(value, dict) or len(value) != count:
+                return shape_error
+            empty = False
+            for language in languages:
+                translation = value.get(language)
+                if not isinstance(translation, kind):
+                    # Telling a missing language apart is left to the error
+                    # path
+                    if any(language not in value for language in languages):
+                        return shape_error
+                    return type_error
+                if not translation:
+                    empty = True
+            if empty and not blank:
+                return blank_error
+            if kind is list:
+                # str.join rejects any line which is not a string, in C
+                try:
+                    for language in languages:
+                        join(value[language])
+                except TypeError:
+                    return type_error
+            return None
+
+        return check
+
+    def validate(self, value):
+        """Raises the error of the value as a ValueError, for the models"""
+        error = self.check(value)
+        if error is not None:
+            raise ValueError(error)
+
+    def __call__(self, value):
+        error = self.check(value)
+        if error is not None:
+            raise ValidationError(error, code='invalid')
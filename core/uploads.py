@@ -0,0 +1,279 @@
+import hashlib
+import logging
+import os
+import uuid
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from core.fields import StoredImageField
+from core.images import delete_image_on_commit, get_image_executor
+from core.models import ImageUpload, StoredImage, release_image
+from core.normalization import describe_image, describe_staged_image,\
+    get_normalization_pool, get_placeholder_size, normalize_staged_image
+from core.storage import build_srcset, get_derivative_specs,\
+    get_image_storage
+
+logger = logging.getLogger(__name__)
+
+DIGEST_CHUNK_SIZE = 1 << 16
+
+
+def get_staging_dir():
+    return str(settings.IMAGE_STAGING_DIR)
+
+
+def stage_image(instance, field, image_file):
+    """Copies an uploaded image file to the staging directory and records
+    its pending upload, sent by a worker once the transaction is
+    committed"""
+    os.makedirs(get_staging_dir(), exist_ok=True)
+    extension = os.path.splitext(image_file.name or '')[1].lower()
+    path = os.path.join(get_staging_dir(), f'{uuid.uuid4()}{extension}')
+    with open(path, 'wb') as staged:
+        for chunk in image_file.chunks():
+            staged.write(chunk)
+    upload = ImageUpload.objects.create(
+        model=instance._meta.label_lower, object_id=instance.pk,
+        field=field, path=path)
+    transaction.on_commit(lambda: submit_upload(upload.pk))
+    return upload
+
+
+def submit_upload(upload_id):
+    get_image_executor().submit(run_upload, upload_id)
+
+
+def run_upload(upload_id):
+    try:
+        process_upload(upload_id)
+    except Exception:
+        logger.exception('Could not process the upload %s', upload_id)
+    finally:
+        connections.close_all()
+
+
+def finish_upload(upload, status, image='', error=''):
+    upload.status = status
+    upload.image = image
+    upload.error = error
+    upload.finished = timezone.now()
+    upload.save(update_fields=['status', 'image', 'error', 'finished'])
+
+
+def claimable_uploads():
+    """Returns the uploads left to process: the pending ones, and those
+    whose worker did not finish them within its lease"""
+    return ImageUpload.objects.filter(
+        Q(status=ImageUpload.PENDING)
+        | Q(status=ImageUpload.PROCESSING, lease__lt=timezone.now()))
+
+
+def claim_upload(upload_id):
+    """Leases an upload left to process so that concurrent workers skip it,
+    and returns it, or None if it is not left to process"""
+    lease = timezone.now() + timedelta(
+        seconds=getattr(settings, 'IMAGE_UPLOAD_LEASE', 600))
+    if not claimable_uploads().filter(pk=upload_id).update(
+            status=ImageUpload.PROCESSING, lease=lease):
+        return None
+    return ImageUpload.objects.get(pk=upload_id)
+
+
+def process_upload(upload_id):
+    """Normalizes a staged image, sends it to the image storage unless an
+    identical image was stored already, and sets it on its instance, unless
+    a newer upload of the same field superseded it. Returns the upload, or
+    None if it is not left to process or another worker claimed it"""
+    upload = claim_upload(upload_id)
+    if upload is None:
+        return None
+    paths = [upload.path]
+    try:
+        if ImageUpload.objects.filter(
+                model=upload.model, object_id=upload.object_id,
+                field=upload.field, pk__gt=upload.pk).exists():
+            finish_upload(upload, ImageUpload.FAILED,
+                          error='Superseded by a newer upload.')
+            return upload
+        try:
+            paths.append(normalize_staged_image(upload.path))
+            digest = file_digest(paths[-1])
+            stored = claim_stored_image(digest)
+            if stored is None:
+                image, details = send_image(paths[-1])
+        except Exception as error:
+            logger.exception('Could not upload %s', upload.path)
+            finish_upload(upload, ImageUpload.FAILED, error=str(error))
+            return upload
+        claimed = stored is not None
+        try:
+            with transaction.atomic():
+                if not claimed:
+                    stored = index_image(digest, image, details)
+                set_uploaded_image(upload, stored.image, stored.details)
+        except Exception as error:
+            # Give back the reference taken to the identical image, or
+            # delete the image sent, which nothing references
+            logger.exception('Could not set the image of %s', upload.path)
+            if claimed:
+                release_image(stored.public_id)
+            else:
+                delete_image_on_commit(
+                    StoredImageField().to_python(image).public_id)
+            finish_upload(upload, ImageUpload.FAILED, error=str(error))
+    finally:
+        for path in set(paths):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return upload
+
+
+def file_digest(path):
+    """Returns the SHA-256 hex digest of the content of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(DIGEST_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def claim_stored_image(digest):
+    """Takes a reference to the stored image with the given digest, and
+    returns it, or None if no identical image was stored"""
+    with transaction.atomic():
+        stored = StoredImage.objects.select_for_update().filter(
+            digest=digest).first()
+        if stored is not None:
+            StoredImage.objects.filter(pk=stored.pk).update(
+                references=F('references') + 1)
+    return stored
+
+
+def send_image(path):
+    """Sends an image file to the image storage, and returns its value along
+    with its details: size, placeholder and srcset"""
+    details = describe_staged_image(path)
+    image, derivatives = get_image_storage().upload(
+        path, get_derivative_specs())
+    details['srcset'] = build_srcset(derivatives)
+    return image, details
+
+
+def index_image(digest, image, details):
+    """Indexes a sent image with one reference. When another worker indexed
+    an identical image meanwhile, takes a reference to it instead and
+    deletes the copy once committed"""
+    public_id = StoredImageField().to_python(image).public_id
+    stored, created = StoredImage.objects.select_for_update().get_or_create(
+        digest=digest, defaults={
+            'public_id': public_id, 'image': image, 'details': details,
+            'references': 1,
+        })
+    if not created:
+        StoredImage.objects.filter(pk=stored.pk).update(
+            references=F('references') + 1)
+        delete_image_on_commit(public_id)
+    return stored
+
+
+def image_detail_fields(field, details):
+    """Maps the details of an image, such as its srcset or width, to the
+    fields storing them next to the image field"""
+    return {f'{field}_{name}': value for name, value in details.items()}
+
+
+def set_uploaded_image(upload, image, details):
+    """Saves the uploaded image and its details, such as the srcset of its
+    derivatives, on its instance, releasing the image it replaces"""
+    model = apps.get_model(upload.model)
+    instance = model.objects.select_for_update().filter(
+        pk=upload.object_id).first()
+    if instance is None:
+        release_image(
+            model._meta.get_field(upload.field).to_python(image).public_id)
+        finish_upload(upload, ImageUpload.FAILED,
+                      error='The instance was deleted.')
+        return
+    previous = getattr(instance, upload.field)
+    fields = {upload.field: image,
+              **image_detail_fields(upload.field, details)}
+    for name, value in fields.items():
+        setattr(instance, name, value)
+    instance.save(update_fields=list(fields))
+    if previous:
+        release_image(previous.public_id)
+    finish_upload(upload, ImageUpload.DONE, image=image)
+
+
+def process_pending_uploads():
+    """Processes the uploads left to process in order, as after a restart
+    of the workers, and returns how many it processed, skipping those that
+    another worker claimed meanwhile"""
+    upload_ids = list(claimable_uploads().order_by('pk').values_list(
+        'pk', flat=True))
+    return sum(process_upload(upload_id) is not None
+               for upload_id in upload_ids)
+
+
+def backfill_image_details(model, field='image', batch_size=20):
+    """Downloads the stored images whose details are missing, describes
+    them in batches in the process pool, and saves the details. Returns how
+    many instances were filled in"""
+    instances = model.objects.exclude(**{field: ''}).exclude(
+        **{f'{field}__isnull': True}).filter(
+            **{f'{field}_width__isnull': True}).order_by('pk')
+    os.makedirs(get_staging_dir(), exist_ok=True)
+    storage = get_image_storage()
+    filled = 0
+    batch = []
+    for instance in instances.iterator():
+        batch.append(instance)
+        if len(batch) == batch_size:
+            filled += backfill_batch(storage, batch, field)
+            batch = []
+    if batch:
+        filled += backfill_batch(storage, batch, field)
+    return filled
+
+
+def backfill_batch(storage, instances, field):
+    paths = []
+    described = []
+    try:
+        for instance in instances:
+            image = getattr(instance, field)
+            path = os.path.join(
+                get_staging_dir(), f'{uuid.uuid4()}.{image.format}')
+            paths.append(path)
+            try:
+                storage.download(image, path)
+            except Exception:
+                logger.exception('Could not download %s', image.public_id)
+                continue
+            described.append((instance, get_normalization_pool().submit(
+                describe_image, path, get_placeholder_size())))
+        filled = 0
+        for instance, future in described:
+            try:
+                details = future.result()
+            except Exception:
+                logger.exception('Could not describe %s',
+                                 getattr(instance, field).public_id)
+                continue
+            fields = image_detail_fields(field, details)
+            for name, value in fields.items():
+                setattr(instance, name, value)
+            instance.save(update_fields=list(fields))
+            filled += 1
+        return filled
+    finally:
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,15 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from core.storage import get_image_storage
+
+
+def serve_image(request, name):
+    """Serves an image of the local storage. FileResponse lets the server
+    send the file itself through wsgi.file_wrapper, such as with sendfile"""
+    storage_path = getattr(get_image_storage(), 'path', None)
+    if storage_path is None:
+        raise Http404
+    try:
+        return FileResponse(open(storage_path(name), 'rb'))
+    except (SuspiciousFileOperation, FileNotFoundError, IsADirectoryError):
+        raise Http404
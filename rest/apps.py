@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RestConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rest'
+
+    def ready(self):
+        # Connects the receivers keeping the cached content up to date
+        from rest import cache, snapshot  # noqa: F401
@@ -0,0 +1,44 @@
+import hmac
+from functools import lru_cache
+from django.conf import settings
+from rest_framework.authentication import BaseAuthentication,\
+    get_authorization_header
+
+
+@lru_cache(maxsize=None)
+def get_admin_token():
+    """Returns the encoded Admin Token, read once from the settings"""
+    return settings.ADMIN_TOKEN.encode()
+
+
+class AdminUser:
+    """Principal of the requests carrying the Admin Token"""
+    is_authenticated = True
+    is_anonymous = False
+    is_admin = True
+
+    def __str__(self):
+        return 'admin'
+
+
+class AdminTokenAuthentication(BaseAuthentication):
+    """Authenticates the requests carrying the Admin Token in their
+    `Authorization: Token <token>` header.
+
+    Any other header leaves the request anonymous instead of failing, so
+    that the public GET methods keep working with a wrong token"""
+    keyword = b'token'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if len(auth) != 2 or auth[0].lower() != self.keyword:
+            return None
+        if not hmac.compare_digest(auth[1], get_admin_token()):
+            return None
+        return (AdminUser(), None)
+
+
+def is_admin(request):
+    """Tells whether the request was authenticated with the Admin Token.
+    The header is only parsed the first time `request.user` is read"""
+    return getattr(request.user, 'is_admin', False)
@@ -0,0 +1,234 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError, transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from core.models import bump_content_version, coalesce_content_versions
+from rest.serializers import StagedImagesMixin
+
+
+def bulk_create_with_pks(model, instances):
+    """Inserts the instances with as few queries as possible and makes sure
+    they get their primary keys.
+
+    Backends which cannot return the inserted rows, as SQLite before Django
+    4.0, keep the write lock of the transaction from the first insert, so
+    the last rows of the table are the inserted ones. They are read back and
+    compared with the instances, raising DatabaseError if they differ"""
+    model.objects.bulk_create(instances)
+    if not instances or instances[0].pk is not None:
+        return
+    fields = [field for field in model._meta.concrete_fields
+              if not field.primary_key]
+    rows = list(model.objects.order_by('-pk')[:len(instances)])[::-1]
+    if len(rows) != len(instances) or any(
+            field.get_prep_value(getattr(instance, field.attname))
+            != field.get_prep_value(getattr(row, field.attname))
+            for instance, row in zip(instances, rows) for field in fields):
+        raise DatabaseError(
+            f'The last rows of {model._meta.label} are not the inserted ones.')
+    for instance, row in zip(instances, rows):
+        instance.pk = row.pk
+
+
+class BulkMixin:
+    """Adds a `bulk/` route to a viewset, creating (POST) or updating
+    (PATCH) a list of items, or deleting (DELETE) a list of IDs.
+
+    All the items are validated before anything is written, and then
+    written in one transaction with bulk queries"""
+    bulk_max_items = 1000
+
+    @action(methods=['post', 'patch', 'delete'], detail=False,
+            url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        items = self.get_bulk_items(request)
+        try:
+            with transaction.atomic(), coalesce_content_versions():
+                if request.method == 'DELETE':
+                    self.bulk_delete(items)
+                    return Response(status=status.HTTP_204_NO_CONTENT)
+                if request.method == 'POST':
+                    instances = self.bulk_create(items)
+                else:
+                    instances = self.bulk_update(items)
+        except ValueError as error:
+            raise ValidationError(str(error))
+
+        queryset = self.get_queryset().filter(
+            pk__in=[instance.pk for instance in instances])
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(
+            status=status.HTTP_201_CREATED if request.method == 'POST'
+            else status.HTTP_200_OK,
+            data=serializer.data
+        )
+
+    def get_bulk_items(self, request):
+        """Returns the list of items of the request, objects to create or
+        update, and IDs to delete"""
+        return self.check_bulk_items(request.data, request.method)
+
+    def check_bulk_items(self, items, method):
+        """Checks the shape of the items expected by the method"""
+        if not isinstance(items, list) or not items:
+            raise ValidationError('Expected a non-empty list of items.')
+        if len(items) > self.bulk_max_items:
+            raise ValidationError(
+                f'Expected at most {self.bulk_max_items} items.')
+        if method == 'DELETE':
+            valid = all(type(item) is int for item in items)
+        elif method == 'PATCH':
+            valid = all(isinstance(item, dict)
+                        and type(item.get('id')) is int for item in items)
+        else:
+            valid = all(isinstance(item, dict) for item in items)
+        if not valid:
+            raise ValidationError(
+                'Expected a list of IDs to delete, or of objects with an'
+                ' ID to update.')
+        if method != 'POST':
+            ids = [item['id'] if isinstance(item, dict) else item
+                   for item in items]
+            if len(set(ids)) != len(ids):
+                raise ValidationError('Duplicated IDs.')
+        return items
+
+    def get_serializer_context(self):
+        context = super(BulkMixin, self).get_serializer_context()
+        if self.action == 'bulk':
+            context['preloaded'] = getattr(self, 'preloaded', {})
+        return context
+
+    def preload_related(self, items):
+        """Loads at once the instances the items refer to, so that their
+        validation does not query each one"""
+        self.preloaded = {}
+        for field in self.queryset.model._meta.get_fields():
+            if field.auto_created or not (
+                    field.many_to_one or field.many_to_many):
+                continue
+            pk_field = field.related_model._meta.pk
+            pks = set()
+            for item in items:
+                value = item.get(field.name)
+                for pk in value if isinstance(value, list) else [value]:
+                    try:
+                        pks.add(pk_field.to_python(pk))
+                    except (TypeError, ValueError, DjangoValidationError):
+                        continue
+            pks.discard(None)
+            self.preloaded[field.related_model] = \
+                field.related_model._default_manager.in_bulk(pks)
+
+    def split_related(self, data):
+        """Pops the many-to-many values out of validated data"""
+        return {
+            field.name: data.pop(field.name)
+            for field in self.queryset.model._meta.many_to_many
+            if field.name in data
+        }
+
+    def bulk_set_related(self, instances, relations, replace):
+        """Sets the many-to-many relations of the instances with one insert
+        per relation, deleting their current ones first if `replace`"""
+        for field in self.queryset.model._meta.many_to_many:
+            changed = [(instance, related[field.name])
+                       for instance, related in zip(instances, relations)
+                       if field.name in related]
+            if not changed:
+                continue
+            through = field.remote_field.through
+            source = field.m2m_field_name() + '_id'
+            target = field.m2m_reverse_field_name() + '_id'
+            if replace:
+                through.objects.filter(**{
+                    source + '__in': [instance.pk for instance, _ in changed]
+                }).delete()
+            through.objects.bulk_create(
+                through(**{source: instance.pk, target: value.pk})
+                for instance, values in changed
+                for value in values
+            )
+            bump_content_version(self.queryset.model)
+
+    def bulk_create(self, items):
+        self.preload_related(items)
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        model = self.queryset.model
+        staging = isinstance(serializer.child, StagedImagesMixin)
+        instances, relations, images = [], [], []
+        for data in serializer.validated_data:
+            relations.append(self.split_related(data))
+            if staging:
+                images.append(serializer.child.pop_images(data))
+            instance = model(**data)
+            if hasattr(instance, 'prepare'):
+                instance.prepare()
+            instances.append(instance)
+        bulk_create_with_pks(model, instances)
+        for instance, instance_images in zip(instances, images):
+            serializer.child.stage_images(instance, instance_images)
+        self.bulk_set_related(instances, relations, replace=False)
+        bump_content_version(model)
+        self.bulk_created(instances)
+        return instances
+
+    def bulk_created(self, instances):
+        """Hook writing what a save() would have along with the instances"""
+
+    def bulk_update(self, items):
+        model = self.queryset.model
+        ids = [item['id'] for item in items]
+        instances = model.objects.in_bulk(ids)
+        missing = [id for id in ids if id not in instances]
+        if missing:
+            raise NotFound(f'Not found: {missing}')
+
+        self.preload_related(items)
+        serializers = [
+            self.get_serializer(instances[item['id']], data=item,
+                                partial=True)
+            for item in items
+        ]
+        errors = [serializer.errors if not serializer.is_valid() else {}
+                  for serializer in serializers]
+        if any(errors):
+            raise ValidationError(errors)
+
+        # Only the fields of the items and those prepare() fills from them,
+        # not the image details the upload workers may have set meanwhile
+        fields = set(getattr(model, 'prepared_fields', ()))
+        updated, relations = [], []
+        for serializer in serializers:
+            instance, data = serializer.instance, dict(
+                serializer.validated_data)
+            relations.append(self.split_related(data))
+            for name, value in data.items():
+                setattr(instance, name, value)
+            fields.update(data)
+            if hasattr(instance, 'prepare'):
+                instance.prepare()
+            updated.append(instance)
+        if fields:
+            model.objects.bulk_update(updated, fields)
+        self.bulk_set_related(updated, relations, replace=True)
+        bump_content_version(model)
+        self.bulk_updated(updated)
+        return updated
+
+    def bulk_updated(self, instances):
+        """Hook writing what a save() would have along with the instances"""
+
+    def bulk_delete(self, ids):
+        queryset = self.queryset.model.objects.filter(pk__in=ids)
+        found = set(queryset.values_list('pk', flat=True))
+        missing = [id for id in ids if id not in found]
+        if missing:
+            raise NotFound(f'Not found: {missing}')
+        # Images are deleted in batches once committed, and the content
+        # versions bumped once by the caller
+        queryset.delete()
@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from threading import Lock
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from core.models import content_changed
+
+
+class ResponseCache:
+    """Base class of the rendered response caches.
+
+    Entries are stored under the ETag of the response and tagged with the
+    labels of the content models they were built from, so that a content
+    change drops exactly the entries depending on it."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, labels):
+        content = self._get(key, labels)
+        if content is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return content
+
+    def set(self, key, content, labels):
+        raise NotImplementedError
+
+    def invalidate(self, label):
+        raise NotImplementedError
+
+    def clear(self):
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key, labels):
+        raise NotImplementedError
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class LRUResponseCache(ResponseCache):
+    """In-process cache evicting the least recently used entries once the
+    stored content exceeds `max_bytes`"""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        super(LRUResponseCache, self).__init__()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = Lock()
+
+    def _get(self, key, labels):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, content, labels):
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (content, labels)
+            self.size += len(content)
+            for label in labels:
+                self._tags.setdefault(label, set()).add(key)
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, label):
+        with self._lock:
+            for key in list(self._tags.pop(label, ())):
+                self._discard(key)
+
+    def clear(self):
+        super(LRUResponseCache, self).clear()
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.size = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        content, labels = entry
+        self.size -= len(content)
+        for label in labels:
+            keys = self._tags.get(label)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[label]
+
+    def stats(self):
+        stats = super(LRUResponseCache, self).stats()
+        stats.update(
+            entries=len(self._entries),
+            size=self.size,
+            max_bytes=self.max_bytes
+        )
+        return stats
+
+
+class DjangoResponseCache(ResponseCache):
+    """Cache stored in one of the Django cache aliases.
+
+    Each label has a generation number stored next to the entries and
+    folded into their keys, so that an invalidation made by any process
+    sharing the cache is seen by all of them."""
+    prefix = 'rest:response:'
+
+    def __init__(self, alias='default'):
+        super(DjangoResponseCache, self).__init__()
+        self.cache = caches[alias]
+
+    def _generation_keys(self, labels):
+        return [f'{self.prefix}gen:{label}' for label in labels]
+
+    def _entry_key(self, key, labels):
+        keys = self._generation_keys(labels)
+        generations = self.cache.get_many(keys)
+        return self.prefix + key + ':' + ':'.join(
+            str(generations.get(gen_key, 0)) for gen_key in keys)
+
+    def _get(self, key, labels):
+        return self.cache.get(self._entry_key(key, labels))
+
+    def set(self, key, content, labels):
+        self.cache.set(self._entry_key(key, labels), content, None)
+
+    def invalidate(self, label):
+        key = self._generation_keys([label])[0]
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, None)
+
+    def clear(self):
+        super(DjangoResponseCache, self).clear()
+        self.cache.clear()
+
+
+def create_response_cache():
+    """Builds the response cache described by the REST_RESPONSE_CACHE
+    setting"""
+    config = getattr(settings, 'REST_RESPONSE_CACHE', {})
+    backend = import_string(
+        config.get('BACKEND', 'rest.cache.LRUResponseCache'))
+    return backend(**config.get('OPTIONS', {}))
+
+
+response_cache = create_response_cache()
+
+
+@receiver(content_changed)
+def invalidate_responses(sender, **kwargs):
+    response_cache.invalidate(sender._meta.label_lower)
@@ -0,0 +1,114 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import Project, Review, Skill, Technology
+from rest.bulk import bulk_create_with_pks
+from rest.renderers import JSONRenderer
+from rest.rows import serialize_rows
+from rest.serializers import LightProjectSerializer, ReviewSerializer,\
+    SkillSerializer, TechnologySerializer, technology_ids_prefetch
+from rest.sqljson import build_json_array
+
+
+def seed(count):
+    """Adds `count` rows to every content table"""
+    technologies = [
+        Technology(name=f'Tech {index}',
+                   image=f'image/upload/v1/bench/tech{index}.png')
+        for index in range(count)
+    ]
+    bulk_create_with_pks(Technology, technologies)
+    skills = [
+        Skill(
+            name={'en': f'Skill {index}', 'fr': f'Compétence {index}'},
+            description={'en': ['Line'] * 10, 'fr': ['Ligne'] * 10},
+            date=[6, 2021],
+            technology=technologies[index]
+        )
+        for index in range(count)
+    ]
+    projects = [
+        Project(
+            name={'en': f'Project {index}', 'fr': f'Projet {index}'},
+            description={'en': ['Line'] * 10, 'fr': ['Ligne'] * 10},
+            image=f'image/upload/v1/bench/project{index}.png'
+        )
+        for index in range(count)
+    ]
+    for instance in skills + projects:
+        instance.prepare()
+    Skill.objects.bulk_create(skills)
+    bulk_create_with_pks(Project, projects)
+    Review.objects.bulk_create(
+        Review(author=f'Client {index}', message={'en': 'Good', 'fr': 'Bien'},
+               modified=True, project=project)
+        for index, project in enumerate(projects)
+    )
+    through = Project.technologies.through
+    through.objects.bulk_create(
+        through(project_id=project.id, technology_id=technology.id)
+        for index, project in enumerate(projects)
+        for technology in technologies[index:index + 3]
+    )
+
+
+def measure(serialize, repeat):
+    """Returns the best time of the serialization, in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        serialize()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+class Command(BaseCommand):
+    """Django command comparing the rendering of the public lists through
+    their serializers, from rows, from rows with raw JSON columns, and as
+    arrays built by the database, on tables seeded in a rolled back
+    transaction"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=10000,
+            help='Number of rows added to each table')
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Number of runs of each serialization')
+
+    def handle(self, *args, **options):
+        cases = (
+            ('technologies', TechnologySerializer,
+             Technology.objects.order_by('name', 'id')),
+            ('skills', SkillSerializer,
+             Skill.objects.order_by('name_en', 'id')),
+            ('projects', LightProjectSerializer,
+             Project.objects.order_by('name_en', 'id').prefetch_related(
+                 technology_ids_prefetch())),
+            ('reviews', ReviewSerializer,
+             Review.objects.filter(modified=True).order_by('author', 'id')),
+        )
+        renderer = JSONRenderer()
+        with transaction.atomic():
+            seed(options['rows'])
+            for label, serializer_class, queryset in cases:
+                before = measure(lambda: renderer.render(
+                    serializer_class(queryset.all(), many=True).data
+                ), options['repeat'])
+                after = measure(lambda: renderer.render(
+                    serialize_rows(serializer_class(), queryset.all())
+                ), options['repeat'])
+                raw = measure(lambda: renderer.render(
+                    serialize_rows(serializer_class(), queryset.all(),
+                                   raw_json=True)
+                ), options['repeat'])
+                sql = measure(lambda: renderer.render(
+                    build_json_array(serializer_class(), queryset.all())
+                ), options['repeat'])
+                self.stdout.write(
+                    f'{label}: serializer {before * 1000:.0f}ms, rows'
+                    f' {after * 1000:.0f}ms ({before / after:.1f}x), raw'
+                    f' JSON rows {raw * 1000:.0f}ms ({before / raw:.1f}x),'
+                    f' SQL JSON {sql * 1000:.0f}ms ({before / sql:.1f}x)'
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,91 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Opt-in cursor pagination seeking on the `keyset` of the view, a
+    tuple of fields ending with a unique one, so that no page needs an
+    OFFSET or a COUNT(*). Fields prefixed with `-` are descending.
+
+    Requests without `page_size` nor `cursor` are not paginated."""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if (self.cursor_query_param not in params
+                and self.page_size_query_param not in params):
+            return None
+
+        self.request = request
+        self.keyset = view.keyset
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.keyset)
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.seek(self.decode_cursor(cursor)))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def seek(self, values):
+        """Builds the condition selecting the rows after `values` in the
+        keyset order"""
+        fields = [field.lstrip('-') for field in self.keyset]
+        condition = Q()
+        for index in reversed(range(len(fields))):
+            equal = dict(zip(fields[:index], values))
+            lookup = '__lt' if self.keyset[index].startswith('-') else '__gt'
+            condition = Q(**equal, **{
+                fields[index] + lookup: values[index]}) | condition
+        return condition
+
+    def encode_cursor(self, instance):
+        values = [getattr(instance, field.lstrip('-'))
+                  for field in self.keyset]
+        return urlsafe_b64encode(
+            json.dumps(values, separators=(',', ':')).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.keyset):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(
+            url, self.page_size_query_param, self.page_size)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
@@ -0,0 +1,15 @@
+from rest_framework import renderers
+
+
+class PreEncodedJSON(bytes):
+    """JSON document encoded before reaching the renderer"""
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer passing pre-encoded documents through as they are"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, PreEncodedJSON):
+            return bytes(data)
+        return super(JSONRenderer, self).render(
+            data, accepted_media_type, renderer_context)
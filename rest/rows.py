@@ -0,0 +1,254 @@
+import json
+import re
+from functools import lru_cache
+from operator import itemgetter
+from django.core.signals import setting_changed
+from django.db.models import CharField, ExpressionWrapper, F, TextField
+from django.dispatch import receiver
+from core.fields import StoredImageField
+from rest_framework import serializers
+from rest.renderers import PreEncodedJSON
+from rest.serializers import ProjectedTranslationField
+
+# Stored images whose URL is the stored value after a constant prefix
+PLAIN_IMAGE_RE = re.compile(
+    r'(image|raw|video)/(upload|private|authenticated)/v\d+/[\w\-./]+',
+    re.ASCII)
+
+# Encoding of the values JSONRenderer would render, with the escapes it
+# adds for JavaScript
+dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+JS_LINE_SEPARATORS = str.maketrans({'\u2028': '\\u2028',
+                                    '\u2029': '\\u2029'})
+
+# Fields whose representation of a database value is the value itself
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+@lru_cache(maxsize=None)
+def get_image_url_prefix():
+    """Returns what the image storage puts before the stored value of an
+    image in its URL, or None if the URL is not built that way"""
+    probe = 'image/upload/v1/probe'
+    url = StoredImageField().to_python(probe).url
+    if url and url.endswith(probe):
+        return url[:-len(probe)]
+    return None
+
+
+@receiver(setting_changed)
+def reset_image_url_prefix(setting, **kwargs):
+    if setting in ('IMAGE_STORAGE', 'CLOUDINARY'):
+        get_image_url_prefix.cache_clear()
+
+
+def image_url(value):
+    """Returns the URL ImageField represents a stored image with"""
+    if not value:
+        return None
+    prefix = get_image_url_prefix()
+    if prefix is not None and PLAIN_IMAGE_RE.fullmatch(value):
+        return prefix + value
+    return StoredImageField().to_python(value).url or None
+
+
+def uuid_string(value):
+    return None if value is None else str(value)
+
+
+def raw(text):
+    """Returns the fragment of a JSON column read as text"""
+    return 'null' if text is None else text
+
+
+def encoder(converter):
+    """Returns the function encoding the converted values in JSON"""
+    if converter is None:
+        return dumps
+    return lambda value: dumps(converter(value))
+
+
+def values_getter(indexes):
+    """Returns the function reading the values at the indexes of a row, as
+    a tuple"""
+    if not indexes:
+        return lambda row: ()
+    if len(indexes) == 1:
+        index, = indexes
+        return lambda row: (row[index],)
+    return itemgetter(*indexes)
+
+
+class RowSerializer:
+    """Read-only serialization of `values_list()` rows into the dicts the
+    mirrored serializer returns for the same instances, without building
+    any model instance nor calling the fields one by one.
+
+    `compile()` returns None for serializers with fields it does not know
+    how to read from a row"""
+
+    def __init__(self, serializer, raw_json=False):
+        # The primary key comes first, to look the related values up
+        self.columns = ['pk']
+        self.annotations = {}
+        self.related = []
+        self.raw_json = raw_json
+        self.represent = self.compile(serializer)
+
+    def compile(self, serializer):
+        model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+        if model is None:
+            return None
+        translated_fields = getattr(serializer.Meta, 'translated_fields', {})
+        # (name, index of the value in the row, converter or None, whether
+        # it is raw JSON)
+        items = []
+        for field in serializer._readable_fields:
+            source = field.source
+            converter, spliced = None, False
+            if source == '*' or '.' in source:
+                return None
+            if isinstance(field, ProjectedTranslationField):
+                name = 'projected_' + field.field_name
+                if translated_fields[field.field_name].kind is str:
+                    index = self.column(name)
+                else:
+                    index, converter = self.json_column(name)
+                    spliced = self.raw_json
+            elif isinstance(field, serializers.ManyRelatedField):
+                child = field.child_relation
+                if not isinstance(child, serializers.PrimaryKeyRelatedField)\
+                        or child.pk_field is not None:
+                    return None
+                # The related values follow the columns, the last related
+                # field first
+                index = -1 - len(self.related)
+                self.related.append(model._meta.get_field(source))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    return None
+                index = self.column(source)
+            elif isinstance(field, serializers.ImageField):
+                if not isinstance(model._meta.get_field(source),
+                                  StoredImageField):
+                    return None
+                # Read the stored text, not a parsed CloudinaryResource
+                self.annotations['raw_' + source] = ExpressionWrapper(
+                    F(source), output_field=CharField())
+                index, converter = self.column('raw_' + source), image_url
+            elif isinstance(field, serializers.UUIDField):
+                if field.uuid_format != 'hex_verbose':
+                    return None
+                index, converter = self.column(source), uuid_string
+            elif isinstance(field, serializers.JSONField):
+                if field.binary:
+                    return None
+                index, converter = self.json_column(source)
+                spliced = self.raw_json
+            elif type(field) in IDENTITY_FIELDS:
+                index = self.column(source)
+            else:
+                return None
+            items.append((field.field_name, index, converter, spliced))
+
+        names = [name for name, _, _, _ in items]
+        get_values = values_getter([index for _, index, _, _ in items])
+        conversions = [(position, converter)
+                       for position, (_, _, converter, _) in enumerate(items)
+                       if converter is not None]
+        if not any(spliced for _, _, _, spliced in items):
+            # Nothing to splice, a single encoding of the dicts is faster
+            self.raw_json = False
+        if self.raw_json:
+            # Every value is encoded, the spliced ones by raw() only, into
+            # the object with the encoded keys
+            encoders = [converter if spliced else encoder(converter)
+                        for _, _, converter, spliced in items]
+            template = '{' + ','.join(
+                dumps(name).replace('%', '%%') + ':%s' for name in names
+            ) + '}'
+
+            def represent(row):
+                return template % tuple([
+                    encode(value)
+                    for encode, value in zip(encoders, get_values(row))])
+        elif conversions:
+            def represent(row):
+                values = list(get_values(row))
+                for position, converter in conversions:
+                    values[position] = converter(values[position])
+                return dict(zip(names, values))
+        else:
+            def represent(row):
+                return dict(zip(names, get_values(row)))
+        return represent
+
+    def column(self, name):
+        """Returns the index of a new column of the row"""
+        self.columns.append(name)
+        return len(self.columns) - 1
+
+    def json_column(self, name):
+        """Returns the index of a JSON column of the row, and the converter
+        of its value. In raw JSON mode, the column is read as the text the
+        database holds, to be spliced as is"""
+        if not self.raw_json:
+            return self.column(name), None
+        self.annotations['raw_' + name] = ExpressionWrapper(
+            F(name), output_field=TextField())
+        return self.column('raw_' + name), raw
+
+    def get_related(self, field, queryset, pks):
+        """Maps the given primary keys of the queryset to the list of primary
+        keys they are related to through a many-to-many field, in ascending
+        order. The queryset is filtered again in a subquery, instead of
+        sending every key"""
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        related = {pk: [] for pk in pks}
+        for pk, value in through.objects.filter(**{
+            source + '__in': queryset.values('pk')
+        }).order_by(source, target).values_list(source, target):
+            related.setdefault(pk, []).append(value)
+        return related
+
+    def serialize(self, queryset):
+        """Returns the representation of every row of the queryset, encoded
+        at once in raw JSON mode"""
+        queryset = queryset.prefetch_related(None)
+        rows = list(queryset.annotate(
+            **self.annotations).values_list(*self.columns))
+        if self.related:
+            pks = [row[0] for row in rows]
+            related = [self.get_related(field, queryset, pks)
+                       for field in self.related]
+            related.reverse()
+            rows = [row + tuple(values[row[0]] for values in related)
+                    for row in rows]
+        data = [self.represent(row) for row in rows]
+        if not self.raw_json:
+            return data
+        return PreEncodedJSON(
+            ('[' + ','.join(data) + ']').translate(JS_LINE_SEPARATORS)
+            .encode())
+
+
+compiled = {}
+
+
+def serialize_rows(serializer, queryset, raw_json=False):
+    """Serializes the queryset with the fast path of the serializer, or
+    returns None if it has none"""
+    key = (type(serializer), serializer.context.get('lang'), raw_json)
+    if key not in compiled:
+        row_serializer = RowSerializer(serializer, raw_json)
+        compiled[key] = row_serializer if row_serializer.represent else None
+    if compiled[key] is None:
+        return None
+    return compiled[key].serialize(queryset)
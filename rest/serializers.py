@@ -1,7 +1,140 @@
-from core.models import Project, Review, Skill, Technology
+from django.db.models import Prefetch, TextField
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import Cast
+from core.fields import StoredImageField
+from core.models import ImageUpload, Project, Review, Skill, Technology
+from core.uploads import stage_image
 from rest_framework import serializers
 
 
+def technology_ids_prefetch():
+    """Prefetches the technologies of projects, only loading the IDs the
+    project serializers return, in ascending order"""
+    return Prefetch('technologies',
+                    queryset=Technology.objects.only('id').order_by('id'))
+
+
+class ProjectedTranslationField(serializers.ReadOnlyField):
+    """Returns a single language of a translated field, reading the value
+    projected by the database when the instance has one"""
+
+    def __init__(self, language, **kwargs):
+        self.language = language
+        super(ProjectedTranslationField, self).__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        projected = 'projected_' + self.field_name
+        if projected in instance.__dict__:
+            return instance.__dict__[projected]
+        return super(ProjectedTranslationField, self).get_attribute(
+            instance).get(self.language)
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolves the primary keys from the instances preloaded in the
+    context by bulk writes, instead of querying them one by one"""
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get('preloaded', {}).get(
+            self.get_queryset().model, {})
+        try:
+            return preloaded[data]
+        except (KeyError, TypeError):
+            return super(PreloadedPrimaryKeyRelatedField,
+                         self).to_internal_value(data)
+
+
+class ImageURLField(serializers.ImageField):
+    """Accepts image files, and represents the stored images with the URLs
+    their storage builds, as the rows and SQL JSON paths do, rather than
+    with URLs made absolute for the request"""
+
+    def to_representation(self, value):
+        return value.url if value else None
+
+
+class TranslatedFieldsMixin:
+    """Validates the translated fields listed in `Meta.translated_fields`
+    with their schema, and returns only one language of them when the
+    context holds a `lang`"""
+
+    @classmethod
+    def project_translations(cls, queryset, language):
+        """Extracts the translations of `language` in SQL, without loading
+        the other ones"""
+        projections = {}
+        for name, schema in cls.Meta.translated_fields.items():
+            if schema.kind is str:
+                projections['projected_' + name] = Cast(
+                    KeyTextTransform(language, name), TextField())
+            else:
+                projections['projected_' + name] = KeyTransform(
+                    language, name)
+        return queryset.annotate(**projections).defer(
+            *cls.Meta.translated_fields)
+
+    def get_fields(self):
+        fields = super(TranslatedFieldsMixin, self).get_fields()
+        language = self.context.get('lang')
+        if language:
+            for name in self.Meta.translated_fields:
+                fields[name] = ProjectedTranslationField(language)
+            return fields
+        for name, schema in self.Meta.translated_fields.items():
+            if name in fields and not fields[name].read_only:
+                fields[name].validators = [*fields[name].validators, schema]
+        return fields
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageUpload
+        fields = ('id', 'status', 'image', 'error')
+
+    def get_image(self, upload):
+        """Returns the URL of the uploaded image, once done"""
+        if not upload.image:
+            return None
+        return StoredImageField().to_python(upload.image).url
+
+
+class StagedImagesMixin:
+    """Stages the image files of `Meta.staged_images` for the upload
+    workers, instead of sending them to the image storage during the
+    request. The instance keeps its current images until the workers are
+    done, and its representation lists the pending uploads"""
+
+    def pop_images(self, validated_data):
+        return {name: validated_data.pop(name)
+                for name in self.Meta.staged_images if name in validated_data}
+
+    def stage_images(self, instance, images):
+        return [stage_image(instance, name, image_file)
+                for name, image_file in images.items()]
+
+    def create(self, validated_data):
+        images = self.pop_images(validated_data)
+        instance = super(StagedImagesMixin, self).create(validated_data)
+        self.uploads = self.stage_images(instance, images)
+        return instance
+
+    def update(self, instance, validated_data):
+        images = self.pop_images(validated_data)
+        instance = super(StagedImagesMixin, self).update(
+            instance, validated_data)
+        self.uploads = self.stage_images(instance, images)
+        return instance
+
+    def to_representation(self, instance):
+        data = super(StagedImagesMixin, self).to_representation(instance)
+        if getattr(self, 'uploads', None):
+            data['uploads'] = ImageUploadSerializer(
+                self.uploads, many=True).data
+        return data
+
+
 class MailSerializer(serializers.Serializer):
     email = serializers.EmailField()
     name = serializers.CharField(max_length=200)
@@ -9,39 +142,49 @@ class MailSerializer(serializers.Serializer):
     message = serializers.CharField()
 
 
-class TechnologySerializer(serializers.ModelSerializer):
-    image = serializers.ImageField()
+class TechnologySerializer(StagedImagesMixin, serializers.ModelSerializer):
+    image = ImageURLField()
 
     class Meta:
         model = Technology
-        fields = ('id', 'name', 'image')
+        fields = ('id', 'name', 'image', 'image_srcset', 'image_width',
+                  'image_height', 'image_bytes', 'image_placeholder')
+        staged_images = ('image',)
+
 
+class SkillSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
 
-class SkillSerializer(serializers.ModelSerializer):
     class Meta:
         model = Skill
         fields = ('id', 'date',  'name', 'description', 'technology')
+        translated_fields = Skill.translated_schemas
 
 
-class LightProjectSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField(allow_empty_file=True, required=False)
+class LightProjectSerializer(TranslatedFieldsMixin,
+                             serializers.ModelSerializer):
+    image = ImageURLField(allow_empty_file=True, required=False)
 
     class Meta:
         model = Project
-        fields = ('id', 'name', 'description', 'image', 'technologies')
+        fields = ('id', 'name', 'description', 'image', 'image_srcset',
+                  'image_width', 'image_height', 'image_bytes',
+                  'image_placeholder', 'technologies')
+        translated_fields = Project.translated_schemas
         read_only_fields = ('id', 'image')
         extra_kwargs = {
             'image': {'required': False}
         }
 
 
-class ProjectSerializer(serializers.ModelSerializer):
-
-    image = serializers.ImageField(allow_empty_file=True, required=False)
+class ProjectSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+    image = ImageURLField(allow_empty_file=True, required=False)
 
     class Meta:
         model = Project
-        fields = '__all__'
+        exclude = ('name_en', 'name_fr')
+        translated_fields = Project.translated_schemas
         read_only_fields = ('id', 'image')
         extra_kwargs = {
             'github': {'required': False},
@@ -52,26 +195,31 @@ class ProjectSerializer(serializers.ModelSerializer):
         }
 
 
-class ProjectImageSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField()
+class ProjectImageSerializer(StagedImagesMixin,
+                             serializers.ModelSerializer):
+    image = ImageURLField()
 
     class Meta:
         model = Project
         fields = ('id', 'image')
         read_only_fields = ('id',)
+        staged_images = ('image',)
 
 
-class ReviewAdminSerializer(serializers.ModelSerializer):
+class ReviewAdminSerializer(TranslatedFieldsMixin,
+                            serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ('id', 'author', 'message',
                   'project', 'modified', 'update_code')
+        translated_fields = Review.translated_schemas
         read_only_fields = ('id', 'project', 'update_code',
                             'modified', 'update_code')
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ('id', 'author', 'message', 'project', 'modified')
+        translated_fields = Review.translated_schemas
         read_only_fields = ('id', 'project', 'update_code', 'modified')
@@ -0,0 +1,96 @@
+import logging
+from django.db import transaction
+from django.db.models import Subquery, Value
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+from core.models import ContentVersion, Project, Review, Skill, Snapshot,\
+    Technology, content_changed, get_content_versions
+from rest.serializers import LightProjectSerializer, ReviewSerializer,\
+    SkillSerializer, TechnologySerializer, technology_ids_prefetch
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'portfolio'
+SNAPSHOT_MODELS = (Technology, Skill, Project, Review)
+
+
+def format_versions(versions):
+    return '.'.join(str(version) for version in versions)
+
+
+def build_snapshot():
+    """Encodes all the public content in one document"""
+    return JSONRenderer().render({
+        'technologies': TechnologySerializer(
+            Technology.objects.order_by('name', 'id'), many=True).data,
+        'skills': SkillSerializer(
+            Skill.objects.order_by('name_en', 'id'), many=True).data,
+        'projects': LightProjectSerializer(
+            Project.objects.order_by('name_en', 'id').prefetch_related(
+                technology_ids_prefetch()), many=True).data,
+        'reviews': ReviewSerializer(
+            Review.objects.filter(modified=True).order_by('author', 'id'),
+            many=True).data,
+    })
+
+
+def refresh_snapshot():
+    """Rebuilds the stored snapshot unless it matches the current content
+    versions, and returns its versions and payload"""
+    versions = format_versions(get_content_versions(*SNAPSHOT_MODELS))
+    payload = Snapshot.objects.filter(
+        key=SNAPSHOT_KEY, versions=versions
+    ).values_list('payload', flat=True).first()
+    if payload is None:
+        payload = build_snapshot()
+        Snapshot.objects.update_or_create(
+            key=SNAPSHOT_KEY,
+            defaults={'versions': versions, 'payload': payload}
+        )
+    return versions, bytes(payload)
+
+
+def get_snapshot():
+    """Returns the versions and payload of the snapshot, checking in the
+    same query that it is still up to date"""
+    current_versions = {
+        f'version_{index}': Coalesce(Subquery(
+            ContentVersion.objects.filter(
+                label=model._meta.label_lower).values('version')[:1]
+        ), Value(0))
+        for index, model in enumerate(SNAPSHOT_MODELS)
+    }
+    row = Snapshot.objects.filter(key=SNAPSHOT_KEY).annotate(
+        **current_versions
+    ).values_list('versions', 'payload', *current_versions).first()
+    if row is not None:
+        versions, payload, *current = row
+        if versions == format_versions(current):
+            return versions, bytes(payload)
+    return refresh_snapshot()
+
+
+def refresh_snapshot_on_commit():
+    try:
+        refresh_snapshot()
+    except Exception:
+        logger.exception('Could not rebuild the portfolio snapshot')
+
+
+@receiver(content_changed)
+def schedule_snapshot_refresh(sender, **kwargs):
+    # Once per transaction, however many models it writes
+    connection = transaction.get_connection()
+    hooks = connection.run_on_commit
+    if connection.in_atomic_block:
+        if connection.__dict__.get('snapshot_hooks') is hooks:
+            return
+        connection.__dict__['snapshot_hooks'] = hooks
+
+    def refresh():
+        if connection.__dict__.get('snapshot_hooks') is hooks:
+            del connection.__dict__['snapshot_hooks']
+        refresh_snapshot_on_commit()
+
+    transaction.on_commit(refresh)
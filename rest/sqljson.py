@@ -0,0 +1,225 @@
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.models import Case, CharField,\
+    ExpressionWrapper, F, Func, IntegerField, Q, TextField, Value, When,\
+    Window
+from django.db.models.expressions import OrderBy, RawSQL
+from django.db.models.functions import Concat, RowNumber
+from django.dispatch import receiver
+from core.fields import StoredImageField
+from rest_framework import serializers
+from rest.renderers import PreEncodedJSON
+from rest.rows import JS_LINE_SEPARATORS, get_image_url_prefix
+from rest.serializers import ProjectedTranslationField
+
+# PLAIN_IMAGE_RE, in the regular expressions both databases understand
+PLAIN_IMAGE_PATTERN = (r'^(image|raw|video)/(upload|private|authenticated)'
+                       r'/v[0-9]+/[A-Za-z0-9_./-]+\Z')
+
+# Functions building a JSON object, and turning a column into a JSON value
+# the object embeds as is. PostgreSQL embeds jsonb columns as they are
+OBJECT_FUNCTIONS = {'sqlite': 'json_object', 'postgresql': 'json_build_object'}
+
+# Aggregation of the JSON objects of the ordered queryset, with the number of
+# rows the database could not represent. PostgreSQL orders the array by the
+# position of the rows in the queryset. SQLite has no ordered aggregates
+# before 3.44: json_group_array() keeps the order in which the ordered
+# subquery returns its rows, which it does as long as the outer query neither
+# joins nor groups them
+AGGREGATES = {
+    'sqlite': 'SELECT json_group_array(json({row})), COALESCE(SUM({fallback}),'
+              ' 0) FROM ({query}) AS json_rows',
+    'postgresql': "SELECT COALESCE(json_agg({row} ORDER BY {position}),"
+                  " '[]'::json)::text, COALESCE(SUM({fallback}), 0) FROM"
+                  ' ({query}) AS json_rows',
+}
+
+# Ordered array of the primary keys related to the outer row
+RELATED_ARRAYS = {
+    'sqlite': 'json((SELECT json_group_array({target}) FROM (SELECT {target}'
+              ' FROM {through} WHERE {source} = {table}.{pk} ORDER BY'
+              ' {target})))',
+    'postgresql': 'COALESCE((SELECT json_agg({target} ORDER BY {target}) FROM'
+                  " {through} WHERE {source} = {table}.{pk}), '[]'::json)",
+}
+
+
+class JSONArrayQuery:
+    """Read-only serialization of a whole queryset into the JSON array of the
+    mirrored serializer, built by the database in a single query. The array
+    holds the values JSONRenderer renders, not always with the same bytes.
+
+    `compile()` returns None for serializers with fields it does not know
+    how to build in SQL, and for databases without JSON functions"""
+
+    def __init__(self, serializer, connection):
+        self.vendor = connection.vendor
+        self.quote = connection.ops.quote_name
+        self.annotations = {}
+        self.fallback = Value(0, output_field=IntegerField())
+        self.row = self.compile(serializer)
+
+    def compile(self, serializer):
+        model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+        if model is None or self.vendor not in OBJECT_FUNCTIONS:
+            return None
+        translated_fields = getattr(serializer.Meta, 'translated_fields', {})
+        arguments = []
+        for field in serializer._readable_fields:
+            source = field.source
+            if source == '*' or '.' in source:
+                return None
+            if isinstance(field, ProjectedTranslationField):
+                name = 'projected_' + field.field_name
+                if translated_fields[field.field_name].kind is str:
+                    value = F(name)
+                else:
+                    value = self.json(F(name))
+            elif isinstance(field, serializers.ManyRelatedField):
+                child = field.child_relation
+                if not isinstance(child, serializers.PrimaryKeyRelatedField)\
+                        or child.pk_field is not None:
+                    return None
+                value = self.related_array(
+                    model, model._meta.get_field(source))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    return None
+                value = F(source)
+            elif isinstance(field, serializers.ImageField):
+                if not isinstance(model._meta.get_field(source),
+                                  StoredImageField)\
+                        or get_image_url_prefix() is None:
+                    return None
+                value = self.image_url(source)
+            elif isinstance(field, serializers.JSONField):
+                if field.binary:
+                    return None
+                value = self.json(F(source))
+            elif type(field) is serializers.BooleanField:
+                value = self.boolean(F(source))
+            elif type(field) in (serializers.CharField,
+                                 serializers.IntegerField):
+                value = F(source)
+            else:
+                return None
+            arguments += [Value(field.field_name), value]
+        return Func(*arguments, function=OBJECT_FUNCTIONS[self.vendor],
+                    output_field=TextField())
+
+    def json(self, expression):
+        """Returns the expression of a JSON column embedded as JSON"""
+        if self.vendor == 'sqlite':
+            return Func(expression, function='json', output_field=TextField())
+        return expression
+
+    def boolean(self, expression):
+        """Returns the expression of a boolean column as a JSON boolean"""
+        if self.vendor == 'sqlite':
+            # SQLite stores 0 and 1
+            return self.json(Case(
+                When(Q(**{expression.name: True}), then=Value('true')),
+                When(Q(**{expression.name: False}), then=Value('false')),
+                default=Value('null'), output_field=TextField()))
+        return expression
+
+    def related_array(self, model, field):
+        through = field.remote_field.through
+        return RawSQL(RELATED_ARRAYS[self.vendor].format(
+            target=self.quote(through._meta.get_field(
+                field.m2m_reverse_field_name()).column),
+            through=self.quote(through._meta.db_table),
+            source=self.quote(through._meta.get_field(
+                field.m2m_field_name()).column),
+            table=self.quote(model._meta.db_table),
+            pk=self.quote(model._meta.pk.column),
+        ), (), output_field=TextField())
+
+    def image_url(self, source):
+        """Returns the URL of the plain stored images, counting the other
+        ones for the fallback"""
+        name = 'raw_' + source
+        # Read the stored text, not a parsed CloudinaryResource
+        self.annotations[name] = ExpressionWrapper(
+            F(source), output_field=CharField())
+        plain = Q(**{name + '__regex': PLAIN_IMAGE_PATTERN})
+        self.fallback = ExpressionWrapper(self.fallback + Case(
+            When(plain | Q(**{name + '__isnull': True}) | Q(**{name: ''}),
+                 then=Value(0)),
+            default=Value(1), output_field=IntegerField()),
+            output_field=IntegerField())
+        return Case(
+            When(plain, then=Concat(Value(get_image_url_prefix()), F(name))),
+            default=Value(None), output_field=TextField())
+
+    def serialize(self, queryset):
+        """Returns the JSON array of the queryset, or None if the database
+        cannot represent some of its rows"""
+        connection = connections[queryset.db]
+        annotations = dict(self.annotations, json_row=self.row,
+                           json_fallback=self.fallback)
+        columns = ['json_row', 'json_fallback']
+        if self.vendor == 'postgresql':
+            ordering = get_ordering(queryset)
+            annotations['json_position'] = Window(
+                RowNumber(), order_by=ordering or None)
+            columns.append('json_position')
+        query, params = queryset.prefetch_related(None).annotate(
+            **annotations).values_list(*columns).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(AGGREGATES[self.vendor].format(
+                row=self.quote('json_row'),
+                fallback=self.quote('json_fallback'),
+                position=self.quote('json_position'),
+                query=query), params)
+            data, fallback = cursor.fetchone()
+        if fallback:
+            return None
+        return PreEncodedJSON(data.translate(JS_LINE_SEPARATORS).encode())
+
+
+def get_ordering(queryset):
+    """Returns the ordering of the queryset as a list of expressions"""
+    query = queryset.query
+    if query.order_by:
+        names = query.order_by
+    elif query.default_ordering:
+        names = query.get_meta().ordering
+    else:
+        names = ()
+    ordering = []
+    for name in names:
+        if isinstance(name, str):
+            if name == '?':
+                continue
+            if name.startswith('-'):
+                ordering.append(F(name[1:]).desc())
+            else:
+                ordering.append(F(name).asc())
+        elif isinstance(name, OrderBy):
+            ordering.append(name)
+        else:
+            ordering.append(name.asc())
+    return ordering
+
+
+compiled = {}
+
+
+@receiver(setting_changed)
+def reset_compiled(setting, **kwargs):
+    # The queries embed the URL prefix of the images
+    if setting in ('IMAGE_STORAGE', 'CLOUDINARY'):
+        compiled.clear()
+
+
+def build_json_array(serializer, queryset):
+    """Serializes the queryset into a JSON array built by the database, or
+    returns None if it cannot build it"""
+    key = (type(serializer), serializer.context.get('lang'), queryset.db)
+    if key not in compiled:
+        query = JSONArrayQuery(serializer, connections[queryset.db])
+        compiled[key] = query if query.row is not None else None
+    if compiled[key] is None:
+        return None
+    return compiled[key].serialize(queryset)
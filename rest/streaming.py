@@ -0,0 +1,115 @@
+from itertools import islice
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from rest_framework import renderers
+from rest_framework.response import Response
+from rest.renderers import JSONRenderer
+from rest.rows import serialize_rows
+from rest.sqljson import build_json_array
+
+
+def iterate_queryset(queryset, chunk_size):
+    """Iterates over a queryset without loading it whole, running its
+    prefetches chunk by chunk since iterator() skips them"""
+    rows = queryset.iterator(chunk_size=chunk_size)
+    lookups = queryset._prefetch_related_lookups
+    if not lookups:
+        yield from rows
+        return
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        prefetch_related_objects(chunk, *lookups)
+        yield from chunk
+
+
+def stream_json_array(serializer, rows, renderer, chunk_size):
+    """Encodes the rows one at a time into the bytes JSONRenderer would
+    render for their whole list, yielding about `chunk_size` rows at once"""
+    separator = b'['
+    chunk = []
+    for count, row in enumerate(rows, 1):
+        chunk.append(separator)
+        chunk.append(renderer.render(serializer.to_representation(row)))
+        separator = b','
+        if count % chunk_size == 0:
+            yield b''.join(chunk)
+            chunk = []
+    chunk.append(b'[]' if separator == b'[' else b']')
+    yield b''.join(chunk)
+
+
+class StreamingListMixin:
+    """Lets unpaginated list requests ask with `?stream=true` for a response
+    streamed while the queryset is read, instead of a serialized list built
+    whole in memory. Both render the same bytes.
+
+    Other unpaginated lists are read as rows when the serializer allows it,
+    and `?raw_json=true` splices their JSON columns as stored. With the
+    REST_SQL_JSON setting, the database builds their JSON array itself"""
+    stream_query_param = 'stream'
+    stream_chunk_size = 500
+    # Whether plain lists are read as rows when the serializer allows it
+    read_rows = True
+    # Raw JSON columns render the same values, but not the same bytes
+    raw_json_query_param = 'raw_json'
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.filter_queryset(self.get_queryset()))
+
+    def list_response(self, queryset):
+        """Returns the paginated, streamed or plain list of the queryset"""
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        if self.should_stream():
+            return self.streaming_response(queryset)
+        serializer = self.get_serializer()
+        if self.should_build_json_in_sql():
+            data = build_json_array(serializer, queryset)
+            if data is not None:
+                return Response(data)
+        if self.read_rows:
+            data = serialize_rows(serializer, queryset,
+                                  self.should_read_raw_json())
+            if data is not None:
+                return Response(data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def should_stream(self):
+        return self.flag_requested(self.stream_query_param)\
+            and self.renders_compact_json()
+
+    def should_read_raw_json(self):
+        return self.flag_requested(self.raw_json_query_param)\
+            and isinstance(self.request.accepted_renderer, JSONRenderer)\
+            and self.renders_compact_json()
+
+    def should_build_json_in_sql(self):
+        return getattr(settings, 'REST_SQL_JSON', False)\
+            and isinstance(self.request.accepted_renderer, JSONRenderer)\
+            and self.renders_compact_json()
+
+    def flag_requested(self, name):
+        value = self.request.query_params.get(name, '')
+        return value.lower() in ('1', 'true')
+
+    def renders_compact_json(self):
+        # Indented renders frame the list differently, leave them as is
+        renderer = self.request.accepted_renderer
+        return isinstance(renderer, renderers.JSONRenderer)\
+            and renderer.get_indent(self.request.accepted_media_type, {})\
+            is None
+
+    def streaming_response(self, queryset):
+        renderer = self.request.accepted_renderer
+        rows = iterate_queryset(queryset, self.stream_chunk_size)
+        return StreamingHttpResponse(
+            stream_json_array(self.get_serializer(), rows, renderer,
+                              self.stream_chunk_size),
+            content_type=renderer.media_type
+        )
@@ -0,0 +1,66 @@
+import os
+from unittest.mock import patch
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Project, Review
+from rest import authentication
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TECHNOLOGY_URL = reverse('rest:technology-list')
+GET_ALL_URL = reverse('rest:review-get-all')
+
+
+class AdminTokenAuthenticationTests(TestCase):
+    """Tests for the authentication of the Admin Token"""
+
+    def setUp(self):
+        self.client = APIClient()
+        project = Project.objects.create(
+            name={"en": "Project", "fr": "Projet"},
+            description={"en": ["Line"], "fr": ["Ligne"]}
+        )
+        self.review = Review.objects.get(project=project)
+
+    def test_header_parsed_once(self):
+        """Test that a request parses the Authorization header once,
+        however many permissions and serializers read the admin flag"""
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        with patch(
+            'rest.authentication.get_authorization_header',
+            wraps=authentication.get_authorization_header
+        ) as parse:
+            res = self.client.get(GET_ALL_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(parse.call_count, 1)
+        self.assertIn('update_code', res.json()[0])
+
+    def test_wrong_tokens_are_anonymous(self):
+        """Test that malformed or wrong tokens do not fail the public GET
+        methods but are refused on the others"""
+        headers = (
+            'Token',
+            'Token wrong',
+            'Token ' + os.environ['ADMIN_TOKEN'] + ' extra',
+            'Bearer ' + os.environ['ADMIN_TOKEN'],
+            'Token ' + os.environ['ADMIN_TOKEN'][:-1],
+        )
+        for header in headers:
+            with self.subTest(header=header):
+                self.client.credentials(HTTP_AUTHORIZATION=header)
+                res = self.client.get(GET_ALL_URL)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertNotIn('update_code', res.json()[0])
+
+                res = self.client.post(TECHNOLOGY_URL, {'name': 'Django'})
+                self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_token_keyword_case_insensitive(self):
+        """Test that the keyword of the header is case insensitive"""
+        self.client.credentials(
+            HTTP_AUTHORIZATION='token ' + os.environ['ADMIN_TOKEN'])
+        res = self.client.get(reverse('rest:cache-stats'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
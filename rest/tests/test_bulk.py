@@ -0,0 +1,257 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import ContentVersion, Project, Review, Skill, Technology
+from rest.bulk import BulkMixin, bulk_create_with_pks
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SKILL_BULK_URL = reverse('rest:skill-bulk')
+PROJECT_BULK_URL = reverse('rest:project-bulk')
+TECHNOLOGY_BULK_URL = reverse('rest:technology-bulk')
+
+
+def project_payload(index, technologies=()):
+    return {
+        'name': {'en': f'Project {index}', 'fr': f'Projet {index}'},
+        'description': {'en': ['Line'], 'fr': ['Ligne']},
+        'client': f'Client {index}',
+        'technologies': list(technologies),
+    }
+
+
+def content_version(model):
+    return ContentVersion.objects.filter(
+        label=model._meta.label_lower).values_list('version', flat=True)\
+        .first() or 0
+
+
+class BulkApiTests(TestCase):
+    """Tests for the bulk endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_client = APIClient()
+        self.admin_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        self.technologies = [
+            Technology.objects.create(
+                name=f'Tech {index}',
+                image=f'image/upload/v1/tech{index}.png'
+            )
+            for index in range(3)
+        ]
+
+    def test_admin_only(self):
+        """Test that the bulk endpoints require the Admin Token"""
+        res = self.client.post(
+            PROJECT_BULK_URL, [project_payload(0)], format='json')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        res = self.client.delete(
+            TECHNOLOGY_BULK_URL, [self.technologies[0].id], format='json')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Technology.objects.count(), 3)
+
+    def test_create_skills(self):
+        """Test creating skills in bulk"""
+        payload = [
+            {
+                'name': {'en': f'Skill {index}', 'fr': f'Compétence {index}'},
+                'description': {'en': ['Line'], 'fr': ['Ligne']},
+                'date': [6, 2021],
+                'technology': self.technologies[index].id,
+            }
+            for index in range(3)
+        ]
+        version = content_version(Skill)
+        res = self.admin_client.post(SKILL_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        skill = Skill.objects.get(name__en='Skill 1')
+        self.assertEqual(skill.technology, self.technologies[1])
+        self.assertEqual(skill.name_fr, 'competence 1')
+        self.assertEqual(content_version(Skill), version + 1)
+
+    def test_create_projects(self):
+        """Test that creating projects in bulk links their technologies
+        and creates their reviews"""
+        technology_ids = [tech.id for tech in self.technologies[:2]]
+        res = self.admin_client.post(PROJECT_BULK_URL, [
+            project_payload(index, technology_ids) for index in range(3)
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(project['id'] for project in res.data),
+            sorted(Project.objects.values_list('id', flat=True)))
+        for project in Project.objects.all():
+            self.assertEqual(
+                sorted(project.technologies.values_list('id', flat=True)),
+                technology_ids)
+            self.assertEqual(project.review.author, project.client)
+            self.assertEqual(project.name_en, project.name['en'].lower())
+        self.assertEqual(
+            Review.objects.values('update_code').distinct().count(), 3)
+
+    def test_create_invalid_item(self):
+        """Test that one invalid item fails the whole request"""
+        payload = [project_payload(0), project_payload(1)]
+        payload[1]['description'] = {'en': ['Line'], 'fr': []}
+        res = self.admin_client.post(
+            PROJECT_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('description', res.data[1])
+        self.assertFalse(Project.objects.exists())
+
+        payload[1] = project_payload(1, [self.technologies[0].id + 100])
+        res = self.admin_client.post(
+            PROJECT_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Project.objects.exists())
+
+    def test_create_query_count(self):
+        """Test that importing many projects takes a handful of queries"""
+        technology_ids = [tech.id for tech in self.technologies]
+        payload = [project_payload(index, technology_ids)
+                   for index in range(500)]
+        with CaptureQueriesContext(connection) as queries:
+            res = self.admin_client.post(
+                PROJECT_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Project.objects.count(), 500)
+        self.assertEqual(Review.objects.count(), 500)
+        self.assertEqual(Project.technologies.through.objects.count(), 1500)
+        self.assertLess(len(queries), 50)
+
+    def test_update_projects(self):
+        """Test updating projects in bulk"""
+        projects = [Project.objects.create(**{
+            key: value for key, value in project_payload(index).items()
+            if key != 'technologies'
+        }) for index in range(2)]
+        projects[0].technologies.add(self.technologies[0])
+        res = self.admin_client.patch(PROJECT_BULK_URL, [
+            {'id': projects[0].id, 'technologies': [self.technologies[2].id]},
+            {'id': projects[1].id,
+             'name': {'en': 'Écho', 'fr': 'Écho'}},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for project in projects:
+            project.refresh_from_db()
+        self.assertEqual(list(projects[0].technologies.all()),
+                         [self.technologies[2]])
+        self.assertEqual(projects[0].name['en'], 'Project 0')
+        self.assertEqual(projects[1].name_en, 'echo')
+
+    def test_update_keeps_image_details(self):
+        """Test that updating projects in bulk keeps the image details set
+        by an upload worker after they were read"""
+        project = Project.objects.create(**{
+            key: value for key, value in project_payload(0).items()
+            if key != 'technologies'
+        })
+        preload_related = BulkMixin.preload_related
+
+        def upload_finished(view, items):
+            Project.objects.filter(pk=project.pk).update(
+                image='image/upload/v2/new.png', image_width=640)
+            preload_related(view, items)
+
+        with patch.object(BulkMixin, 'preload_related', upload_finished):
+            res = self.admin_client.patch(PROJECT_BULK_URL, [
+                {'id': project.id, 'client': 'Client'},
+            ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        project.refresh_from_db()
+        self.assertEqual(project.client, 'Client')
+        self.assertEqual(project.image.public_id, 'new')
+        self.assertEqual(project.image_width, 640)
+
+    def test_update_missing(self):
+        """Test that updating an unknown ID changes nothing"""
+        project = Project.objects.create(**{
+            key: value for key, value in project_payload(0).items()
+            if key != 'technologies'
+        })
+        res = self.admin_client.patch(PROJECT_BULK_URL, [
+            {'id': project.id, 'client': 'Someone'},
+            {'id': project.id + 1, 'client': 'Someone'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        project.refresh_from_db()
+        self.assertEqual(project.client, 'Client 0')
+
+    @patch('core.storage.CloudinaryStorage.delete')
+    def test_delete_technologies(self, delete_resources):
+        """Test that deleting in bulk deletes the images in one call and
+        bumps the content version once"""
+        executor = ThreadPoolExecutor(max_workers=1)
+        version = content_version(Technology)
+        with patch('core.images.get_image_executor', return_value=executor),\
+                self.captureOnCommitCallbacks(execute=True):
+            res = self.admin_client.delete(TECHNOLOGY_BULK_URL, [
+                tech.id for tech in self.technologies[:2]
+            ], format='json')
+        executor.shutdown(wait=True)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Technology.objects.all()),
+                         [self.technologies[2]])
+        delete_resources.assert_called_once_with(['tech0', 'tech1'])
+        self.assertEqual(content_version(Technology), version + 1)
+
+    def test_invalid_payload(self):
+        """Test that the payload must be a list of items"""
+        payloads = (
+            {'id': self.technologies[0].id},
+            [],
+            ['1'],
+            [self.technologies[0].id, self.technologies[0].id],
+        )
+        for payload in payloads:
+            with self.subTest(payload=payload):
+                res = self.admin_client.delete(
+                    TECHNOLOGY_BULK_URL, payload, format='json')
+                self.assertEqual(
+                    res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Technology.objects.count(), 3)
+
+    def test_create_pks(self):
+        """Test that the instances get the primary keys of their rows, and
+        that rows written by someone else are never taken for them"""
+        technologies = [Technology(name=f'New {index}') for index in range(2)]
+        bulk_create_with_pks(Technology, technologies)
+        for technology in technologies:
+            self.assertEqual(
+                Technology.objects.get(pk=technology.pk).name, technology.name)
+
+        bulk_create = QuerySet.bulk_create
+
+        def interleaved(queryset, objs, *args, **kwargs):
+            created = bulk_create(queryset, objs, *args, **kwargs)
+            Technology.objects.create(name='Concurrent')
+            return created
+
+        technologies = [Technology(name=f'Late {index}') for index in range(2)]
+        with patch.object(QuerySet, 'bulk_create', interleaved):
+            if connection.features.can_return_rows_from_bulk_insert:
+                bulk_create_with_pks(Technology, technologies)
+                self.assertEqual(
+                    Technology.objects.get(pk=technologies[1].pk).name,
+                    'Late 1')
+            else:
+                with self.assertRaises(DatabaseError):
+                    bulk_create_with_pks(Technology, technologies)
@@ -0,0 +1,124 @@
+import os
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Project, Skill, Technology
+from rest.cache import DjangoResponseCache, LRUResponseCache,\
+    response_cache
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SKILL_URL = reverse('rest:skill-list')
+PROJECT_URL = reverse('rest:project-list')
+CACHE_STATS_URL = reverse('rest:cache-stats')
+
+
+class LRUResponseCacheTests(TestCase):
+    """Tests for the in-process response cache"""
+
+    def test_eviction(self):
+        """Test that the least recently used entries are evicted first"""
+        cache = LRUResponseCache(max_bytes=10)
+        cache.set('a', b'1234', ('core.skill',))
+        cache.set('b', b'1234', ('core.skill',))
+        cache.get('a', ())
+        cache.set('c', b'1234', ('core.project',))
+
+        self.assertEqual(cache.get('a', ()), b'1234')
+        self.assertIsNone(cache.get('b', ()))
+        self.assertEqual(cache.get('c', ()), b'1234')
+        self.assertEqual(cache.size, 8)
+
+    def test_invalidate(self):
+        """Test that invalidating a label only drops its entries"""
+        cache = LRUResponseCache()
+        cache.set('a', b'1', ('core.project', 'core.technology'))
+        cache.set('b', b'2', ('core.skill',))
+        cache.invalidate('core.technology')
+
+        self.assertIsNone(cache.get('a', ()))
+        self.assertEqual(cache.get('b', ()), b'2')
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+
+class DjangoResponseCacheTests(TestCase):
+    """Tests for the response cache stored in the Django cache"""
+
+    def test_invalidate(self):
+        """Test that invalidating a label only drops its entries"""
+        cache = DjangoResponseCache()
+        cache.clear()
+        cache.set('a', b'1', ('core.project', 'core.technology'))
+        cache.set('b', b'2', ('core.skill',))
+        cache.invalidate('core.technology')
+
+        self.assertIsNone(cache.get('a', ('core.project', 'core.technology')))
+        self.assertEqual(cache.get('b', ('core.skill',)), b'2')
+
+
+class ResponseCacheApiTests(TestCase):
+    """Tests for the response cache of the read-only endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_client = APIClient()
+        self.admin_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        response_cache.clear()
+        Skill.objects.create(
+            name={"en": "Test skill", "fr": "Test skill"},
+            description={"en": ["Test desc"], "fr": ["Test desc"]},
+            date=[6, 2021]
+        )
+
+    def test_cached_response(self):
+        """Test that an unchanged list is served from the cache"""
+        res = self.client.get(SKILL_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(SKILL_URL)
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached['Content-Type'], 'application/json')
+        self.assertEqual(cached.content, res.content)
+
+    def test_write_invalidates(self):
+        """Test that a write makes the next request a miss"""
+        self.client.get(SKILL_URL)
+        Skill.objects.create(
+            name={"en": "Other skill", "fr": "Autre skill"},
+            description={"en": ["Test desc"], "fr": ["Test desc"]},
+            date=[6, 2021]
+        )
+        res = self.client.get(SKILL_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data), 2)
+
+    def test_related_write_invalidates(self):
+        """Test that a technology change invalidates the project list"""
+        project = Project.objects.create(
+            name={"en": "Test project", "fr": "Projet test"},
+            description={"en": ["Test desc"], "fr": ["Test desc"]}
+        )
+        self.client.get(PROJECT_URL)
+        project.technologies.add(Technology.objects.create(name='Django'))
+        res = self.client.get(PROJECT_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.data[0]['technologies']), 1)
+
+    def test_stats_admin_only(self):
+        """Test that the cache statistics require admin rights"""
+        res = self.client.get(CACHE_STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats(self):
+        """Test that the cache statistics count hits and misses"""
+        self.client.get(SKILL_URL)
+        self.client.get(SKILL_URL)
+        res = self.admin_client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['hits'], 1)
+        self.assertEqual(res.data['misses'], 1)
+        self.assertEqual(res.data['hit_rate'], 0.5)
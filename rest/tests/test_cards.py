@@ -0,0 +1,181 @@
+import os
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import Project, ProjectCard, Technology
+from rest.serializers import LightProjectSerializer, TechnologySerializer
+from rest_framework import status
+from rest_framework.test import APIClient
+
+CARDS_URL = reverse('rest:project-cards')
+PROJECT_BULK_URL = reverse('rest:project-bulk')
+TECHNOLOGY_BULK_URL = reverse('rest:technology-bulk')
+
+CARD_IMAGE_FIELDS = ('image', 'image_width', 'image_height',
+                     'image_placeholder')
+
+
+def expected_cards():
+    """Returns the cards built from the serialized projects and technologies,
+    in the default order"""
+    cards = []
+    for project in Project.objects.order_by('name_en', 'id'):
+        data = LightProjectSerializer(project).data
+        cards.append({
+            'id': data['id'],
+            'name': data['name'],
+            'description': {
+                language: lines[0]
+                for language, lines in data['description'].items()
+            },
+            **{key: data[key] for key in CARD_IMAGE_FIELDS},
+            'technologies': [
+                {'id': technology['id'], 'name': technology['name'],
+                 **{key: technology[key] for key in CARD_IMAGE_FIELDS}}
+                for technology in TechnologySerializer(
+                    project.technologies.order_by('name', 'id'),
+                    many=True).data
+            ],
+        })
+    return cards
+
+
+class ProjectCardTests(TestCase):
+    """Tests for the denormalized project cards"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_client = APIClient()
+        self.admin_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        self.technologies = [
+            Technology.objects.create(
+                name=f'Tech {index}',
+                image=f'image/upload/v1/tech{index}.png')
+            for index in range(3)
+        ]
+        self.projects = []
+        for index in range(3):
+            project = Project.objects.create(
+                name={'en': f'Project {index}', 'fr': f'Projet {index}'},
+                description={'en': ['First', 'Second'], 'fr': ['Premier']},
+                image=f'image/upload/v1/project{index}.png' if index else None
+            )
+            project.technologies.add(*self.technologies[index:])
+            self.projects.append(project)
+
+    def assertCardsUpToDate(self):
+        self.assertEqual(self.client.get(CARDS_URL).json(), expected_cards())
+
+    def test_list_cards(self):
+        """Test that the cards hold the serialized projects"""
+        res = self.client.get(CARDS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), expected_cards())
+        self.assertEqual(res.json()[1]['description'],
+                         {'en': 'First', 'fr': 'Premier'})
+
+    def test_ordering(self):
+        """Test that the cards follow the orderings of the projects"""
+        res = self.client.get(CARDS_URL + '?ordering=-id')
+
+        self.assertEqual([card['id'] for card in res.json()],
+                         [project.id for project in self.projects[::-1]])
+
+    def test_single_table(self):
+        """Test that the cards are read from their table alone"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(CARDS_URL)
+
+        # The content versions, and the cards
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('core_project"', queries[1]['sql'])
+
+    def test_project_changed(self):
+        """Test that editing a project rebuilds its card"""
+        project = self.projects[0]
+        project.name = {'en': 'A project', 'fr': 'Un projet'}
+        project.description = {'en': ['New'], 'fr': ['Nouveau']}
+        project.save()
+
+        self.assertCardsUpToDate()
+        self.assertEqual(self.client.get(CARDS_URL).json()[0]['id'],
+                         project.id)
+
+    def test_technologies_changed(self):
+        """Test that linking and unlinking technologies, from either side,
+        rebuilds the cards"""
+        self.projects[2].technologies.add(self.technologies[0])
+        self.assertCardsUpToDate()
+        self.projects[0].technologies.remove(self.technologies[1])
+        self.assertCardsUpToDate()
+        self.technologies[2].project_set.remove(self.projects[1])
+        self.assertCardsUpToDate()
+        self.technologies[2].project_set.clear()
+        self.assertCardsUpToDate()
+        self.projects[1].technologies.clear()
+        self.assertCardsUpToDate()
+
+    def test_technology_changed(self):
+        """Test that renaming a technology rebuilds the cards using it"""
+        technology = self.technologies[2]
+        technology.name = 'Renamed'
+        technology.image = 'image/upload/v2/renamed.png'
+        technology.save()
+
+        self.assertCardsUpToDate()
+        self.assertEqual(
+            self.client.get(CARDS_URL).json()[2]['technologies'][0]['name'],
+            'Renamed')
+
+    def test_technology_deleted(self):
+        """Test that deleting a technology removes it from the cards"""
+        Technology.objects.get(pk=self.technologies[1].pk).delete()
+
+        self.assertCardsUpToDate()
+
+    def test_project_deleted(self):
+        """Test that deleting a project deletes its card"""
+        Project.objects.get(pk=self.projects[1].pk).delete()
+
+        self.assertCardsUpToDate()
+        self.assertEqual(ProjectCard.objects.count(), 2)
+
+    def test_bulk_writes(self):
+        """Test that the bulk writes, which send no signals, rebuild the
+        cards"""
+        res = self.admin_client.post(PROJECT_BULK_URL, [{
+            'name': {'en': 'Bulk', 'fr': 'En masse'},
+            'description': {'en': ['Line'], 'fr': ['Ligne']},
+            'technologies': [self.technologies[0].id],
+        }], format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertCardsUpToDate()
+
+        res = self.admin_client.patch(PROJECT_BULK_URL, [{
+            'id': self.projects[0].id,
+            'technologies': [self.technologies[1].id],
+        }], format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCardsUpToDate()
+
+        res = self.admin_client.patch(TECHNOLOGY_BULK_URL, [{
+            'id': self.technologies[1].id, 'name': 'Renamed',
+        }], format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCardsUpToDate()
+
+    def test_rebuild(self):
+        """Test that the rebuild command catches up with writes sending no
+        signals"""
+        ProjectCard.objects.filter(pk=self.projects[0].pk).delete()
+        Technology.objects.update(name='Updated')
+        out = StringIO()
+        call_command('rebuild_project_cards', stdout=out)
+
+        self.assertIn('Rebuilt 3 card(s)', out.getvalue())
+        self.assertCardsUpToDate()
@@ -0,0 +1,89 @@
+import os
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Project, Review, Skill, Technology
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TECHNOLOGY_URL = reverse('rest:technology-list')
+SKILL_URL = reverse('rest:skill-list')
+PROJECT_URL = reverse('rest:project-list')
+REVIEW_URL = reverse('rest:review-list')
+REVIEW_ALL_URL = reverse('rest:review-get-all')
+
+
+class ConditionalGetTests(TestCase):
+    """Tests for the ETag support of the read-only endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_client = APIClient()
+        self.admin_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        self.technology = Technology.objects.create(name='Django')
+        Skill.objects.create(
+            name={"en": "Test skill", "fr": "Test skill"},
+            description={"en": ["Test desc"], "fr": ["Test desc"]},
+            date=[6, 2021]
+        )
+        self.project = Project.objects.create(
+            name={"en": "Test project", "fr": "Projet test"},
+            description={"en": ["Test desc"], "fr": ["Test desc"]}
+        )
+
+    def test_list_endpoints_send_etag(self):
+        """Test that every list endpoint sends an ETag"""
+        for url in (TECHNOLOGY_URL, SKILL_URL, PROJECT_URL,
+                    REVIEW_URL, REVIEW_ALL_URL):
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertTrue(res['ETag'].startswith('"'))
+
+    def test_not_modified(self):
+        """Test that a matching If-None-Match is answered with a 304"""
+        for url in (TECHNOLOGY_URL, SKILL_URL, PROJECT_URL,
+                    REVIEW_URL, REVIEW_ALL_URL):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(1):
+                res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(res['ETag'], etag)
+            self.assertEqual(res.content, b'')
+
+    def test_write_changes_etag(self):
+        """Test that a write makes the previous ETag stale"""
+        etag = self.client.get(SKILL_URL)['ETag']
+        Skill.objects.create(
+            name={"en": "Other skill", "fr": "Autre skill"},
+            description={"en": ["Test desc"], "fr": ["Test desc"]},
+            date=[6, 2021]
+        )
+        res = self.client.get(SKILL_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.data), 2)
+
+    def test_m2m_change_changes_etag(self):
+        """Test that linking a technology to a project changes its ETag"""
+        etag = self.client.get(PROJECT_URL)['ETag']
+        self.project.technologies.add(self.technology)
+        res = self.client.get(PROJECT_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['technologies'], [self.technology.id])
+
+    def test_technology_delete_changes_project_etag(self):
+        """Test that deleting a linked technology changes the project ETag"""
+        self.project.technologies.add(self.technology)
+        etag = self.client.get(PROJECT_URL)['ETag']
+        Technology.objects.filter(id=self.technology.id).delete()
+        res = self.client.get(PROJECT_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['technologies'], [])
+
+    def test_admin_etag_differs(self):
+        """Test that the admin view of the reviews has its own ETag"""
+        Review.objects.update(modified=True)
+        etag = self.client.get(REVIEW_ALL_URL)['ETag']
+        res = self.admin_client.get(REVIEW_ALL_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('update_code', res.data[0])
@@ -0,0 +1,36 @@
+from django.core import mail
+from django.test import TestCase
+from core.models import OutboxMessage
+from rest_framework import status
+from rest_framework.test import APIClient
+
+CONTACT_URL = '/api/mail/'
+
+
+class ContactApiTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_contact(self):
+        """Test that a contact message is queued and acknowledged"""
+        payload = {
+            "email": "visitor@example.com",
+            "name": "Visitor",
+            "subject": "Hello",
+            "message": "Nice portfolio"
+        }
+        res = self.client.post(CONTACT_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), 0)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.subject, 'Hello')
+        self.assertEqual(message.from_email, 'visitor@example.com')
+        self.assertEqual(message.body, 'Name: Visitor\nNice portfolio')
+
+    def test_contact_invalid(self):
+        """Test that an invalid contact message is rejected"""
+        res = self.client.post(CONTACT_URL, {"email": "wrong"}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(OutboxMessage.objects.exists())
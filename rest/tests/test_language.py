@@ -0,0 +1,85 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import Project, Review, Skill
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SKILL_URL = reverse('rest:skill-list')
+PROJECT_URL = reverse('rest:project-list')
+REVIEW_URL = reverse('rest:review-list')
+
+
+class LanguageProjectionTests(TestCase):
+    """Tests for the single language responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        Skill.objects.create(
+            name={"en": "Test skill", "fr": "Compétence test"},
+            description={"en": ["Line 1", "Line 2"], "fr": ["Ligne 1"]},
+            date=[6, 2021]
+        )
+        self.project = Project.objects.create(
+            name={"en": "2048", "fr": "Projet test"},
+            description={"en": ["Test desc"], "fr": ["Description test"]}
+        )
+        Review.objects.create(
+            author="Google CEO",
+            message={"en": "Good, very gud!", "fr": "Bien, très bien!"},
+            modified=True
+        )
+
+    def test_without_lang(self):
+        """Test that both languages are returned by default"""
+        res = self.client.get(SKILL_URL)
+        self.assertEqual(res.data[0]['name'],
+                         {"en": "Test skill", "fr": "Compétence test"})
+        self.assertNotIn('Accept-Language', res.get('Vary', ''))
+
+    def test_lang_param(self):
+        """Test that ?lang returns a single language"""
+        res = self.client.get(SKILL_URL, {'lang': 'fr'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['name'], "Compétence test")
+        self.assertEqual(res.data[0]['description'], ["Ligne 1"])
+
+        res = self.client.get(PROJECT_URL, {'lang': 'en'})
+        self.assertEqual(res.data[0]['name'], "2048")
+        self.assertEqual(res.data[0]['description'], ["Test desc"])
+
+        res = self.client.get(REVIEW_URL, {'lang': 'fr'})
+        self.assertEqual(res.data[0]['message'], "Bien, très bien!")
+
+    def test_project_detail(self):
+        """Test that the project details can be projected"""
+        url = reverse('rest:project-detail', kwargs={'pk': self.project.id})
+        res = self.client.get(url, {'lang': 'fr'})
+        self.assertEqual(res.data['name'], "Projet test")
+
+    def test_projection_in_sql(self):
+        """Test that the other language is not loaded from the database"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(SKILL_URL, {'lang': 'en'})
+        select = [q['sql'] for q in queries
+                  if 'core_skill' in q['sql']][0].split(' FROM ')[0]
+        self.assertEqual(select.count('"core_skill"."name"'), 1)
+        self.assertEqual(select.count('"core_skill"."description"'), 1)
+
+    def test_accept_language(self):
+        """Test that ?lang=auto follows Accept-Language"""
+        res = self.client.get(SKILL_URL, {'lang': 'auto'},
+                              HTTP_ACCEPT_LANGUAGE='fr-FR,fr;q=0.9,en;q=0.8')
+        self.assertEqual(res.data[0]['name'], "Compétence test")
+        self.assertIn('Accept-Language', res['Vary'])
+
+        res = self.client.get(SKILL_URL, {'lang': 'auto'},
+                              HTTP_ACCEPT_LANGUAGE='de-DE,en;q=0.5')
+        self.assertEqual(res.data[0]['name'], "Test skill")
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_unknown_lang(self):
+        """Test that an unsupported language is rejected"""
+        res = self.client.get(SKILL_URL, {'lang': 'de'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,56 @@
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Skill
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SKILL_URL = reverse('rest:skill-list')
+
+
+class OrderingTests(TestCase):
+    """Tests for the ordering of the lists on the sort key columns"""
+
+    def setUp(self):
+        self.client = APIClient()
+        for en, fr in (('Zebra', 'Zèbre'), ('apple', 'Pomme'),
+                       ('Écho', 'Écho'), ('Echo', 'Éclair')):
+            Skill.objects.create(
+                name={"en": en, "fr": fr},
+                description={"en": ["Desc"], "fr": ["Desc"]},
+                date=[6, 2021]
+            )
+
+    def names(self, res, language='en'):
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [skill['name'][language] for skill in res.data]
+
+    def test_default_ordering(self):
+        """Test that the names are sorted ignoring case and accents"""
+        res = self.client.get(SKILL_URL)
+        self.assertEqual(self.names(res),
+                         ['apple', 'Écho', 'Echo', 'Zebra'])
+
+    def test_french_ordering(self):
+        """Test ordering on the French names"""
+        res = self.client.get(SKILL_URL, {'ordering': 'name_fr'})
+        self.assertEqual(self.names(res, 'fr'),
+                         ['Écho', 'Éclair', 'Pomme', 'Zèbre'])
+
+    def test_projected_ordering(self):
+        """Test that ordering on name follows the requested language"""
+        res = self.client.get(SKILL_URL, {'ordering': '-name', 'lang': 'fr'})
+        self.assertEqual(res.data[0]['name'], 'Zèbre')
+
+    def test_descending_pages(self):
+        """Test paginating a descending ordering"""
+        res = self.client.get(SKILL_URL,
+                              {'ordering': '-name', 'page_size': 3})
+        names = [skill['name']['en'] for skill in res.data['results']]
+        res = self.client.get(res.data['next'])
+        names += [skill['name']['en'] for skill in res.data['results']]
+        self.assertEqual(names, ['Zebra', 'Echo', 'Écho', 'apple'])
+
+    def test_unknown_ordering(self):
+        """Test that an unknown ordering is rejected"""
+        res = self.client.get(SKILL_URL, {'ordering': 'description'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
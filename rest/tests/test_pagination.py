@@ -0,0 +1,76 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import Project, Review
+from rest_framework import status
+from rest_framework.test import APIClient
+
+PROJECT_URL = reverse('rest:project-list')
+REVIEW_URL = reverse('rest:review-list')
+REVIEW_ALL_URL = reverse('rest:review-get-all')
+
+
+class KeysetPaginationTests(TestCase):
+    """Tests for the opt-in cursor pagination"""
+
+    def setUp(self):
+        self.client = APIClient()
+        for author in ('Bob', 'Alice', 'Bob', 'Carol', 'Bob'):
+            Review.objects.create(
+                author=author,
+                message={"en": "Good", "fr": "Bien"},
+                modified=True
+            )
+
+    def walk(self, url, page_size):
+        """Follows the next links and returns the pages"""
+        pages = []
+        res = self.client.get(url, {'page_size': page_size})
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append(res.data['results'])
+            if res.data['next'] is None:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_unpaginated_by_default(self):
+        """Test that a request without parameters is not paginated"""
+        res = self.client.get(REVIEW_URL)
+        self.assertIsInstance(res.data, list)
+        self.assertEqual(len(res.data), 5)
+
+    def test_walk_pages(self):
+        """Test that the pages cover every row once, in keyset order"""
+        pages = self.walk(REVIEW_ALL_URL, 2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        reviews = [review for page in pages for review in page]
+        expected = list(Review.objects.order_by('author', 'id'))
+        self.assertEqual([review['id'] for review in reviews],
+                         [review.id for review in expected])
+
+    def test_no_offset_nor_count(self):
+        """Test that a page is fetched without OFFSET nor COUNT"""
+        first = self.client.get(REVIEW_URL, {'page_size': 2})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first.data['next'])
+        for query in queries:
+            self.assertNotIn('OFFSET', query['sql'].upper())
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_project_pages(self):
+        """Test paginating the projects on their name"""
+        for name in ('Zeta', 'Alpha', 'Beta'):
+            Project.objects.create(
+                name={"en": name, "fr": name},
+                description={"en": ["Desc"], "fr": ["Desc"]}
+            )
+        pages = self.walk(PROJECT_URL, 2)
+        self.assertEqual(
+            [project['name']['en'] for page in pages for project in page],
+            ['Alpha', 'Beta', 'Zeta'])
+
+    def test_invalid_cursor(self):
+        """Test that an invalid cursor is rejected"""
+        res = self.client.get(REVIEW_URL, {'cursor': 'wrong'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
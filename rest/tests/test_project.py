@@ -81,6 +81,26 @@ class ProjectApiTests(TestCase):
                                )
         self.assertTrue(has_good_attributes)
 
+    def test_sort_keys_hidden(self):
+        """Test that the sort keys of the names stay out of the API"""
+        project = Project.objects.create(
+            name={"en": "Test project", "fr": "Projet test"},
+            description={"en": ["Test desc"], "fr": ["Test desc"]}
+        )
+        detail_url = reverse('rest:project-detail', kwargs={"pk": project.id})
+        payload = {
+            'name': {"en": "Other project", "fr": "Autre projet"},
+            'description': {"en": ["Test desc"], "fr": ["Test desc"]},
+        }
+
+        responses = [
+            self.client.get(detail_url).data,
+            self.admin_client.post(PROJECT_URL, payload, format="json").data,
+        ] + list(self.client.get(PROJECT_URL).data)
+        for data in responses:
+            self.assertNotIn('name_en', data)
+            self.assertNotIn('name_fr', data)
+
     def test_create_admin_only(self):
         """Tests that the creation requires admin rights"""
         payload = {
@@ -216,6 +236,7 @@ class ProjectImageApiTests(TestCase):
             detail_url = reverse('rest:project-upload-image',
                                  kwargs={'pk': project.id})
             res = self.admin_client.post(detail_url, {"image": ntf})
-            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(res.data['uploads'][0]['status'], 'pending')
             project.refresh_from_db()
             project.delete()
@@ -0,0 +1,107 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import Project, Review, Skill, Technology
+from rest.cache import response_cache
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SIZES = (10, 100, 1000)
+
+
+def seed(count):
+    """Adds rows to every table until each holds `count` of them"""
+    start = Technology.objects.count()
+    technologies = Technology.objects.bulk_create(
+        Technology(name=f'Tech {index}', image=f'image/upload/v1/t{index}')
+        for index in range(start, count)
+    )
+    technology = Technology.objects.order_by('id').first()
+    last_project = Project.objects.order_by('id').last()
+    Skill.objects.bulk_create(
+        Skill(
+            name={"en": f"Skill {index}", "fr": f"Compétence {index}"},
+            description={"en": ["Line"], "fr": ["Ligne"]},
+            date=[6, 2021],
+            technology=technology
+        )
+        for index in range(start, count)
+    )
+    Project.objects.bulk_create(
+        Project(
+            name={"en": f"Project {index}", "fr": f"Projet {index}"},
+            description={"en": ["Line"], "fr": ["Ligne"]},
+            image=f'image/upload/v1/p{index}'
+        )
+        for index in range(start, count)
+    )
+    projects = list(Project.objects.filter(
+        id__gt=last_project.id if last_project else 0).order_by('id'))
+    Review.objects.bulk_create(
+        Review(
+            author=f'Client {index}',
+            message={"en": "Good", "fr": "Bien"},
+            modified=True,
+            project=project
+        )
+        for index, project in enumerate(projects, start)
+    )
+    through = Project.technologies.through
+    technology_ids = [tech.id for tech in Technology.objects.order_by('id')]
+    through.objects.bulk_create(
+        through(project_id=project.id, technology_id=technology_id)
+        for project in projects
+        for technology_id in technology_ids[:3]
+    )
+    return technologies
+
+
+class QueryCountTests(TestCase):
+    """Tests that the read endpoints run a constant number of queries,
+    whatever the size of the tables"""
+
+    def setUp(self):
+        self.client = APIClient()
+        project = Project.objects.create(
+            name={"en": "First project", "fr": "Premier projet"},
+            description={"en": ["Line"], "fr": ["Ligne"]}
+        )
+        self.urls = (
+            reverse('rest:technology-list'),
+            reverse('rest:skill-list'),
+            reverse('rest:project-list'),
+            reverse('rest:project-list') + '?lang=fr',
+            reverse('rest:project-detail', kwargs={'pk': project.id}),
+            reverse('rest:review-list'),
+            reverse('rest:review-get-all'),
+            reverse('rest:snapshot'),
+        )
+        self.client.get(reverse('rest:snapshot'))
+
+    def count_queries(self, url):
+        response_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_constant_query_count(self):
+        """Test that the query count does not grow with the rows"""
+        counts = {}
+        for size in SIZES:
+            seed(size)
+            # Bulk inserts send no signal, outdate the snapshot explicitly
+            Technology.objects.first().save()
+            for url in self.urls:
+                counts.setdefault(url, []).append(self.count_queries(url))
+
+        for url, url_counts in counts.items():
+            with self.subTest(url=url):
+                self.assertEqual(len(set(url_counts)), 1, url_counts)
+
+    def test_project_list_queries(self):
+        """Test that the project list loads the technologies at once"""
+        seed(100)
+        self.assertEqual(
+            self.count_queries(reverse('rest:project-list')), 3)
@@ -0,0 +1,113 @@
+import json
+import os
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Project, Review, Skill, Technology
+from rest.cache import response_cache
+from rest.rows import RowSerializer
+from rest.serializers import MailSerializer, ProjectSerializer
+from rest.streaming import StreamingListMixin
+from rest_framework import status
+from rest_framework.test import APIClient
+
+LIST_URLS = (
+    reverse('rest:technology-list'),
+    reverse('rest:skill-list'),
+    reverse('rest:skill-list') + '?lang=fr',
+    reverse('rest:project-list'),
+    reverse('rest:project-list') + '?lang=en&ordering=-name',
+    reverse('rest:review-list'),
+    reverse('rest:review-list') + '?lang=fr',
+    reverse('rest:review-get-all'),
+)
+
+IMAGES = (
+    'image/upload/v1/tech.png',
+    'image/upload/v1634/folder/sub-folder/tech_2',
+    'image/upload/v1/with space.png',
+    'image/upload/v1/accentué.png',
+    'image/upload/no-version.png',
+    'raw/private/v3/file.pdf',
+)
+
+
+class RowSerializerTests(TestCase):
+    """Tests for the serialization of lists from rows"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_client = APIClient()
+        self.admin_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        technologies = [
+            Technology.objects.create(name=f'Tech {index}', image=image)
+            for index, image in enumerate(IMAGES)
+        ]
+        for index in range(4):
+            Skill.objects.create(
+                name={'en': f'Skill {index}', 'fr': f'Compétence {index}'},
+                description={'en': ['Line', ''], 'fr': ['Ligne']},
+                date=[index + 1, 2021],
+                technology=technologies[index] if index else None
+            )
+            project = Project.objects.create(
+                name={'en': f'Project {index}', 'fr': f'Projet {index}'},
+                description={'en': ['Line'], 'fr': ['Ligne']},
+                image=IMAGES[index] if index else None,
+                client=f'Client {index}'
+            )
+            project.technologies.add(*technologies[index:])
+        review = Review.objects.first()
+        review.message = {'en': 'Great', 'fr': 'Génial'}
+        review.save()
+
+    def test_parity(self):
+        """Test that lists read from rows equal the serialized ones"""
+        for client in (self.client, self.admin_client):
+            for url in LIST_URLS:
+                with self.subTest(url=url):
+                    response_cache.clear()
+                    res = client.get(url)
+                    with patch.object(
+                            StreamingListMixin, 'read_rows', False):
+                        response_cache.clear()
+                        expected = client.get(url)
+
+                    self.assertEqual(res.status_code, status.HTTP_200_OK)
+                    self.assertEqual(res.content, expected.content)
+
+    def test_raw_json(self):
+        """Test that lists with raw JSON columns hold the same values,
+        without decoding the JSON columns"""
+        for client in (self.client, self.admin_client):
+            for url in LIST_URLS:
+                with self.subTest(url=url):
+                    response_cache.clear()
+                    expected = client.get(url)
+                    raw_url = url + ('&' if '?' in url else '?')\
+                        + 'raw_json=true'
+                    with patch('django.db.models.JSONField.from_db_value',
+                               side_effect=AssertionError):
+                        res = client.get(raw_url)
+
+                    self.assertEqual(res.status_code, status.HTTP_200_OK)
+                    self.assertEqual(res['Content-Type'],
+                                     expected['Content-Type'])
+                    self.assertEqual(json.loads(res.content),
+                                     json.loads(expected.content))
+
+    def test_unsupported_fields(self):
+        """Test that serializers with unknown fields have no fast path"""
+        self.assertIsNone(RowSerializer(MailSerializer()).represent)
+        self.assertIsNone(RowSerializer(ProjectSerializer()).represent)
+
+    def test_benchmark_command(self):
+        """Test that the benchmark reports both serializations"""
+        out = StringIO()
+        call_command('benchmark_reads', rows=20, repeat=1, stdout=out)
+
+        self.assertIn('projects: serializer', out.getvalue())
+        self.assertEqual(Project.objects.count(), 4)
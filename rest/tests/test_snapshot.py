@@ -0,0 +1,105 @@
+import json
+import os
+from unittest.mock import patch
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from core.models import Project, Review, Skill, Snapshot, Technology
+from rest import snapshot
+from rest.snapshot import SNAPSHOT_KEY
+from rest_framework import status
+from rest_framework.test import APIClient
+
+SNAPSHOT_URL = reverse('rest:snapshot')
+
+
+class SnapshotApiTests(TestCase):
+    """Tests for the aggregated snapshot endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            Technology.objects.create(name='Django')
+            Skill.objects.create(
+                name={"en": "Test skill", "fr": "Test skill"},
+                description={"en": ["Test desc"], "fr": ["Test desc"]},
+                date=[6, 2021]
+            )
+            Project.objects.create(
+                name={"en": "Test project", "fr": "Projet test"},
+                description={"en": ["Test desc"], "fr": ["Test desc"]}
+            )
+
+    def test_snapshot_content(self):
+        """Test that the snapshot holds every public list"""
+        res = self.client.get(SNAPSHOT_URL)
+        data = json.loads(res.content)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(len(data['technologies']), 1)
+        self.assertEqual(len(data['skills']), 1)
+        self.assertEqual(len(data['projects']), 1)
+        self.assertNotIn('github', data['projects'][0])
+        self.assertEqual(data['reviews'], [])
+
+    def test_rebuilt_on_commit(self):
+        """Test that a committed write rebuilds the snapshot once"""
+        self.assertTrue(Snapshot.objects.filter(key=SNAPSHOT_KEY).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.filter(author='').update(author='Client')
+            review = Review.objects.get()
+            review.save()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SNAPSHOT_URL)
+        data = json.loads(res.content)
+        self.assertEqual(data['reviews'][0]['author'], 'Client')
+
+    def test_stale_snapshot_rebuilt_on_read(self):
+        """Test that a write whose commit hook did not run is still seen"""
+        Technology.objects.create(name='Python')
+        res = self.client.get(SNAPSHOT_URL)
+        data = json.loads(res.content)
+        self.assertEqual(len(data['technologies']), 2)
+
+    def test_not_modified(self):
+        """Test that a matching If-None-Match is answered with a 304"""
+        etag = self.client.get(SNAPSHOT_URL)['ETag']
+        res = self.client.get(SNAPSHOT_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class SnapshotRefreshTests(TransactionTestCase):
+    """Tests for the rebuilds of the snapshot after the committed writes"""
+
+    def setUp(self):
+        self.admin_client = APIClient()
+        self.admin_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        self.technologies = [Technology.objects.create(name=f'Tech {index}')
+                             for index in range(2)]
+
+    def test_rebuilt_once_per_write(self):
+        """Test that an admin write saving several models rebuilds the
+        snapshot once, and a failed one not at all"""
+        payload = {
+            'name': {'en': 'Project', 'fr': 'Projet'},
+            'description': {'en': ['Line'], 'fr': ['Ligne']},
+            'technologies': [tech.id for tech in self.technologies],
+        }
+        with patch.object(snapshot, 'build_snapshot',
+                          wraps=snapshot.build_snapshot) as build_snapshot:
+            res = self.admin_client.post(
+                reverse('rest:project-list'), payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(build_snapshot.call_count, 1)
+            res = self.admin_client.post(
+                reverse('rest:project-list'), {}, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(build_snapshot.call_count, 1)
+        data = json.loads(bytes(Snapshot.objects.get(
+            key=SNAPSHOT_KEY).payload))
+        self.assertEqual(len(data['projects']), 1)
+        self.assertEqual(len(data['reviews']), 0)
@@ -0,0 +1,152 @@
+import json
+import os
+from unittest.mock import patch
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import Project, Review, Skill, Technology
+from rest.cache import response_cache
+from rest.renderers import PreEncodedJSON
+from rest.serializers import LightProjectSerializer, MailSerializer,\
+    ProjectSerializer
+from rest.sqljson import JSONArrayQuery, build_json_array, get_ordering
+from rest.streaming import StreamingListMixin
+from rest_framework import status
+from rest_framework.test import APIClient
+
+LIST_URLS = (
+    reverse('rest:technology-list'),
+    reverse('rest:skill-list'),
+    reverse('rest:skill-list') + '?lang=fr',
+    reverse('rest:project-list'),
+    reverse('rest:project-list') + '?lang=en&ordering=-name',
+    reverse('rest:review-list'),
+    reverse('rest:review-list') + '?lang=fr',
+    reverse('rest:review-get-all'),
+)
+
+
+@override_settings(REST_SQL_JSON=True)
+class JSONArrayQueryTests(TestCase):
+    """Tests for the JSON arrays built by the database"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_client = APIClient()
+        self.admin_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        technologies = [
+            Technology.objects.create(
+                name=f'Tech "{index}"',
+                image=f'image/upload/v{index + 1}/folder/tech_{index}.png')
+            for index in range(4)
+        ]
+        for index in range(4):
+            Skill.objects.create(
+                name={'en': f'Skill {index}', 'fr': f'Compétence\n{index}'},
+                description={'en': ['Line', ''], 'fr': ['Ligne\u2028']},
+                date=[index + 1, 2021],
+                technology=technologies[index] if index else None
+            )
+            project = Project.objects.create(
+                name={'en': f'Project {index}', 'fr': f'Projet {index}'},
+                description={'en': ['Line'], 'fr': ['Ligne']},
+                image=f'image/upload/v1/project{index}' if index else None,
+                client=f'Client {index}'
+            )
+            project.technologies.add(*technologies[index:])
+        review = Review.objects.first()
+        review.message = {'en': 'Great', 'fr': 'Génial'}
+        review.save()
+
+    def get_expected(self, client, url):
+        with override_settings(REST_SQL_JSON=False),\
+                patch.object(StreamingListMixin, 'read_rows', False):
+            response_cache.clear()
+            return client.get(url)
+
+    def test_parity(self):
+        """Test that the public arrays built by the database hold the
+        serialized values"""
+        for url in LIST_URLS:
+            with self.subTest(url=url):
+                response_cache.clear()
+                with patch('rest.streaming.serialize_rows',
+                           side_effect=AssertionError):
+                    res = self.client.get(url)
+                expected = self.get_expected(self.client, url)
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(res['Content-Type'],
+                                 expected['Content-Type'])
+                self.assertEqual(json.loads(res.content),
+                                 json.loads(expected.content))
+                self.assertNotIn('\u2028', res.content.decode())
+
+    def test_admin_parity(self):
+        """Test that the admin lists with fields the database does not
+        build are served from rows"""
+        for url in LIST_URLS:
+            with self.subTest(url=url):
+                response_cache.clear()
+                res = self.admin_client.get(url)
+                expected = self.get_expected(self.admin_client, url)
+
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                self.assertEqual(json.loads(res.content),
+                                 json.loads(expected.content))
+
+    def test_single_query(self):
+        """Test that the whole array is built by a single query"""
+        with CaptureQueriesContext(connection) as queries:
+            data = build_json_array(LightProjectSerializer(),
+                                    Project.objects.order_by('id'))
+
+        self.assertIsInstance(data, PreEncodedJSON)
+        self.assertEqual(len(queries), 1)
+
+    def test_ordering(self):
+        """Test that the array follows an ordering on several columns, with
+        ties and descending ones"""
+        for index, project in enumerate(Project.objects.order_by('id')):
+            project.client = 'AB'[index % 2]
+            project.save()
+        queryset = Project.objects.order_by('-client', F('id').desc())
+        data = build_json_array(LightProjectSerializer(), queryset)
+
+        expected = LightProjectSerializer(queryset, many=True).data
+        self.assertEqual([row['id'] for row in json.loads(data)],
+                         [row['id'] for row in expected])
+        self.assertEqual(json.loads(data), json.loads(json.dumps(expected)))
+        positions = queryset.annotate(position=Window(
+            RowNumber(), order_by=get_ordering(queryset)))
+        self.assertEqual(
+            [(project.id, project.position) for project in positions],
+            [(row['id'], index + 1) for index, row in enumerate(expected)])
+
+    def test_empty_list(self):
+        """Test that an empty table builds an empty array"""
+        Technology.objects.all().delete()
+        res = self.client.get(reverse('rest:technology-list'))
+
+        self.assertEqual(res.content, b'[]')
+
+    def test_fallback(self):
+        """Test that images the database cannot build the URL of are
+        served from rows"""
+        Technology.objects.filter(name='Tech "2"').update(
+            image='image/upload/v1/with space.png')
+        url = reverse('rest:technology-list')
+        response_cache.clear()
+        res = self.client.get(url)
+        expected = self.get_expected(self.client, url)
+
+        self.assertEqual(res.content, expected.content)
+
+    def test_unsupported_fields(self):
+        """Test that serializers with unknown fields are not built in SQL"""
+        self.assertIsNone(JSONArrayQuery(MailSerializer(), connection).row)
+        self.assertIsNone(JSONArrayQuery(ProjectSerializer(), connection).row)
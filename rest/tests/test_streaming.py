@@ -0,0 +1,103 @@
+import os
+from unittest.mock import patch
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import Project, Review, Skill, Technology
+from rest.cache import response_cache
+from rest.streaming import StreamingListMixin
+from rest_framework import status
+from rest_framework.test import APIClient
+
+LIST_URLS = (
+    reverse('rest:technology-list'),
+    reverse('rest:skill-list'),
+    reverse('rest:project-list'),
+    reverse('rest:project-list') + '?lang=fr&ordering=-name',
+    reverse('rest:review-list'),
+    reverse('rest:review-get-all'),
+)
+
+
+def stream_url(url):
+    return url + ('&' if '?' in url else '?') + 'stream=true'
+
+
+class StreamingListTests(TestCase):
+    """Tests for the streamed list responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_client = APIClient()
+        self.admin_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        technology = Technology.objects.create(
+            name='Tech', image='image/upload/v1/tech.png')
+        for index in range(7):
+            Skill.objects.create(
+                name={'en': f'Skill {index}', 'fr': f'Compétence {index}'},
+                description={'en': ['Line'], 'fr': ['Ligne\u2028']},
+                date=[6, 2021],
+                technology=technology
+            )
+            project = Project.objects.create(
+                name={'en': f'Project {index}', 'fr': f'Projet {index}'},
+                description={'en': ['Line'], 'fr': ['Ligne']},
+                client=f'Client {index}'
+            )
+            project.technologies.add(technology)
+        for review in Review.objects.all()[:5]:
+            review.message = {'en': 'Great', 'fr': 'Génial'}
+            review.save()
+        patcher = patch.object(StreamingListMixin, 'stream_chunk_size', 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_bytes(self):
+        """Test that streamed lists render the bytes of the plain ones"""
+        for client in (self.client, self.admin_client):
+            for url in LIST_URLS:
+                with self.subTest(url=url):
+                    response_cache.clear()
+                    res = client.get(url)
+                    streamed = client.get(stream_url(url))
+
+                    self.assertEqual(streamed.status_code, status.HTTP_200_OK)
+                    self.assertIsInstance(streamed, StreamingHttpResponse)
+                    self.assertEqual(streamed['Content-Type'],
+                                     res['Content-Type'])
+                    self.assertEqual(
+                        b''.join(streamed.streaming_content), res.content)
+
+    def test_empty_list(self):
+        """Test that an empty list streams an empty array"""
+        Technology.objects.all().delete()
+        res = self.client.get(stream_url(reverse('rest:technology-list')))
+
+        self.assertEqual(b''.join(res.streaming_content), b'[]')
+
+    def test_chunks(self):
+        """Test that the rows are sent in chunks as they are read"""
+        res = self.client.get(stream_url(reverse('rest:skill-list')))
+
+        self.assertEqual(len(list(res.streaming_content)), 3)
+
+    def test_prefetch_per_chunk(self):
+        """Test that streamed projects load their technologies once per
+        chunk"""
+        res = self.client.get(stream_url(reverse('rest:project-list')))
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(res.streaming_content)
+
+        # The projects, and the technologies of each of the 3 chunks
+        self.assertEqual(len(queries), 4)
+
+    def test_paginated_not_streamed(self):
+        """Test that paginated requests are not streamed"""
+        res = self.client.get(
+            stream_url(reverse('rest:skill-list') + '?page_size=2'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
@@ -0,0 +1,130 @@
+import os
+import tempfile
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.models import ImageUpload, Project, Technology
+from core.storage import get_image_storage
+from core.uploads import process_upload
+from rest_framework import status
+from rest_framework.test import APIClient
+
+TECHNOLOGY_URL = reverse('rest:technology-list')
+TECHNOLOGY_BULK_URL = reverse('rest:technology-bulk')
+
+
+def image_file(name='image.png'):
+    content = tempfile.SpooledTemporaryFile()
+    Image.new('RGB', (10, 10)).save(content, format='PNG')
+    content.seek(0)
+    return SimpleUploadedFile(name, content.read(), 'image/png')
+
+
+def status_url(upload_id):
+    return reverse('rest:upload-status', kwargs={'pk': upload_id})
+
+
+class ImageUploadApiTests(TestCase):
+    """Tests for the staged image uploads of the API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_client = APIClient()
+        self.admin_client.credentials(
+            HTTP_AUTHORIZATION='Token ' + os.environ['ADMIN_TOKEN'])
+        staging = tempfile.TemporaryDirectory()
+        storage = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        self.addCleanup(storage.cleanup)
+        settings = override_settings(
+            IMAGE_STAGING_DIR=staging.name,
+            IMAGE_STORAGE={
+                'BACKEND': 'core.storage.LocalStorage',
+                'OPTIONS': {'location': storage.name},
+            }
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_upload_project_image(self):
+        """Test that a project image is acknowledged as pending, and set
+        once processed"""
+        project = Project.objects.create(
+            name={'en': 'Project', 'fr': 'Projet'},
+            description={'en': ['Line'], 'fr': ['Ligne']})
+        res = self.admin_client.post(
+            reverse('rest:project-upload-image', kwargs={'pk': project.id}),
+            {'image': image_file()})
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertIsNone(res.data['image'])
+        upload = res.data['uploads'][0]
+        self.assertEqual(upload['status'], ImageUpload.PENDING)
+
+        process_upload(upload['id'])
+        res = self.admin_client.get(status_url(upload['id']))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], ImageUpload.DONE)
+        project.refresh_from_db()
+        self.assertEqual(res.data['image'], project.image.url)
+
+    def test_create_technology(self):
+        """Test that a technology is created at once, with its image
+        pending"""
+        res = self.admin_client.post(
+            TECHNOLOGY_URL, {'name': 'Tech', 'image': image_file()},
+            format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(res.data['image'])
+        process_upload(res.data['uploads'][0]['id'])
+        technology = Technology.objects.get()
+        self.assertTrue(technology.image.public_id.startswith('local/'))
+
+    def test_bulk_create_technologies(self):
+        """Test that the images of technologies created in bulk are
+        staged"""
+        res = self.admin_client.post(TECHNOLOGY_BULK_URL, {
+            'name': ['Tech 0', 'Tech 1'],
+            'image': [image_file('0.png'), image_file('1.png')],
+        }, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        uploads = ImageUpload.objects.order_by('pk')
+        self.assertEqual(
+            [upload.object_id for upload in uploads],
+            list(Technology.objects.order_by('pk').values_list(
+                'pk', flat=True)))
+
+    def test_status_admin_only(self):
+        """Test that the upload status requires the Admin Token"""
+        upload = ImageUpload.objects.create(
+            model='core.technology', object_id=1, field='image', path='')
+
+        res = self.client.get(status_url(upload.id))
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        res = self.admin_client.get(status_url(upload.id + 1))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_storage_stats(self):
+        """Test that the statistics of the image storage require the Admin
+        Token, and report the calls of the Cloudinary storage"""
+        url = reverse('rest:image-storage-stats')
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        res = self.admin_client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {})
+
+        with override_settings(IMAGE_STORAGE={
+                'BACKEND': 'core.storage.CloudinaryStorage'}):
+            get_image_storage().client.record('delete', 0.2)
+            res = self.admin_client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()
+        self.assertEqual(data['circuit'], 'closed')
+        self.assertEqual(data['latency']['delete']['count'], 1)
+        self.assertEqual(data['latency']['delete']['buckets']['+Inf'], 1)
@@ -11,5 +11,11 @@ router.register('review', views.ReviewItemViewSet)
 app_name = 'rest'
 urlpatterns = [
     path('', include(router.urls)),
-    path('mail/', views.Contact.as_view())
+    path('mail/', views.Contact.as_view()),
+    path('snapshot/', views.PortfolioSnapshot.as_view(), name='snapshot'),
+    path('upload/<int:pk>/', views.UploadStatus.as_view(),
+         name='upload-status'),
+    path('cache-stats/', views.CacheStats.as_view(), name='cache-stats'),
+    path('image-storage-stats/', views.ImageStorageStats.as_view(),
+         name='image-storage-stats')
 ]
@@ -1,19 +1,167 @@
-from django.core.mail import send_mail
+from functools import wraps
+from hashlib import sha1
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, TextField
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django.utils.translation.trans_real import parse_accept_lang_header
 from backend.settings import EMAIL_RECEIVER
-import os
-from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest.serializers import LightProjectSerializer, MailSerializer,\
-    ProjectImageSerializer, ProjectSerializer, ReviewAdminSerializer,\
-    ReviewSerializer, TechnologySerializer, SkillSerializer
-from core.models import Project, Review, Skill, Technology
+from rest.authentication import is_admin
+from rest.bulk import BulkMixin
+from rest.cache import response_cache
+from rest.renderers import PreEncodedJSON
+from rest.snapshot import get_snapshot
+from rest.streaming import StreamingListMixin
+from rest.serializers import ImageUploadSerializer, LightProjectSerializer,\
+    MailSerializer, ProjectImageSerializer, ProjectSerializer,\
+    ReviewAdminSerializer, ReviewSerializer, TechnologySerializer,\
+    SkillSerializer, technology_ids_prefetch
+from core.models import ImageUpload, Project, ProjectCard, Review, Skill,\
+    Technology, bump_content_version, find_review_by_code,\
+    get_content_versions, rebuild_project_cards, technology_project_ids
+from core.outbox import queue_mail
+from core.storage import get_image_storage
+from core.translations import TRANSLATION_LANGUAGES
 from rest_framework import viewsets, mixins, status
-from rest_framework.permissions import BasePermission
-from rest_framework.authentication import get_authorization_header
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 
 
+def etag_matches(request, etag):
+    """Tells whether the If-None-Match header of the request matches the
+    given ETag"""
+    if_none_match = [
+        tag[2:] if tag.startswith('W/') else tag
+        for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    ]
+    return etag in if_none_match or '*' in if_none_match
+
+
+def cached_on_content(*content_models):
+    """Answers conditional GETs from the content versions of the given
+    models and serves unchanged responses from the response cache, before
+    any queryset or serializer work is done"""
+    labels = tuple(model._meta.label_lower for model in content_models)
+
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            etag = quote_etag(sha1(repr((
+                self.get_serializer_class().__name__,
+                request.get_full_path(),
+                self.get_language(),
+                get_content_versions(*content_models),
+            )).encode()).hexdigest())
+            if etag_matches(request, etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                content = response_cache.get(etag, labels)
+                if content is not None:
+                    response = HttpResponse(
+                        content, content_type='application/json')
+                    response['X-Cache'] = 'HIT'
+                else:
+                    response = handler(self, request, *args, **kwargs)
+                    if (isinstance(response, Response)
+                            and response.status_code == status.HTTP_200_OK):
+                        response['X-Cache'] = 'MISS'
+                        response.add_post_render_callback(
+                            lambda rendered: response_cache.set(
+                                etag, rendered.content, labels))
+            if response.status_code in (status.HTTP_200_OK,
+                                        status.HTTP_304_NOT_MODIFIED):
+                response['ETag'] = etag
+            if request.query_params.get('lang') == 'auto':
+                patch_vary_headers(response, ('Accept-Language',))
+            return response
+        return wrapper
+    return decorator
+
+
+class AtomicWritesMixin:
+    """Runs each write request of a viewset in one transaction, rolled back
+    if it fails, so that everything it changed is committed at once"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return super(AtomicWritesMixin, self).dispatch(
+                request, *args, **kwargs)
+        with transaction.atomic():
+            response = super(AtomicWritesMixin, self).dispatch(
+                request, *args, **kwargs)
+            if getattr(response, 'exception', False):
+                transaction.set_rollback(True)
+        return response
+
+
+class OrderingMixin:
+    """Lets GET requests pick one of the `orderings` of the view with
+    `?ordering=`, prefixed with `-` for a descending order. Each ordering
+    ends with a unique field, and also serves as pagination keyset"""
+    orderings = {}
+    default_ordering = None
+
+    def get_ordering(self):
+        ordering = self.default_ordering
+        if self.request is not None and self.request.method == 'GET':
+            ordering = self.request.query_params.get('ordering', ordering)
+        descending = ordering.startswith('-')
+        name = ordering[1:] if descending else ordering
+        language = self.get_language()
+        if language and f'{name}_{language}' in self.orderings:
+            name = f'{name}_{language}'
+        if name not in self.orderings:
+            raise ValidationError({'ordering': 'Must be one of '
+                                   + ', '.join(self.orderings) + '.'})
+        fields = self.orderings[name]
+        if descending:
+            return tuple('-' + field for field in fields)
+        return fields
+
+    @property
+    def keyset(self):
+        return self.get_ordering()
+
+
+class LanguageProjectionMixin:
+    """Lets GET requests ask for a single language of the translated fields
+    with `?lang=en|fr`, or with `?lang=auto` to follow Accept-Language"""
+
+    def get_language(self):
+        if self.request.method != 'GET':
+            return None
+        language = self.request.query_params.get('lang')
+        if language == 'auto':
+            for accepted, quality in parse_accept_lang_header(
+                    self.request.META.get('HTTP_ACCEPT_LANGUAGE', '')):
+                accepted = accepted.split('-')[0].lower()
+                if accepted in TRANSLATION_LANGUAGES:
+                    return accepted
+            return TRANSLATION_LANGUAGES[0]
+        if language is not None and language not in TRANSLATION_LANGUAGES:
+            raise ValidationError({'lang': 'Must be one of '
+                                   + ', '.join(TRANSLATION_LANGUAGES)
+                                   + ' or auto.'})
+        return language
+
+    def project_translations(self, queryset):
+        """Restricts the translated fields to the requested language"""
+        language = self.get_language()
+        serializer_class = self.get_serializer_class()
+        if language and hasattr(serializer_class, 'project_translations'):
+            return serializer_class.project_translations(queryset, language)
+        return queryset
+
+    def get_serializer_context(self):
+        context = super(LanguageProjectionMixin, self).get_serializer_context()
+        context['lang'] = self.get_language()
+        return context
+
+
 class Contact(APIView):
     serializer_class = MailSerializer
 
@@ -22,42 +170,45 @@ class Contact(APIView):
         if serializer.is_valid():
             message = "Name: " + \
                 serializer.data['name'] + "\n" + serializer.data['message']
-            send_mail(
+            queue_mail(
                 serializer.data['subject'],
                 message,
                 serializer.data['email'],
-                [EMAIL_RECEIVER],
-                fail_silently=False
+                [EMAIL_RECEIVER]
             )
             return Response(status=status.HTTP_200_OK)
         else:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
+class PortfolioSnapshot(APIView):
+    """Returns all the public content in one pre-encoded document"""
+
+    def get(self, request, format=None):
+        versions, payload = get_snapshot()
+        etag = quote_etag(sha1(versions.encode()).hexdigest())
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(payload, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+
 class IsAdminOrIsGet(BasePermission):
     """Permission that authorizes all GET methods and
     requires the Admin Token for all other kind of method"""
-    keyword = 'Token'
 
     def has_permission(self, request, view):
-        if request.method == "GET":
-            return True
-        auth = get_authorization_header(request).split()
-        if not auth or auth[0].lower() != self.keyword.lower().encode():
-            return False
-
-        if len(auth) == 1:
-            return False
-        elif len(auth) > 2:
-            return False
-        try:
-            token = auth[1].decode()
-            return token == os.environ['ADMIN_TOKEN']
-        except UnicodeError:
-            return False
+        return request.method == "GET" or is_admin(request)
 
 
-class TechnologyItemViewSet(viewsets.GenericViewSet,
+class TechnologyItemViewSet(AtomicWritesMixin,
+                            BulkMixin,
+                            OrderingMixin,
+                            LanguageProjectionMixin,
+                            StreamingListMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin,
                             mixins.UpdateModelMixin,
@@ -65,12 +216,44 @@ class TechnologyItemViewSet(viewsets.GenericViewSet,
     permission_classes = (IsAdminOrIsGet,)
     queryset = Technology.objects.all()
     serializer_class = TechnologySerializer
+    orderings = {'name': ('name', 'id'), 'id': ('id',)}
+    default_ordering = 'name'
 
     def get_queryset(self):
-        return self.queryset.order_by('name')
-
+        return self.queryset.order_by(*self.get_ordering())
 
-class SkillItemViewSet(viewsets.GenericViewSet,
+    @cached_on_content(Technology)
+    def list(self, request, *args, **kwargs):
+        return super(TechnologyItemViewSet, self).list(
+            request, *args, **kwargs)
+
+    def get_bulk_items(self, request):
+        """Technologies carry an image file, so their bulk creation takes a
+        multipart form repeating the `name` and `image` fields, paired in
+        order"""
+        if request.method == 'POST' and hasattr(request.data, 'getlist'):
+            names = request.data.getlist('name')
+            images = request.data.getlist('image')
+            if not names or len(names) != len(images):
+                raise ValidationError(
+                    'Expected as many names as images.')
+            return self.check_bulk_items([
+                {'name': name, 'image': image}
+                for name, image in zip(names, images)
+            ], request.method)
+        return super(TechnologyItemViewSet, self).get_bulk_items(request)
+
+    def bulk_updated(self, technologies):
+        """Rebuilds the cards of the projects using the technologies"""
+        rebuild_project_cards(technology_project_ids(technologies))
+
+
+class SkillItemViewSet(AtomicWritesMixin,
+                       BulkMixin,
+                       OrderingMixin,
+                       LanguageProjectionMixin,
+                       StreamingListMixin,
+                       viewsets.GenericViewSet,
                        mixins.ListModelMixin,
                        mixins.CreateModelMixin,
                        mixins.UpdateModelMixin,
@@ -78,9 +261,21 @@ class SkillItemViewSet(viewsets.GenericViewSet,
     permission_classes = (IsAdminOrIsGet,)
     queryset = Skill.objects.all()
     serializer_class = SkillSerializer
+    orderings = {
+        'name': ('name_en', 'id'),
+        'name_en': ('name_en', 'id'),
+        'name_fr': ('name_fr', 'id'),
+        'id': ('id',),
+    }
+    default_ordering = 'name'
 
     def get_queryset(self):
-        return self.queryset.order_by('name')
+        return self.project_translations(
+            self.queryset.order_by(*self.get_ordering()))
+
+    @cached_on_content(Skill)
+    def list(self, request, *args, **kwargs):
+        return super(SkillItemViewSet, self).list(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         try:
@@ -99,7 +294,12 @@ class SkillItemViewSet(viewsets.GenericViewSet,
         return returnValue
 
 
-class ProjectItemViewSet(viewsets.GenericViewSet,
+class ProjectItemViewSet(AtomicWritesMixin,
+                         BulkMixin,
+                         OrderingMixin,
+                         LanguageProjectionMixin,
+                         StreamingListMixin,
+                         viewsets.GenericViewSet,
                          mixins.ListModelMixin,
                          mixins.RetrieveModelMixin,
                          mixins.CreateModelMixin,
@@ -108,9 +308,28 @@ class ProjectItemViewSet(viewsets.GenericViewSet,
     permission_classes = (IsAdminOrIsGet,)
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    orderings = {
+        'name': ('name_en', 'id'),
+        'name_en': ('name_en', 'id'),
+        'name_fr': ('name_fr', 'id'),
+        'id': ('id',),
+    }
+    default_ordering = 'name'
 
     def get_queryset(self):
-        return self.queryset.order_by('name')
+        return self.project_translations(self.queryset.order_by(
+            *self.get_ordering()
+        ).prefetch_related(technology_ids_prefetch()))
+
+    @cached_on_content(Project, Technology)
+    def list(self, request, *args, **kwargs):
+        return super(ProjectItemViewSet, self).list(
+            request, *args, **kwargs)
+
+    @cached_on_content(Project, Technology)
+    def retrieve(self, request, *args, **kwargs):
+        return super(ProjectItemViewSet, self).retrieve(
+            request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         try:
@@ -136,6 +355,37 @@ class ProjectItemViewSet(viewsets.GenericViewSet,
             return LightProjectSerializer
         return self.serializer_class
 
+    def bulk_created(self, projects):
+        """Creates the reviews awaiting the clients of the projects, and
+        their cards"""
+        Review.objects.bulk_create(
+            [project.new_review() for project in projects])
+        bump_content_version(Review)
+        rebuild_project_cards(project.pk for project in projects)
+
+    def bulk_updated(self, projects):
+        rebuild_project_cards(project.pk for project in projects)
+
+    @action(
+        methods=['get'],
+        detail=False,
+        url_path='cards'
+    )
+    @cached_on_content(Project, Technology)
+    def cards(self, request, *args, **kwargs):
+        """Lists the cards of the landing page in every language, spliced
+        as stored in their table"""
+        ordering = tuple(
+            field[:-2] + 'pk' if field.lstrip('-') == 'id' else field
+            for field in self.get_ordering()
+        )
+        payloads = ProjectCard.objects.order_by(*ordering).annotate(
+            raw_payload=ExpressionWrapper(
+                F('payload'), output_field=TextField())
+        ).values_list('raw_payload', flat=True)
+        return Response(PreEncodedJSON(
+            ('[' + ','.join(payloads) + ']').encode()))
+
     @action(
         methods=['post'],
         detail=True,
@@ -143,7 +393,8 @@ class ProjectItemViewSet(viewsets.GenericViewSet,
         url_path='upload_image'
     )
     def upload_image(self, request, pk=None):
-        """Uploads an image to a project"""
+        """Stages an image for a project, set once uploaded in the
+        background"""
         project = self.get_object()
         serializer = self.get_serializer(
             project,
@@ -152,7 +403,7 @@ class ProjectItemViewSet(viewsets.GenericViewSet,
         if serializer.is_valid():
             serializer.save()
             return Response(
-                status=status.HTTP_200_OK,
+                status=status.HTTP_202_ACCEPTED,
                 data=serializer.data
             )
         return Response(
@@ -185,42 +436,18 @@ class ProjectItemViewSet(viewsets.GenericViewSet,
 class ReviewPermission(BasePermission):
     """Permission that authorizes all GET methods and
     requires the Admin Token for all other kind of method"""
-    keyword = 'Token'
 
     def has_permission(self, request, view):
         if request.method == "GET" or view.action == "with_code":
             return True
-        auth = get_authorization_header(request).split()
-        if not auth or auth[0].lower() != self.keyword.lower().encode():
-            return False
-
-        if len(auth) == 1:
-            return False
-        elif len(auth) > 2:
-            return False
-        try:
-            token = auth[1].decode()
-            return token == os.environ['ADMIN_TOKEN']
-        except UnicodeError:
-            return False
-
-    def is_admin(self, request):
-        auth = get_authorization_header(request).split()
-        if not auth or auth[0].lower() != self.keyword.lower().encode():
-            return False
-
-        if len(auth) == 1:
-            return False
-        elif len(auth) > 2:
-            return False
-        try:
-            token = auth[1].decode()
-            return token == os.environ['ADMIN_TOKEN']
-        except UnicodeError:
-            return False
+        return is_admin(request)
 
 
-class ReviewItemViewSet(viewsets.GenericViewSet,
+class ReviewItemViewSet(AtomicWritesMixin,
+                        OrderingMixin,
+                        LanguageProjectionMixin,
+                        StreamingListMixin,
+                        viewsets.GenericViewSet,
                         mixins.ListModelMixin,
                         mixins.CreateModelMixin,
                         mixins.DestroyModelMixin):
@@ -228,22 +455,20 @@ class ReviewItemViewSet(viewsets.GenericViewSet,
     permission_classes = (ReviewPermission,)
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    orderings = {'author': ('author', 'id'), 'id': ('id',)}
+    default_ordering = 'author'
 
     def get_queryset(self):
-        return self.queryset.order_by('author')
+        return self.project_translations(
+            self.queryset.order_by(*self.get_ordering()))
 
+    @cached_on_content(Review)
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset().filter(modified=True)
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.list_response(self.get_queryset().filter(modified=True))
 
     def get_serializer_class(self):
         """Returns the appropriate serializer class"""
-        if self.permission_classes[0]().is_admin(self.request):
+        if is_admin(self.request):
             return ReviewAdminSerializer
         else:
             return ReviewSerializer
@@ -255,39 +480,31 @@ class ReviewItemViewSet(viewsets.GenericViewSet,
     )
     def with_code(self, request, *args, **kwargs):
         if request.method == 'GET':
-            try:
-                update_code = request.query_params.get('update_code')
-                instance = Review.objects.all().get(
-                    update_code=update_code
-                )
-                serializer = self.get_serializer(instance)
-                return Response(
-                    status=status.HTTP_200_OK,
-                    data=serializer.data
-                )
-
-            except KeyError:
-                return Response(status=status.HTTP_400_BAD_REQUEST)
-            except ObjectDoesNotExist:
+            instance = find_review_by_code(
+                request.query_params.get('update_code'))
+            if instance is None:
                 return Response(status=status.HTTP_404_NOT_FOUND)
+            serializer = self.get_serializer(instance)
+            return Response(
+                status=status.HTTP_200_OK,
+                data=serializer.data
+            )
 
         elif request.method == 'PATCH' or request.method == 'PUT':
             try:
                 update_code = request.data['update_code']
                 if update_code is not None:
-                    try:
-                        instance = Review.objects.all().get(
-                            update_code=update_code)
-                        partial = kwargs.pop('partial', False)
-                        serializer = self.get_serializer(
-                            instance, data=request.data, partial=partial)
-                        if serializer.is_valid():
-                            serializer.save()
-                            return Response(serializer.data)
-                        else:
-                            return Response(status=status.HTTP_400_BAD_REQUEST)
-                    except ObjectDoesNotExist:
+                    instance = find_review_by_code(update_code)
+                    if instance is None:
                         return Response(status=status.HTTP_404_NOT_FOUND)
+                    partial = kwargs.pop('partial', False)
+                    serializer = self.get_serializer(
+                        instance, data=request.data, partial=partial)
+                    if serializer.is_valid():
+                        serializer.save()
+                        return Response(serializer.data)
+                    else:
+                        return Response(status=status.HTTP_400_BAD_REQUEST)
                 else:
                     return Response(status=status.HTTP_403_FORBIDDEN)
             except KeyError:
@@ -300,7 +517,41 @@ class ReviewItemViewSet(viewsets.GenericViewSet,
         detail=False,
         url_path="get-all"
     )
+    @cached_on_content(Review)
     def get_all(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.list_response(self.get_queryset())
+
+
+class IsAdmin(BasePermission):
+    """Permission that requires the Admin Token for all methods"""
+
+    def has_permission(self, request, view):
+        return is_admin(request)
+
+
+class UploadStatus(APIView):
+    """Returns the status of a staged image upload"""
+    permission_classes = (IsAdmin,)
+
+    def get(self, request, pk, format=None):
+        upload = ImageUpload.objects.filter(pk=pk).first()
+        if upload is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(ImageUploadSerializer(upload).data)
+
+
+class CacheStats(APIView):
+    """Exposes the hit rate of the response cache of this worker"""
+    permission_classes = (IsAdmin,)
+
+    def get(self, request, format=None):
+        return Response(response_cache.stats())
+
+
+class ImageStorageStats(APIView):
+    """Exposes the latency of the calls of this worker to the image storage,
+    and the state of their circuit breaker"""
+    permission_classes = (IsAdmin,)
+
+    def get(self, request, format=None):
+        return Response(get_image_storage().stats())